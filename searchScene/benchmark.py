@@ -0,0 +1,470 @@
+"""
+Headless benchmark for searchScene.
+
+Runs Node, SceneGraphModel and the filtering path against a fake maya.cmds
+serving a synthetic scene, so it needs neither Maya nor a display:
+
+    python benchmark.py                              # 10k and 100k nodes
+    python benchmark.py --sizes 10000,500000,2000000
+    python benchmark.py --json results.json
+    python benchmark.py --baseline results.json      # exit 1 on regressions
+
+Measured per scene size:
+    snapshot    SceneSnapshot build from cmds.ls
+    nodes       Node tree build time and memory per node (None when it
+                cannot be measured, see measureNodeMemory)
+    keystroke   time to first batch and full filter for each typed prefix
+    model       SceneGraphModel build, proxy sort and data() call counts
+                (skipped when PySide cannot be imported)
+
+The Qt part uses the offscreen platform when the Qt build supports it.
+"""
+import gc
+import json
+import os
+import random
+import sys
+import time
+import types
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+DEFAULT_SIZES = (10000, 100000)
+DEFAULT_QUERIES = ('l_arm_bind', 'type:joint name:*_bind*', 'parent:*spine* Shape')
+REGRESSION_TOLERANCE = 1.25
+
+# Relative frequency of node types in a production character/shot scene
+TYPE_WEIGHTS = (
+    ('transform', 30), ('mesh', 12), ('joint', 14), ('nurbsCurve', 8), ('groupId', 6),
+    ('groupParts', 4), ('tweak', 2), ('skinCluster', 2), ('shadingEngine', 2), ('materialInfo', 2),
+    ('lambert', 1), ('blinn', 1), ('file', 2), ('place2dTexture', 2), ('multiplyDivide', 3),
+    ('plusMinusAverage', 2), ('condition', 1), ('parentConstraint', 3), ('orientConstraint', 1),
+    ('animCurveTL', 2),
+)
+DAG_TYPES = frozenset(['transform', 'mesh', 'joint', 'nurbsCurve', 'parentConstraint', 'orientConstraint'])
+SHAPE_TYPES = frozenset(['mesh', 'nurbsCurve'])
+SIDES = ('l_', 'r_', 'c_', '')
+PARTS = ('arm', 'leg', 'spine', 'neck', 'head', 'hand', 'finger', 'foot', 'tail', 'jaw', 'eye', 'prop')
+SUFFIXES = {'transform': ('grp', 'ctrl', 'geo', 'null'), 'joint': ('bind', 'jnt', 'drv')}
+
+
+def synthesizeScene(count, seed=1):
+    """
+    Return (paths, types) lists for a synthetic scene of count nodes.
+    DAG nodes form a hierarchy a few levels deep, shapes sit under transforms.
+    """
+    rng = random.Random(seed)
+    population = []
+    for nodeType, weight in TYPE_WEIGHTS:
+        population.extend([nodeType] * weight)
+
+    paths = []
+    nodeTypes = []
+    transforms = []
+
+    for i in range(count):
+        nodeType = rng.choice(population)
+        side = rng.choice(SIDES)
+        part = rng.choice(PARTS)
+        suffix = rng.choice(SUFFIXES.get(nodeType, (nodeType,)))
+        name = '%s%s_%s_%03d' % (side, part, suffix, i)
+
+        if nodeType in SHAPE_TYPES and transforms:
+            name += 'Shape'
+            path = '%s|%s' % (rng.choice(transforms), name)
+        elif nodeType in DAG_TYPES:
+            if transforms and rng.random() < 0.9:
+                path = '%s|%s' % (transforms[rng.randrange(max(0, len(transforms) - 50), len(transforms))], name)
+            else:
+                path = '|' + name
+            if nodeType in ('transform', 'joint') and path.count('|') < 12:
+                transforms.append(path)
+        else:
+            path = name
+
+        paths.append(path)
+        nodeTypes.append(nodeType)
+
+    return paths, nodeTypes
+
+
+class FakeCmds(types.ModuleType):
+    """
+    The subset of maya.cmds used by searchScene, serving a synthetic scene
+    """
+    def __init__(self, paths, nodeTypes):
+        types.ModuleType.__init__(self, 'maya.cmds')
+        self.setScene(paths, nodeTypes)
+        self.callCounts = {}
+
+    def setScene(self, paths, nodeTypes):
+        self.paths = list(paths)
+        self.nodeTypes = list(nodeTypes)
+        self.typeMap = dict(zip(self.paths, self.nodeTypes))
+        for path, nodeType in zip(paths, nodeTypes):
+            self.typeMap.setdefault(path.rsplit('|', 1)[-1], nodeType)
+
+    def _count(self, name):
+        self.callCounts[name] = self.callCounts.get(name, 0) + 1
+
+    def ls(self, *args, **kwargs):
+        self._count('ls')
+        if args and args[0]:
+            names = [name for name in args[0] if name in self.typeMap]
+            nodeTypes = [self.typeMap[name] for name in names]
+        elif kwargs.get('long') or kwargs.get('l'):
+            names, nodeTypes = self.paths, self.nodeTypes
+        else:
+            names = [path.rsplit('|', 1)[-1] for path in self.paths]
+            nodeTypes = self.nodeTypes
+
+        if kwargs.get('showType') or kwargs.get('st'):
+            flat = []
+            for name, nodeType in zip(names, nodeTypes):
+                flat.append(name)
+                flat.append(nodeType)
+            return flat
+        return list(names)
+
+    def objExists(self, name):
+        self._count('objExists')
+        return name in self.typeMap
+
+    def objectType(self, name):
+        self._count('objectType')
+        return self.typeMap[name]
+
+    def window(self, *args, **kwargs):
+        return False
+
+    def deleteUI(self, *args, **kwargs):
+        pass
+
+    def select(self, *args, **kwargs):
+        self._count('select')
+
+
+def installFakeMaya(paths=(), nodeTypes=()):
+    """
+    Register fake maya modules in sys.modules and return the fake cmds.
+    Refuses to run inside a real Maya session.
+    """
+    existing = sys.modules.get('maya.cmds')
+    if existing is not None and not isinstance(existing, FakeCmds):
+        raise RuntimeError('The searchScene benchmark must run outside of Maya')
+
+    fakeCmds = FakeCmds(paths, nodeTypes)
+    maya = types.ModuleType('maya')
+    maya.cmds = fakeCmds
+    sys.modules['maya'] = maya
+    sys.modules['maya.cmds'] = fakeCmds
+
+    for moduleName in ('OpenMaya', 'OpenMayaUI'):
+        module = types.ModuleType('maya.%s' % moduleName)
+        setattr(maya, moduleName, module)
+        sys.modules['maya.%s' % moduleName] = module
+
+    sys.modules['maya.OpenMayaUI'].MQtUtil = types.ModuleType('MQtUtil')
+    sys.modules['maya.OpenMayaUI'].MQtUtil.mainWindow = lambda: None
+    return fakeCmds
+
+
+def importQt():
+    """
+    Import searchScene and start an offscreen QApplication, or return None without PySide
+    """
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    try:
+        from PySide import QtGui
+        import searchScene
+    except ImportError:
+        return None
+
+    app = QtGui.QApplication.instance() or QtGui.QApplication(['searchSceneBenchmark'])
+    return app, searchScene
+
+
+class Timer(object):
+    def __enter__(self):
+        self.startTime = time.time()
+        return self
+
+    def __exit__(self, *args):
+        self.elapsed = time.time() - self.startTime
+
+
+def measureMemory(function):
+    """
+    Return (result, bytes allocated by function), measured with tracemalloc
+    """
+    gc.collect()
+    tracemalloc.start()
+    result = function()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current
+
+
+def residentBytes():
+    """
+    Resident set size of this process in bytes: the current size on Linux,
+    whose max rss is carried over from the parent across exec, the max rss
+    elsewhere. None without the resource module.
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (IOError, OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def childNodeMemory(size, seed):
+    """
+    Resident size growth while building the Node tree of a synthetic scene,
+    run in a fresh process by measureNodeMemory()
+    """
+    import sceneFilter
+
+    # Nothing is freed between here and the build, freed memory would be
+    # reused by the tree without moving the high-water mark
+    paths, nodeTypes = synthesizeScene(size, seed)
+    snapshot = sceneFilter.SceneSnapshot(paths, nodeTypes)
+    gc.collect()
+    gc.disable()
+
+    before = residentBytes()
+    if before is None:
+        return None
+    rootNode = buildNodeTree(snapshot)
+    return max(0, residentBytes() - before)
+
+
+def measureNodeMemory(snapshot, seed):
+    """
+    Bytes held by the Node tree of snapshot, or None when they cannot be
+    measured. Uses tracemalloc when available. Without it (Python 2, mayapy)
+    the resident size growth of a build in a fresh process is used: in this
+    process the tree was built already and freed memory would be reused.
+    That figure is an estimate, a zero is reported as None.
+    """
+    if tracemalloc is not None:
+        rootNode, allocated = measureMemory(lambda: buildNodeTree(snapshot))
+        return allocated
+
+    import subprocess
+    command = [sys.executable, os.path.abspath(__file__), '--node-memory', str(len(snapshot)), '--seed', str(seed)]
+    try:
+        output = subprocess.check_output(command)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return json.loads(output.decode('utf-8').strip().splitlines()[-1]) or None
+
+
+def benchSnapshot(results):
+    import sceneFilter
+
+    with Timer() as timer:
+        snapshot = sceneFilter.SceneSnapshot.fromMaya()
+    results['snapshot_build_s'] = timer.elapsed
+    return snapshot
+
+
+def buildNodeTree(snapshot):
+    from sceneNode import Node
+
+    rootNode = Node('root')
+    paths = snapshot.paths
+    nodeTypes = snapshot.types
+    for i, name in enumerate(snapshot.names):
+        Node(name, rootNode, nodeType=nodeTypes[i], path=paths[i])
+    return rootNode
+
+
+def benchNodes(snapshot, results, seed=1):
+    with Timer() as timer:
+        rootNode = buildNodeTree(snapshot)
+    results['node_build_s'] = timer.elapsed
+
+    allocated = measureNodeMemory(snapshot, seed)
+    results['node_bytes_per_node'] = float(allocated) / max(1, len(snapshot)) if allocated else None
+    return rootNode
+
+
+def benchKeystrokes(snapshot, queries, results):
+    """
+    Type each query one character at a time, as the debounced UI would see it
+    in the worst case, and time the first batch and the full scan of each prefix.
+    """
+    import sceneFilter
+    import sceneQuery
+
+    firstBatchTimes = []
+    fullTimes = []
+    matchCounts = {}
+
+    for query in queries:
+        count = 0
+        for end in range(1, len(query) + 1):
+            prefix = query[:end]
+            try:
+                plan = sceneQuery.parseQuery(prefix)
+            except sceneQuery.QueryError:
+                continue
+
+            startTime = time.time()
+            batches = sceneFilter.iterPlanMatches(snapshot, plan)
+            count = 0
+            for i, batch in enumerate(batches):
+                if i == 0:
+                    firstBatchTimes.append(time.time() - startTime)
+                count += len(batch)
+            fullTimes.append(time.time() - startTime)
+        matchCounts[query] = count
+
+    results['keystroke_first_batch_ms'] = 1000.0 * max(firstBatchTimes or [0.0])
+    results['keystroke_mean_ms'] = 1000.0 * sum(fullTimes) / max(1, len(fullTimes))
+    results['keystroke_max_ms'] = 1000.0 * max(fullTimes or [0.0])
+    results['query_matches'] = matchCounts
+
+
+def benchModel(qt, rootNode, results, visibleRows=50):
+    app, searchScene = qt
+    from PySide import QtCore, QtGui
+
+    class CountingModel(searchScene.SceneGraphModel):
+        dataCalls = 0
+
+        def data(self, index, role):
+            CountingModel.dataCalls += 1
+            return super(CountingModel, self).data(index, role)
+
+    with Timer() as timer:
+        model = CountingModel(rootNode)
+        proxyModel = QtGui.QSortFilterProxyModel()
+        proxyModel.setSourceModel(model)
+    results['model_build_s'] = timer.elapsed
+
+    CountingModel.dataCalls = 0
+    with Timer() as timer:
+        proxyModel.sort(0, QtCore.Qt.AscendingOrder)
+    results['model_sort_s'] = timer.elapsed
+    results['model_sort_data_calls'] = CountingModel.dataCalls
+
+    CountingModel.dataCalls = 0
+    roles = (QtCore.Qt.DisplayRole, QtCore.Qt.DecorationRole)
+    with Timer() as timer:
+        for row in range(min(visibleRows, proxyModel.rowCount(QtCore.QModelIndex()))):
+            for column in range(2):
+                index = proxyModel.index(row, column, QtCore.QModelIndex())
+                for role in roles:
+                    proxyModel.data(index, role)
+    results['model_paint_s'] = timer.elapsed
+    results['model_paint_data_calls'] = CountingModel.dataCalls
+
+
+def runBenchmark(sizes=DEFAULT_SIZES, queries=DEFAULT_QUERIES, seed=1, useQt=True):
+    """
+    Return {size: {metric: value}} for every scene size
+    """
+    fakeCmds = installFakeMaya()
+    qt = importQt() if useQt else None
+    report = {}
+
+    for size in sizes:
+        paths, nodeTypes = synthesizeScene(size, seed)
+        fakeCmds.setScene(paths, nodeTypes)
+        fakeCmds.callCounts = {}
+        results = {'nodes': size}
+
+        snapshot = benchSnapshot(results)
+        rootNode = benchNodes(snapshot, results, seed)
+        benchKeystrokes(snapshot, queries, results)
+        if qt is not None:
+            benchModel(qt, rootNode, results)
+
+        results['maya_calls'] = dict(fakeCmds.callCounts)
+        report[str(size)] = results
+        del rootNode, snapshot
+        gc.collect()
+
+    return report
+
+
+def compareReports(report, baseline, tolerance=REGRESSION_TOLERANCE):
+    """
+    Return a list of regression messages for timings and call counts that
+    grew by more than tolerance compared to a baseline report
+    """
+    regressions = []
+    for size, results in sorted(report.items()):
+        base = baseline.get(size)
+        if not base:
+            continue
+        for metric, value in sorted(results.items()):
+            if not isinstance(value, (int, float)) or metric == 'nodes':
+                continue
+            baseValue = base.get(metric)
+            if isinstance(baseValue, (int, float)) and baseValue > 0 and value > baseValue * tolerance:
+                regressions.append('%s nodes: %s %.4g -> %.4g' % (size, metric, baseValue, value))
+    return regressions
+
+
+def formatReport(report):
+    lines = []
+    for size, results in sorted(report.items(), key=lambda item: int(item[0])):
+        lines.append('--- %s nodes ---' % size)
+        for metric, value in sorted(results.items()):
+            if isinstance(value, float):
+                lines.append('  %-28s %.4f' % (metric, value))
+            else:
+                lines.append('  %-28s %s' % (metric, value))
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Headless searchScene benchmark')
+    parser.add_argument('--sizes', default=','.join(str(size) for size in DEFAULT_SIZES),
+                        help='comma separated scene sizes')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--no-qt', action='store_true', help='skip the SceneGraphModel measurements')
+    parser.add_argument('--json', help='write the report to this file')
+    parser.add_argument('--baseline', help='compare against a previous --json report')
+    parser.add_argument('--tolerance', type=float, default=REGRESSION_TOLERANCE)
+    parser.add_argument('--node-memory', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.node_memory:
+        # Child process of measureNodeMemory()
+        sys.stdout.write('%s\n' % json.dumps(childNodeMemory(args.node_memory, args.seed)))
+        return 0
+
+    sizes = [int(size) for size in args.sizes.split(',') if size]
+    report = runBenchmark(sizes, seed=args.seed, useQt=not args.no_qt)
+    sys.stdout.write(formatReport(report) + '\n')
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compareReports(report, json.load(f), args.tolerance)
+        for regression in regressions:
+            sys.stderr.write('REGRESSION %s\n' % regression)
+        return 1 if regressions else 0
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
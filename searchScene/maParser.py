@@ -0,0 +1,109 @@
+"""
+Streaming reader for Maya ASCII files.
+
+Only createNode statements are parsed. The file is read line by line so
+memory stays flat regardless of the file size, and every other statement
+(setAttr data blocks, connectAttr, requires...) is skipped with a single
+startswith test. Runs under plain python, Maya is not needed.
+
+    for name, nodeType, parent in iterCreateNodes('shot010.ma'):
+        ...
+
+Top level nodes are written without a parent, so DAG and DG nodes are told
+apart by type (TOP_LEVEL_DAG_TYPES), or by a later createNode naming the
+node as its parent. A top level DAG node of an unlisted type (e.g. a plugin
+transform) that has no children in the file is still reported as a DG node,
+without the leading '|' cmds.ls(long=True) gives it.
+"""
+import re
+
+CREATE_NODE = b'createNode '
+FLAG_VALUE = re.compile(br'-(n|p|name|parent)\s+"([^"]*)"')
+
+# Transform types that can sit at the top of the DAG, written without a -p
+# flag. Other nodes without a parent are DG nodes unless a later node is
+# parented under them, DG nodes get no leading '|' in their path, which
+# matches the long names reported by cmds.ls(long=True).
+TOP_LEVEL_DAG_TYPES = frozenset([
+    'transform', 'joint', 'ikHandle', 'ikEffector', 'lookAt', 'place3dTexture', 'hikIKEffector',
+    'hikFKJoint', 'dagContainer', 'assemblyReference', 'nucleus', 'rigidConstraint',
+    'aimConstraint', 'orientConstraint', 'parentConstraint', 'pointConstraint', 'scaleConstraint',
+    'poleVectorConstraint', 'normalConstraint', 'tangentConstraint', 'geometryConstraint',
+    'pointOnPolyConstraint', 'symmetryConstraint', 'dynamicConstraint',
+    'airField', 'dragField', 'gravityField', 'newtonField', 'radialField', 'turbulenceField',
+    'uniformField', 'vortexField', 'volumeAxisField', 'volumeNoiseField',
+    'pointEmitter', 'fluidEmitter',
+])
+
+
+def parseCreateNode(line):
+    """
+    Return (nodeType, name, parent) for a createNode line.
+    Missing values are returned as empty strings.
+    """
+    tokens = line[len(CREATE_NODE):].split(None, 1)
+    if not tokens:
+        return '', '', ''
+
+    nodeType = tokens[0].rstrip(b';').decode('utf-8', 'replace')
+    name = parent = ''
+
+    if len(tokens) > 1:
+        for flag, value in FLAG_VALUE.findall(tokens[1]):
+            if flag in (b'n', b'name'):
+                name = value.decode('utf-8', 'replace')
+            else:
+                parent = value.decode('utf-8', 'replace')
+
+    return nodeType, name, parent
+
+
+def iterCreateNodes(fileName):
+    """
+    Yield (name, nodeType, parentPath) for every createNode statement.
+    parentPath is the long name of the parent, or '' for nodes at the top.
+    """
+    paths = {}
+
+    with open(fileName, 'rb') as f:
+        for line in f:
+            if not line.startswith(CREATE_NODE):
+                continue
+
+            nodeType, name, parent = parseCreateNode(line)
+            if not name:
+                continue
+
+            if parent:
+                if not parent.startswith('|'):
+                    parent = paths.get(parent, '|' + parent)
+                paths[name] = '%s|%s' % (parent, name)
+            elif nodeType in TOP_LEVEL_DAG_TYPES:
+                paths[name] = '|' + name
+
+            yield name, nodeType, parent
+
+
+def iterNodePaths(fileName):
+    """
+    Yield (longName, nodeType) for every node created in the file. Top level
+    nodes of other types than TOP_LEVEL_DAG_TYPES are held back until a node
+    is parented under them (a DAG node) or the file ends (a DG node), so
+    they do not come out in file order.
+    """
+    # name -> type of the top level nodes not known to be DAG nodes yet
+    pending = {}
+
+    for name, nodeType, parent in iterCreateNodes(fileName):
+        if parent:
+            top = parent[1:].split('|', 1)[0]
+            if top in pending:
+                yield '|' + top, pending.pop(top)
+            yield '%s|%s' % (parent, name), nodeType
+        elif nodeType in TOP_LEVEL_DAG_TYPES:
+            yield '|' + name, nodeType
+        else:
+            pending[name] = nodeType
+
+    for name in sorted(pending):
+        yield name, pending[name]
@@ -0,0 +1,231 @@
+"""
+Offline scene search over Maya ASCII files, without launching Maya.
+
+Files are parsed with maParser in a pool of worker processes. Each file becomes
+a sceneFilter.SceneSnapshot, so the searchScene query language works unchanged
+(attr: predicates excepted, they need a live scene). Results can be turned
+into a sceneNode.Node tree and browsed in the searchScene tree view.
+
+    # One pass, only the matches come back from the workers
+    results = searchFiles(findSceneFiles(['/shows/abc/shots']), 'type:skinCluster')
+
+    # Index once, query many times
+    index = OfflineIndex.build(findSceneFiles(['/shows/abc/shots']))
+    results = index.query('name:*_bind* parent:*spine*')
+
+Command line:
+    python offlineSearch.py "type:joint name:*_bind*" /shows/abc/shots -j 16
+"""
+import fnmatch
+import multiprocessing
+import os
+import sys
+import time
+
+import maParser
+import sceneFilter
+import sceneQuery
+from sceneNode import Node
+
+
+def findSceneFiles(roots, pattern='*.ma'):
+    """
+    Walk directory trees and return the sorted paths of matching scene files.
+    Plain file paths in roots are returned as is.
+    """
+    if not isinstance(roots, (list, tuple)):
+        roots = [roots]
+
+    files = []
+    for root in roots:
+        if os.path.isfile(root):
+            files.append(root)
+            continue
+
+        for dirPath, dirNames, fileNames in os.walk(root):
+            for fileName in fnmatch.filter(fileNames, pattern):
+                files.append(os.path.join(dirPath, fileName))
+
+    return sorted(files)
+
+
+def snapshotFile(fileName):
+    """
+    Parse a Maya ASCII file into a SceneSnapshot
+    """
+    paths = []
+    types = []
+    for path, nodeType in maParser.iterNodePaths(fileName):
+        paths.append(path)
+        types.append(nodeType)
+    return sceneFilter.SceneSnapshot(paths, types)
+
+
+def offlinePlan(text):
+    plan = sceneQuery.parseQuery(text)
+    if plan.requiresScene:
+        raise sceneQuery.QueryError('Attribute predicates are not supported offline')
+    return plan
+
+
+def queryRows(snapshot, plan):
+    backend = sceneQuery.SnapshotBackend(snapshot)
+    return plan.evaluate(range(len(snapshot)), backend)
+
+
+def _indexWorker(fileName):
+    try:
+        snapshot = snapshotFile(fileName)
+    except (IOError, OSError) as e:
+        return fileName, None, str(e)
+    return fileName, (snapshot.paths, snapshot.types), None
+
+
+def _searchWorker(args):
+    fileName, text = args
+    try:
+        snapshot = snapshotFile(fileName)
+    except (IOError, OSError) as e:
+        return fileName, None, str(e)
+
+    rows = queryRows(snapshot, offlinePlan(text))
+    return fileName, [(snapshot.paths[row], snapshot.types[row]) for row in rows], None
+
+
+def _imap(function, items, processes):
+    """
+    Map over a process pool, or in process when processes is 1
+    """
+    if processes == 1 or len(items) < 2:
+        for item in items:
+            yield function(item)
+        return
+
+    processes = processes or multiprocessing.cpu_count()
+    pool = multiprocessing.Pool(processes)
+    try:
+        chunkSize = max(1, len(items) // (processes * 8))
+        for result in pool.imap_unordered(function, items, chunkSize):
+            yield result
+    finally:
+        pool.close()
+        pool.join()
+
+
+class SearchResults(object):
+    """
+    Matches per file: matches[fileName] = [(longName, nodeType), ...]
+    Files that could not be read are listed in errors.
+    """
+    def __init__(self):
+        self.matches = {}
+        self.errors = {}
+        self.elapsed = 0.0
+
+    def __len__(self):
+        return len(self.matches)
+
+    def files(self):
+        return sorted(self.matches)
+
+    def toNodeTree(self):
+        """
+        Return a Node tree with one child per file and one grandchild per match
+        """
+        rootNode = Node('root')
+        for fileName in self.files():
+            fileNode = Node(os.path.basename(fileName), rootNode, nodeType='file', path=fileName)
+            for path, nodeType in self.matches[fileName]:
+                Node(sceneQuery.shortName(path), fileNode, nodeType=nodeType, path=path)
+        return rootNode
+
+
+def searchFiles(files, text, processes=None):
+    """
+    Parse and query every file in worker processes.
+    Only files with at least one match are kept in the results.
+    """
+    offlinePlan(text)
+    files = list(files)
+    results = SearchResults()
+    startTime = time.time()
+
+    for fileName, matches, error in _imap(_searchWorker, [(fileName, text) for fileName in files], processes):
+        if error is not None:
+            results.errors[fileName] = error
+        elif matches:
+            results.matches[fileName] = matches
+
+    results.elapsed = time.time() - startTime
+    return results
+
+
+class OfflineIndex(object):
+    """
+    In memory index of many scene files, one SceneSnapshot per file
+    """
+    def __init__(self):
+        self.snapshots = {}
+        self.errors = {}
+        self.elapsed = 0.0
+
+    def __len__(self):
+        return len(self.snapshots)
+
+    @classmethod
+    def build(cls, files, processes=None):
+        index = cls()
+        index.update(files, processes)
+        return index
+
+    def update(self, files, processes=None):
+        startTime = time.time()
+        for fileName, data, error in _imap(_indexWorker, list(files), processes):
+            if error is not None:
+                self.errors[fileName] = error
+                self.snapshots.pop(fileName, None)
+            else:
+                self.snapshots[fileName] = sceneFilter.SceneSnapshot(*data)
+        self.elapsed = time.time() - startTime
+
+    def query(self, text):
+        plan = offlinePlan(text)
+        results = SearchResults()
+        startTime = time.time()
+
+        for fileName, snapshot in self.snapshots.items():
+            rows = queryRows(snapshot, plan)
+            if rows:
+                results.matches[fileName] = [(snapshot.paths[row], snapshot.types[row]) for row in rows]
+
+        results.elapsed = time.time() - startTime
+        return results
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Search Maya ASCII files without Maya')
+    parser.add_argument('query', help='searchScene query, e.g. "type:joint name:*_bind*"')
+    parser.add_argument('roots', nargs='+', help='scene files or directories')
+    parser.add_argument('-j', '--processes', type=int, default=None, help='worker processes')
+    parser.add_argument('--pattern', default='*.ma', help='scene file pattern')
+    args = parser.parse_args(argv)
+
+    try:
+        results = searchFiles(findSceneFiles(args.roots, args.pattern), args.query, args.processes)
+    except sceneQuery.QueryError as e:
+        parser.error(str(e))
+
+    for fileName in results.files():
+        for path, nodeType in results.matches[fileName]:
+            sys.stdout.write('%s: %s (%s)\n' % (fileName, path, nodeType))
+    for fileName, error in sorted(results.errors.items()):
+        sys.stderr.write('%s: %s\n' % (fileName, error))
+
+    sys.stderr.write('%d matching files in %.2f seconds\n' % (len(results), results.elapsed))
+    return 1 if results.errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,286 @@
+"""
+Streaming export and diff of scene trees.
+
+Scenes are exported as one record per node, sorted by long name, either as
+text (path<TAB>type per line) or as JSON lines ({"path", "name", "type",
+"depth"}). Records are produced by generators and written in chunks, so a
+million node scene never exists as one big string.
+
+Two exports, snapshots or Node trees are compared with a merge of the two
+path sorted record streams: one pass, linear in the number of nodes, and
+exported files are streamed from disk without being loaded. The diff
+reports added, removed and retyped nodes.
+
+    # In Maya, before and after a rig build
+    sceneExport.exportScene('before.jsonl')
+    ...
+    sceneExport.exportScene('after.jsonl')
+    diff = sceneExport.diffFiles('before.jsonl', 'after.jsonl')
+    print(diff.summary())
+
+Command line, also reads Maya ASCII files directly:
+    python sceneExport.py export shot_v001.ma shot_v001.jsonl
+    python sceneExport.py diff shot_v001.jsonl shot_v002.ma --out changes.jsonl
+"""
+import json
+import sys
+import time
+
+import sceneQuery
+
+# Lines are written in chunks of this many records
+WRITE_CHUNK = 10000
+# Change lists in a SceneDiff are cut to this many entries, the counts are always complete
+MAX_LISTED = 100000
+
+
+def depthOf(path):
+    return path.count('|') - 1 if path.startswith('|') else 0
+
+
+def snapshotRecords(snapshot):
+    """
+    Yield the (path, type) rows of a SceneSnapshot sorted by path
+    """
+    paths, types = snapshot.paths, snapshot.types
+    for row in sorted(range(len(paths)), key=paths.__getitem__):
+        yield paths[row], types[row]
+
+
+def nodeRecords(rootNode, includeRoot=False):
+    """
+    Yield (path, type) of every node of a Node tree sorted by path. Nodes
+    without a path use their name.
+    """
+    records = [(node.path or node.name, node.typeInfo()) for node, depth in rootNode.walk()
+               if includeRoot or node is not rootNode]
+    records.sort()
+    for record in records:
+        yield record
+
+
+def textLines(records):
+    for path, nodeType in records:
+        yield '%s\t%s\n' % (path, nodeType)
+
+
+def jsonLines(records):
+    # Formatted directly, a dumps per record dict is several times slower
+    quote = json.dumps
+    for path, nodeType in records:
+        yield '{"depth": %d, "name": %s, "path": %s, "type": %s}\n' % (
+            depthOf(path), quote(sceneQuery.shortName(path)), quote(path), quote(nodeType))
+
+
+def isJsonLines(fileName):
+    return fileName.endswith('.jsonl') or fileName.endswith('.json')
+
+
+def writeLines(lines, fileName):
+    """
+    Write an iterable of lines in chunks, returns the line count
+    """
+    count = 0
+    chunk = []
+    with open(fileName, 'w') as f:
+        for line in lines:
+            chunk.append(line)
+            if len(chunk) >= WRITE_CHUNK:
+                f.write(''.join(chunk))
+                count += len(chunk)
+                chunk = []
+        f.write(''.join(chunk))
+        count += len(chunk)
+    return count
+
+
+def exportRecords(records, fileName):
+    """
+    Write path sorted (path, type) records as JSON lines for .jsonl/.json
+    files, as text otherwise. Returns the record count.
+    """
+    lines = jsonLines(records) if isJsonLines(fileName) else textLines(records)
+    return writeLines(lines, fileName)
+
+
+def exportSnapshot(snapshot, fileName):
+    return exportRecords(snapshotRecords(snapshot), fileName)
+
+
+def exportNodeTree(rootNode, fileName):
+    return exportRecords(nodeRecords(rootNode), fileName)
+
+
+def exportScene(fileName):
+    """
+    Export the current Maya scene from the shared scene index
+    """
+    import sceneIndex
+    return exportSnapshot(sceneIndex.getSceneIndex().snapshot(), fileName)
+
+
+def readRecords(fileName):
+    """
+    Stream (path, type) records from an export, or from the nodes of a Maya
+    ASCII file (sorted in memory, .ma files are not exported in order)
+    """
+    if fileName.endswith('.ma'):
+        import offlineSearch
+        for record in snapshotRecords(offlineSearch.snapshotFile(fileName)):
+            yield record
+        return
+
+    jsonFormat = isJsonLines(fileName)
+    with open(fileName) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            if jsonFormat:
+                record = json.loads(line)
+                yield record['path'], record['type']
+            else:
+                path, nodeType = line.rstrip('\n').split('\t', 1)
+                yield path, nodeType
+
+
+def iterDiff(before, after):
+    """
+    Merge two path sorted (path, type) streams and yield (change, path,
+    beforeType, afterType) with change 'added', 'removed' or 'retyped'.
+    Raises ValueError when a stream is not sorted.
+    """
+    before = iter(before)
+    after = iter(after)
+    done = object()
+    old = next(before, done)
+    new = next(after, done)
+    lastOld = lastNew = None
+
+    while old is not done or new is not done:
+        if old is not done and lastOld is not None and old[0] < lastOld:
+            raise ValueError('Records are not sorted by path at %s' % old[0])
+        if new is not done and lastNew is not None and new[0] < lastNew:
+            raise ValueError('Records are not sorted by path at %s' % new[0])
+
+        if new is done or (old is not done and old[0] < new[0]):
+            yield 'removed', old[0], old[1], None
+            lastOld = old[0]
+            old = next(before, done)
+        elif old is done or new[0] < old[0]:
+            yield 'added', new[0], None, new[1]
+            lastNew = new[0]
+            new = next(after, done)
+        else:
+            if old[1] != new[1]:
+                yield 'retyped', old[0], old[1], new[1]
+            lastOld, lastNew = old[0], new[0]
+            old = next(before, done)
+            new = next(after, done)
+
+
+class SceneDiff(object):
+    """
+    Counts and lists of the added, removed and retyped nodes between two scenes
+    """
+    CHANGES = ('added', 'removed', 'retyped')
+
+    def __init__(self):
+        self.counts = dict((change, 0) for change in self.CHANGES)
+        self.changes = dict((change, []) for change in self.CHANGES)
+        self.elapsed = 0.0
+
+    def __len__(self):
+        return sum(self.counts.values())
+
+    def add(self, change, path, beforeType, afterType):
+        self.counts[change] += 1
+        if len(self.changes[change]) < MAX_LISTED:
+            self.changes[change].append((path, beforeType, afterType))
+
+    def asDict(self):
+        return {'counts': self.counts, 'elapsed': self.elapsed,
+                'added': [{'path': path, 'type': afterType} for path, beforeType, afterType in self.changes['added']],
+                'removed': [{'path': path, 'type': beforeType}
+                            for path, beforeType, afterType in self.changes['removed']],
+                'retyped': [{'path': path, 'before': beforeType, 'after': afterType}
+                            for path, beforeType, afterType in self.changes['retyped']]}
+
+    def summary(self):
+        return '%d added, %d removed, %d retyped in %.2fs' % (
+            self.counts['added'], self.counts['removed'], self.counts['retyped'], self.elapsed)
+
+
+def diffRecords(before, after, out=None):
+    """
+    Diff two path sorted record streams into a SceneDiff. With out, every
+    change is also streamed to that file as a JSON line.
+    """
+    startTime = time.time()
+    diff = SceneDiff()
+    changes = iterDiff(before, after)
+
+    if out is None:
+        for change in changes:
+            diff.add(*change)
+    else:
+        def lines():
+            for change, path, beforeType, afterType in changes:
+                diff.add(change, path, beforeType, afterType)
+                yield json.dumps({'change': change, 'path': path, 'before': beforeType, 'after': afterType},
+                                 sort_keys=True) + '\n'
+        writeLines(lines(), out)
+
+    diff.elapsed = time.time() - startTime
+    return diff
+
+
+def diffFiles(beforeFile, afterFile, out=None):
+    return diffRecords(readRecords(beforeFile), readRecords(afterFile), out)
+
+
+def diffSnapshots(before, after, out=None):
+    return diffRecords(snapshotRecords(before), snapshotRecords(after), out)
+
+
+def diffNodeTrees(before, after, out=None):
+    return diffRecords(nodeRecords(before), nodeRecords(after), out)
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Export and diff scene node lists without Maya')
+    subparsers = parser.add_subparsers(dest='command')
+
+    exportParser = subparsers.add_parser('export', help='write the nodes of a .ma file sorted by path')
+    exportParser.add_argument('scene', help='Maya ASCII file')
+    exportParser.add_argument('output', help='.jsonl for JSON lines, anything else for text')
+
+    diffParser = subparsers.add_parser('diff', help='compare two exports or .ma files')
+    diffParser.add_argument('before')
+    diffParser.add_argument('after')
+    diffParser.add_argument('--out', help='write every change to this JSON lines file')
+    args = parser.parse_args(argv)
+
+    if args.command == 'export':
+        startTime = time.time()
+        count = exportRecords(readRecords(args.scene), args.output)
+        sys.stdout.write('%d nodes written to %s in %.2fs\n' % (count, args.output, time.time() - startTime))
+        return 0
+
+    if args.command == 'diff':
+        diff = diffFiles(args.before, args.after, args.out)
+        if args.out is None:
+            for change in SceneDiff.CHANGES:
+                for path, beforeType, afterType in diff.changes[change]:
+                    sys.stdout.write('%-8s %s (%s)\n' % (change, path, ' -> '.join(
+                        nodeType for nodeType in (beforeType, afterType) if nodeType)))
+        sys.stdout.write(diff.summary() + '\n')
+        return 1 if len(diff) else 0
+
+    parser.print_help()
+    return 2
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,79 @@
+"""
+Scene filtering helpers for SearchSceneUI.
+
+Filtering runs over an immutable SceneSnapshot instead of the live scene so it
+can be done off the GUI thread. Matches are yielded in batches of snapshot row
+indices so the view can show the first results before the full scan finishes.
+"""
+import sceneQuery
+
+DEFAULT_BATCH_SIZE = 500
+
+
+class SceneSnapshot(object):
+    """
+    Immutable copy of the scene node paths and types.
+    Rows are addressed by index, paths[i] is the long name of a node of type types[i]
+    and names[i] its short name.
+    """
+    __slots__ = ('paths', 'names', 'types')
+
+    def __init__(self, paths=(), types=()):
+        paths = tuple(paths)
+        types = tuple(types)
+
+        if len(paths) != len(types):
+            raise ValueError('Snapshot paths and types must be the same length')
+
+        object.__setattr__(self, 'paths', paths)
+        object.__setattr__(self, 'names', tuple(sceneQuery.shortName(path) for path in paths))
+        object.__setattr__(self, 'types', types)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('SceneSnapshot is immutable')
+
+    def __len__(self):
+        return len(self.names)
+
+    def row(self, index):
+        return self.paths[index], self.types[index]
+
+    @classmethod
+    def fromMaya(cls):
+        """
+        Build a snapshot with a single cmds.ls call.
+        ls(showType=True) returns a flat [name, type, name, type, ...] list.
+        """
+        import maya.cmds as cmds
+
+        flat = cmds.ls(long=True, showType=True) or []
+        return cls(flat[0::2], flat[1::2])
+
+
+def iterPlanMatches(snapshot, plan, batchSize=DEFAULT_BATCH_SIZE, isCancelled=None):
+    """
+    Yield lists of snapshot row indices accepted by a sceneQuery.QueryPlan.
+    The plan must not contain predicates that need the live scene, see QueryPlan.split().
+    isCancelled is polled once per batch, iteration stops as soon as it returns True.
+    """
+    backend = sceneQuery.SnapshotBackend(snapshot)
+    return plan.iterBatches(range(len(snapshot)), backend, batchSize, isCancelled)
+
+
+def iterMatches(snapshot, nameText='', typeText='', batchSize=DEFAULT_BATCH_SIZE, isCancelled=None):
+    """
+    Yield lists of snapshot row indices matching a query typed in the Name
+    field and a type substring typed in the Type field. Empty filters match everything.
+    """
+    plan = sceneQuery.parseQuery(nameText, typeText)
+    return iterPlanMatches(snapshot, plan, batchSize, isCancelled)
+
+
+def filterSnapshot(snapshot, nameText='', typeText=''):
+    """
+    Return every matching row index in one list.
+    """
+    matches = []
+    for batch in iterMatches(snapshot, nameText, typeText):
+        matches.extend(batch)
+    return matches
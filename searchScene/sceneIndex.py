@@ -0,0 +1,357 @@
+"""
+Scene index service shared by searchScene and other tools.
+
+The index is built once per scene and kept current with Maya message
+callbacks, so consumers read node names and types from it instead of
+querying Maya:
+
+    index = sceneIndex.getSceneIndex()
+    snapshot = index.snapshot()     # sceneFilter.SceneSnapshot
+
+Entries are keyed by node UUID (Maya 2016+) so renames and reparents only
+touch the affected nodes. Callbacks just record which nodes changed, the
+names and types are resolved in one pass the next time the index is read.
+While listeners are registered that pass is also scheduled with
+evalDeferred, so listeners hear about changes without anyone reading.
+
+With persist=True the index is written next to the scene file on save
+(<scene>.sceneIndex.json) and reloaded on open when the scene file's mtime
+and size still match, making reopening the scene or the tool instant.
+"""
+import json
+import os
+import time
+
+import maya.OpenMaya as om
+import maya.cmds as cmds
+
+import sceneFilter
+
+INDEX_FILE_SUFFIX = '.sceneIndex.json'
+INDEX_FILE_VERSION = 1
+
+_sceneIndex = None
+
+
+def getSceneIndex(persist=False):
+    """
+    Return the shared SceneIndex, creating and building it on first use
+    """
+    global _sceneIndex
+    if _sceneIndex is None:
+        _sceneIndex = SceneIndex(persist=persist)
+        _sceneIndex.start()
+    elif persist:
+        _sceneIndex.persist = True
+    return _sceneIndex
+
+
+def releaseSceneIndex():
+    """
+    Remove the shared index callbacks, e.g. before reloading the module
+    """
+    global _sceneIndex
+    if _sceneIndex is not None:
+        _sceneIndex.stop()
+        _sceneIndex = None
+
+
+def indexFileName(sceneFile):
+    return sceneFile + INDEX_FILE_SUFFIX
+
+
+def sceneFileKey(sceneFile):
+    """
+    Return (mtime, size) of a scene file, or None when it is not on disk
+    """
+    try:
+        stat = os.stat(sceneFile)
+    except OSError:
+        return None
+    return [stat.st_mtime, stat.st_size]
+
+
+class SceneIndex(object):
+    """
+    uuid -> (longName, nodeType) for every node in the scene
+    """
+    def __init__(self, persist=False):
+        self.persist = persist
+        self.entries = {}
+        self.version = 0
+        self.buildTime = 0.0
+        self.loadedFromDisk = False
+
+        self.listeners = []
+        self.callbackIds = []
+        self.dirtyHandles = []
+        self.removedUuids = set()
+        self.suspended = False
+        self.needsRebuild = True
+        self.updateScheduled = False
+
+        self._snapshot = None
+        self._snapshotVersion = -1
+
+    # ---- Lifetime ----
+
+    def start(self):
+        if self.callbackIds:
+            return
+
+        self.callbackIds = [
+            om.MDGMessage.addNodeAddedCallback(self._nodeAdded, 'dependNode'),
+            om.MDGMessage.addNodeRemovedCallback(self._nodeRemoved, 'dependNode'),
+            om.MNodeMessage.addNameChangedCallback(om.MObject(), self._nameChanged),
+            om.MDagMessage.addAllDagChangesCallback(self._dagChanged),
+            om.MSceneMessage.addCallback(om.MSceneMessage.kAfterSave, self._sceneSaved),
+        ]
+
+        for before, after in [(om.MSceneMessage.kBeforeOpen, om.MSceneMessage.kAfterOpen),
+                              (om.MSceneMessage.kBeforeNew, om.MSceneMessage.kAfterNew),
+                              (om.MSceneMessage.kBeforeImport, om.MSceneMessage.kAfterImport),
+                              (om.MSceneMessage.kBeforeCreateReference, om.MSceneMessage.kAfterCreateReference),
+                              (om.MSceneMessage.kBeforeLoadReference, om.MSceneMessage.kAfterLoadReference),
+                              (om.MSceneMessage.kBeforeUnloadReference, om.MSceneMessage.kAfterUnloadReference)]:
+            self.callbackIds.append(om.MSceneMessage.addCallback(before, self._suspend))
+            self.callbackIds.append(om.MSceneMessage.addCallback(after, self._resume))
+
+        self.needsRebuild = True
+
+    def stop(self):
+        for callbackId in self.callbackIds:
+            om.MMessage.removeCallback(callbackId)
+        self.callbackIds = []
+
+    def addListener(self, listener):
+        """
+        listener(changedUuids, removedUuids) is called after each update,
+        at the latest when Maya is next idle after a change
+        """
+        if listener not in self.listeners:
+            self.listeners.append(listener)
+
+    def removeListener(self, listener):
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+
+    # ---- Reading ----
+
+    def __len__(self):
+        self.update()
+        return len(self.entries)
+
+    def get(self, uuid):
+        self.update()
+        return self.entries.get(uuid)
+
+    def items(self):
+        self.update()
+        return list(self.entries.items())
+
+    def snapshot(self):
+        """
+        Return an immutable SceneSnapshot, rebuilt only when the index changed
+        """
+        self.update()
+        if self._snapshot is None or self._snapshotVersion != self.version:
+            values = list(self.entries.values())
+            self._snapshot = sceneFilter.SceneSnapshot([path for path, nodeType in values],
+                                                       [nodeType for path, nodeType in values])
+            self._snapshotVersion = self.version
+        return self._snapshot
+
+    # ---- Updating ----
+
+    def update(self):
+        """
+        Apply pending changes, or rebuild after a scene open/new/import
+        """
+        if self.suspended:
+            return
+
+        if self.needsRebuild:
+            self.rebuild()
+            return
+
+        if not self.dirtyHandles and not self.removedUuids:
+            return
+
+        handles = self.dirtyHandles
+        removed = self.removedUuids
+        self.dirtyHandles = []
+        self.removedUuids = set()
+
+        changed = set()
+        for handle in handles:
+            if not handle.isValid():
+                continue
+            uuid, entry = self._resolve(handle.object())
+            changed.add(uuid)
+            self.entries[uuid] = entry
+
+        for uuid in removed - changed:
+            self.entries.pop(uuid, None)
+
+        self.version += 1
+        self._notify(changed, removed - changed)
+
+    def rebuild(self):
+        """
+        Build the index from disk when a matching index file exists, else from the scene
+        """
+        self.needsRebuild = False
+        self.dirtyHandles = []
+        self.removedUuids = set()
+        startTime = time.time()
+
+        self.loadedFromDisk = self.persist and self.load()
+        if not self.loadedFromDisk:
+            self.entries = self._scanScene()
+
+        self.buildTime = time.time() - startTime
+        self.version += 1
+        self._notify(set(self.entries), set())
+
+    def _scanScene(self):
+        """
+        Two bulk cmds.ls calls list every node's long name, type and uuid in
+        the same order. Fall back to iterating the API if the lists disagree.
+        """
+        flat = cmds.ls(long=True, showType=True) or []
+        uuids = cmds.ls(uuid=True) or []
+
+        if len(uuids) * 2 == len(flat):
+            return dict(zip(uuids, zip(flat[0::2], flat[1::2])))
+
+        entries = {}
+        nodeIt = om.MItDependencyNodes()
+        while not nodeIt.isDone():
+            uuid, entry = self._resolve(nodeIt.thisNode())
+            entries[uuid] = entry
+            nodeIt.next()
+        return entries
+
+    def _resolve(self, node):
+        nodeFn = om.MFnDependencyNode(node)
+        uuid = nodeFn.uuid().asString()
+
+        if node.hasFn(om.MFn.kDagNode):
+            dagPath = om.MDagPath()
+            om.MDagPath.getAPathTo(node, dagPath)
+            return uuid, (dagPath.fullPathName(), nodeFn.typeName())
+
+        return uuid, (nodeFn.name(), nodeFn.typeName())
+
+    def _notify(self, changed, removed):
+        for listener in list(self.listeners):
+            listener(changed, removed)
+
+    # ---- Persistence ----
+
+    def save(self, sceneFile=None):
+        """
+        Write the index next to the scene file
+        """
+        sceneFile = sceneFile or cmds.file(q=True, sceneName=True)
+        key = sceneFileKey(sceneFile) if sceneFile else None
+        if key is None:
+            return False
+
+        self.update()
+        data = {
+            'version': INDEX_FILE_VERSION,
+            'sceneKey': key,
+            'entries': [[uuid, path, nodeType] for uuid, (path, nodeType) in self.entries.items()],
+        }
+        with open(indexFileName(sceneFile), 'w') as f:
+            json.dump(data, f, separators=(',', ':'))
+        return True
+
+    def load(self, sceneFile=None):
+        """
+        Load the index saved next to the scene file.
+        Returns False when there is none or it is out of date.
+        """
+        sceneFile = sceneFile or cmds.file(q=True, sceneName=True)
+        if not sceneFile or cmds.file(q=True, modified=True):
+            return False
+
+        fileName = indexFileName(sceneFile)
+        if not os.path.exists(fileName):
+            return False
+
+        try:
+            with open(fileName) as f:
+                data = json.load(f)
+        except (IOError, ValueError):
+            return False
+
+        if data.get('version') != INDEX_FILE_VERSION or data.get('sceneKey') != sceneFileKey(sceneFile):
+            return False
+
+        self.entries = dict((uuid, (path, nodeType)) for uuid, path, nodeType in data['entries'])
+        return True
+
+    # ---- Callbacks ----
+
+    def _scheduleUpdate(self):
+        """
+        Run update() once when Maya is idle, for the listeners
+        """
+        if self.listeners and not self.updateScheduled:
+            self.updateScheduled = True
+            cmds.evalDeferred(self._deferredUpdate, lowestPriority=True)
+
+    def _deferredUpdate(self):
+        self.updateScheduled = False
+        self.update()
+
+    def _suspend(self, *args):
+        self.suspended = True
+
+    def _resume(self, *args):
+        self.suspended = False
+        self.needsRebuild = True
+        self._scheduleUpdate()
+
+    def _markDirty(self, node):
+        if not self.suspended and not self.needsRebuild:
+            self.dirtyHandles.append(om.MObjectHandle(node))
+            self._scheduleUpdate()
+
+    def _markSubtreeDirty(self, dagPath):
+        if self.suspended or self.needsRebuild:
+            return
+
+        dagIt = om.MItDag()
+        dagIt.reset(dagPath, om.MItDag.kDepthFirst)
+        while not dagIt.isDone():
+            self.dirtyHandles.append(om.MObjectHandle(dagIt.currentItem()))
+            dagIt.next()
+        self._scheduleUpdate()
+
+    def _nodeAdded(self, node, *args):
+        self._markDirty(node)
+
+    def _nodeRemoved(self, node, *args):
+        if self.suspended or self.needsRebuild:
+            return
+        self.removedUuids.add(om.MFnDependencyNode(node).uuid().asString())
+        self._scheduleUpdate()
+
+    def _nameChanged(self, node, prevName, *args):
+        if node.hasFn(om.MFn.kDagNode):
+            dagPath = om.MDagPath()
+            om.MDagPath.getAPathTo(node, dagPath)
+            self._markSubtreeDirty(dagPath)
+        else:
+            self._markDirty(node)
+
+    def _dagChanged(self, msgType, child, parent, *args):
+        if child.isValid():
+            self._markSubtreeDirty(child)
+
+    def _sceneSaved(self, *args):
+        if self.persist:
+            self.save()
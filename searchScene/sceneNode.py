@@ -0,0 +1,79 @@
+"""
+Scene tree node shared by the live and offline scene searches.
+Maya is only imported when a node without a cached type is asked for its type,
+so trees of offline results can be built under plain python.
+"""
+
+
+class Node(object):
+    def __init__(self, name, parent=None, nodeType=None, path=None):
+        self.name = name
+        self.nodeType = nodeType
+        self.path = path
+        self.children = []
+        self.parent = parent
+
+        if parent is not None:
+            parent.addChild(self)
+
+    def typeInfo(self):
+        if self.nodeType is not None:
+            return self.nodeType
+
+        import maya.cmds as cmds
+        if cmds.objExists(self.name):
+            return cmds.objectType(self.name)
+        return "NODE"
+
+    def addChild(self, child):
+        self.children.append(child)
+
+    def name(self):
+        return self.name
+
+    def setName(self, name):
+        self.name = name
+
+    def child(self, row):
+        return self.children[row]
+
+    def childCount(self):
+        return len(self.children)
+
+    def parent(self):
+        return self.parent
+
+    def row(self):
+        if self.parent is not None:
+            return self.parent.children.index(self)
+
+    def walk(self, depth=0):
+        """
+        Yield (node, depth) for this node and its descendants, depth first.
+        Iterative so deep hierarchies do not hit the recursion limit.
+        """
+        stack = [(self, depth)]
+        while stack:
+            node, depth = stack.pop()
+            yield node, depth
+            for child in reversed(node.children):
+                stack.append((child, depth + 1))
+
+    def iterLog(self, tabLevel=0):
+        """
+        Yield the lines of log() one at a time
+        """
+        stack = [(self, tabLevel, False)]
+        while stack:
+            node, level, closing = stack.pop()
+            if closing:
+                yield "\n"
+                continue
+
+            yield "\t" * level + "/------" + node.name + "\n"
+            stack.append((node, level, True))
+            for child in reversed(node.children):
+                stack.append((child, level + 1, False))
+
+    def log(self, tabLevel=-1):
+        return "".join(self.iterLog(tabLevel + 1))
@@ -0,0 +1,381 @@
+"""
+Structured queries for searchScene.
+
+A query such as
+
+    type:joint name:*_bind* attr:visibility=0 parent:*spine*
+
+is parsed into a QueryPlan of predicates. The plan runs the cheapest
+predicates first and evaluates each predicate over the whole candidate set in
+one bulk call to its backend, so the number of Maya calls is proportional to
+the number of predicates rather than the number of nodes.
+
+Pattern rules:
+    - patterns containing * ? or [ are fnmatch globs
+    - otherwise name and parent patterns match as substrings, type patterns
+      must match the node type exactly
+    - words without a key are name patterns
+
+Backends:
+    SnapshotBackend evaluates name, type and parent predicates against a
+    SceneSnapshot without touching Maya. MayaBackend evaluates every predicate
+    against the live scene with one cmds.ls or API pass per predicate.
+"""
+import fnmatch
+import os
+import re
+import shlex
+import sys
+import time
+
+GLOB_CHARS = re.compile(r'[*?\[]')
+ATTR_EXPR = re.compile(r'^([^=!<>]+)(==|=|!=|>=|<=|>|<)?(.*)$')
+
+
+class QueryError(Exception):
+    pass
+
+
+def isGlob(pattern):
+    return GLOB_CHARS.search(pattern) is not None
+
+
+def makeMatcher(pattern, substring=True):
+    """
+    Return a function testing a string against pattern
+    """
+    if isGlob(pattern):
+        return lambda text: fnmatch.fnmatchcase(text, pattern)
+    if substring:
+        return lambda text: pattern in text
+    return lambda text: text == pattern
+
+
+def shortName(path):
+    return path.rsplit('|', 1)[-1]
+
+
+def parentPath(path):
+    if '|' not in path:
+        return ''
+    return path.rsplit('|', 1)[0]
+
+
+class Predicate(object):
+    """
+    Base predicate. Subclasses filter a list of backend items in one pass.
+    """
+    key = ''
+    cost = 0
+    requiresScene = False
+
+    def __init__(self, pattern):
+        self.pattern = pattern
+        self.elapsed = 0.0
+        self.inputCount = 0
+        self.outputCount = 0
+
+    def __repr__(self):
+        return '%s:%s' % (self.key, self.pattern)
+
+    def resetStats(self):
+        self.elapsed = 0.0
+        self.inputCount = 0
+        self.outputCount = 0
+
+    def evaluate(self, items, backend):
+        startTime = time.time()
+        result = self.filter(items, backend)
+        self.elapsed += time.time() - startTime
+        self.inputCount += len(items)
+        self.outputCount += len(result)
+        return result
+
+    def filter(self, items, backend):
+        raise NotImplementedError
+
+
+class NamePredicate(Predicate):
+    key = 'name'
+    cost = 1
+
+    def filter(self, items, backend):
+        match = makeMatcher(self.pattern)
+        return [item for item, name in zip(items, backend.names(items)) if match(name)]
+
+
+class TypePredicate(Predicate):
+    key = 'type'
+    cost = 2
+
+    def __init__(self, pattern, substring=False):
+        super(TypePredicate, self).__init__(pattern)
+        self.substring = substring
+
+    def filter(self, items, backend):
+        match = makeMatcher(self.pattern, substring=self.substring)
+        return [item for item, nodeType in zip(items, backend.types(items)) if match(nodeType)]
+
+
+class ParentPredicate(Predicate):
+    """
+    Matches the parent's short name or its full path
+    """
+    key = 'parent'
+    cost = 3
+
+    def filter(self, items, backend):
+        match = makeMatcher(self.pattern)
+        result = []
+        for item, parent in zip(items, backend.parents(items)):
+            if parent and (match(shortName(parent)) or match(parent)):
+                result.append(item)
+        return result
+
+
+class AttrPredicate(Predicate):
+    """
+    attr:name tests that the attribute exists,
+    attr:name<op>value compares its value with = != > < >= <=
+    """
+    key = 'attr'
+    cost = 10
+    requiresScene = True
+
+    def __init__(self, pattern):
+        super(AttrPredicate, self).__init__(pattern)
+        match = ATTR_EXPR.match(pattern)
+        if match is None or not match.group(1):
+            raise QueryError('Invalid attribute predicate: %s' % pattern)
+
+        self.attr = match.group(1)
+        self.op = match.group(2)
+        self.value = match.group(3)
+
+        if self.op == '==':
+            self.op = '='
+        if self.op and not self.value:
+            raise QueryError('Missing value in attribute predicate: %s' % pattern)
+
+    def compare(self, value):
+        if value is None:
+            return False
+        if not self.op:
+            return True
+
+        expected = self.value
+        try:
+            value = float(value)
+            expected = float(expected)
+        except (TypeError, ValueError):
+            value = str(value)
+
+        if self.op == '=':
+            return value == expected
+        if self.op == '!=':
+            return value != expected
+        if self.op == '>':
+            return value > expected
+        if self.op == '<':
+            return value < expected
+        if self.op == '>=':
+            return value >= expected
+        return value <= expected
+
+    def filter(self, items, backend):
+        values = backend.attrValues(items, self.attr, valueNeeded=bool(self.op))
+        return [item for item, value in zip(items, values) if self.compare(value)]
+
+
+PREDICATES = {
+    'name': NamePredicate,
+    'type': TypePredicate,
+    'parent': ParentPredicate,
+    'attr': AttrPredicate,
+}
+
+
+class QueryPlan(object):
+    """
+    An ordered list of predicates, cheapest first.
+    """
+    def __init__(self, predicates=()):
+        self.predicates = sorted(predicates, key=lambda predicate: predicate.cost)
+
+    def __repr__(self):
+        return 'QueryPlan(%s)' % ' '.join(repr(predicate) for predicate in self.predicates)
+
+    def __len__(self):
+        return len(self.predicates)
+
+    @property
+    def requiresScene(self):
+        return any(predicate.requiresScene for predicate in self.predicates)
+
+    def split(self):
+        """
+        Return (offlinePlan, scenePlan). The offline plan can run on a snapshot
+        off the GUI thread, the scene plan needs the live scene.
+        """
+        offline = [predicate for predicate in self.predicates if not predicate.requiresScene]
+        scene = [predicate for predicate in self.predicates if predicate.requiresScene]
+        return QueryPlan(offline), QueryPlan(scene)
+
+    def resetStats(self):
+        for predicate in self.predicates:
+            predicate.resetStats()
+
+    def evaluate(self, items, backend):
+        """
+        Filter items through every predicate and return the survivors
+        """
+        items = list(items)
+        for predicate in self.predicates:
+            if not items:
+                break
+            items = predicate.evaluate(items, backend)
+        return items
+
+    def iterBatches(self, items, backend, batchSize=500, isCancelled=None):
+        """
+        Evaluate items in slices, yielding the non empty results of each slice.
+        isCancelled is polled between slices.
+        """
+        items = list(items)
+        batchSize = max(1, int(batchSize))
+
+        for start in range(0, len(items), batchSize):
+            if isCancelled is not None and isCancelled():
+                return
+
+            batch = self.evaluate(items[start:start + batchSize], backend)
+            if batch:
+                yield batch
+
+    def explain(self):
+        """
+        Return a readable report of the plan and the timings of its last runs
+        """
+        lines = []
+        for step, predicate in enumerate(self.predicates):
+            lines.append('%d. %-30s cost=%-3d in=%-8d out=%-8d %.4fs'
+                         % (step + 1, repr(predicate), predicate.cost, predicate.inputCount,
+                            predicate.outputCount, predicate.elapsed))
+        return '\n'.join(lines)
+
+
+def parseQuery(text, typeText=''):
+    """
+    Parse a query string into a QueryPlan.
+    typeText is an extra type substring, used by the Type field of the UI.
+    """
+    try:
+        tokens = shlex.split(text or '')
+    except ValueError as e:
+        raise QueryError('Could not parse query: %s' % e)
+
+    predicates = []
+    for token in tokens:
+        key, sep, value = token.partition(':')
+        if sep and key in PREDICATES:
+            if not value:
+                raise QueryError('Missing pattern for %s:' % key)
+            predicates.append(PREDICATES[key](value))
+        else:
+            predicates.append(NamePredicate(token))
+
+    if typeText:
+        predicates.append(TypePredicate(typeText, substring=True))
+
+    return QueryPlan(predicates)
+
+
+class SnapshotBackend(object):
+    """
+    Evaluates predicates on SceneSnapshot row indices
+    """
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+
+    def names(self, rows):
+        names = self.snapshot.names
+        return [names[row] for row in rows]
+
+    def types(self, rows):
+        types = self.snapshot.types
+        return [types[row] for row in rows]
+
+    def parents(self, rows):
+        paths = self.snapshot.paths
+        return [parentPath(paths[row]) for row in rows]
+
+    def attrValues(self, rows, attr, valueNeeded=True):
+        raise QueryError('Attribute predicates need the live scene')
+
+
+def importBatching():
+    """
+    tbCommon.batching, with the mayaTools root added to sys.path when needed
+    """
+    try:
+        from tbCommon import batching
+    except ImportError:
+        sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        from tbCommon import batching
+    return batching
+
+
+class MayaBackend(object):
+    """
+    Evaluates predicates on long node names with one bulk query per predicate
+    """
+    def names(self, paths):
+        return [shortName(path) for path in paths]
+
+    def types(self, paths):
+        import maya.cmds as cmds
+
+        flat = cmds.ls(paths, long=True, showType=True) or []
+        typeMap = dict(zip(flat[0::2], flat[1::2]))
+        return [typeMap.get(path, '') for path in paths]
+
+    def parents(self, paths):
+        return [parentPath(path) for path in paths]
+
+    def attrValues(self, paths, attr, valueNeeded=True):
+        """
+        Plug existence and values are read with two flushes of a
+        tbCommon.batching CommandBatch rather than one getAttr per node.
+        Values follow getAttr conventions, e.g. angles in degrees.
+        """
+        batching = importBatching()
+        batch = batching.CommandBatch(batching.MayaBackend())
+
+        found = [batch.exists('%s.%s' % (path, attr)) for path in paths]
+        batch.flush()
+
+        if not valueNeeded:
+            return [True if exists.get() else None for exists in found]
+
+        pending = [batch.getAttr(path, attr) if exists.get() else None for path, exists in zip(paths, found)]
+        batch.flush()
+        return [value.get() if value is not None else None for value in pending]
+
+    def allNodes(self):
+        import maya.cmds as cmds
+
+        return cmds.ls(long=True) or []
+
+
+def runQuery(text, backend=None, items=None):
+    """
+    Evaluate a query against the live scene and return (matches, plan).
+    Print plan.explain() to see the per predicate timings.
+    """
+    if backend is None:
+        backend = MayaBackend()
+    if items is None:
+        items = backend.allNodes()
+
+    plan = parseQuery(text)
+    return plan.evaluate(items, backend), plan
@@ -4,57 +4,13 @@ import maya.OpenMayaUI as omui
 import maya.cmds as cmds
 from functools import partial
 
-class Node(object):
-    def __init__(self, name, parent=None):
-        self.name = name
-        self.children = []
-        self.parent = parent
+import sceneFilter
+import sceneIndex
+import sceneQuery
+import selectionSets
+from sceneNode import Node
 
-        if parent is not None:
-            parent.addChild(self)
-
-    def typeInfo(self):
-        if cmds.objExists(self.name):
-            return cmds.objectType(self.name)
-        return "NODE"
-
-    def addChild(self, child):
-        self.children.append(child)
-
-    def name(self):
-        return self.name
-
-    def setName(self, name):
-        self.name = name
-
-    def child(self, row):
-        return self.children[row]
-
-    def childCount(self):
-        return len(self.children)
-
-    def parent(self):
-        return self.parent
-
-    def row(self):
-        if self.parent is not None:
-            return self.parent.children.index(self)
-
-    def log(self, tabLevel=-1):
-        output = ""
-        tabLevel += 1
-
-        for i in range(tabLevel):
-            output += "\t"
-
-        output += "/------" + self.name + "\n"
-
-        for child in self.children:
-            output += child.log(tabLevel)
-
-        tabLevel -= 1
-        output += "\n"
-        return output
+FILTER_DELAY_MS = 150
 
 class SceneGraphModel(QtCore.QAbstractItemModel):
     def __init__(self, root, parent=None):
@@ -132,21 +88,150 @@ class SceneGraphModel(QtCore.QAbstractItemModel):
             return QtCore.QModelIndex()
 
     def itemFromIndex(self, index):
-        return index.internalPointer().name
+        node = index.internalPointer()
+        return node.path or node.name
+
+    def clear(self):
+        self.beginResetModel()
+        self.rootNode.children = []
+        self.endResetModel()
+
+    def appendNodes(self, nodes):
+        """
+        Insert a batch of nodes under the root with a single row insertion
+        """
+        if not nodes:
+            return
+
+        first = self.rootNode.childCount()
+        self.beginInsertRows(QtCore.QModelIndex(), first, first + len(nodes) - 1)
+        for node in nodes:
+            node.parent = self.rootNode
+            self.rootNode.addChild(node)
+        self.endInsertRows()
+
+class FilterThread(QtCore.QThread):
+    """
+    Filters a SceneSnapshot off the GUI thread and emits the matches in batches.
+    Each query carries a generation number so stale batches can be ignored.
+    """
+    batchReady = QtCore.Signal(int, list)
+
+    def __init__(self, generation, snapshot, plan, parent=None):
+        super(FilterThread, self).__init__(parent)
+        self.generation = generation
+        self.snapshot = snapshot
+        self.plan = plan
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def run(self):
+        batches = sceneFilter.iterPlanMatches(self.snapshot, self.plan, isCancelled=lambda: self.cancelled)
+        for batch in batches:
+            self.batchReady.emit(self.generation, batch)
+
+class FilterController(QtCore.QObject):
+    """
+    Debounces keystrokes, runs the newest query on a FilterThread and streams
+    the matching rows into the model. Starting a query cancels the previous one.
+    Predicates needing the live scene (attr:) run on the GUI thread, one bulk
+    query per incoming batch.
+    """
+    statusChanged = QtCore.Signal(str)
+
+    def __init__(self, model, snapshot, parent=None):
+        super(FilterController, self).__init__(parent)
+        self.model = model
+        self.snapshot = snapshot
+        self.generation = 0
+        self.threads = []
+        self.pending = ('', '')
+        self.plan = sceneQuery.QueryPlan()
+        self.scenePlan = sceneQuery.QueryPlan()
+        self.sceneBackend = sceneQuery.MayaBackend()
+
+        self.timer = QtCore.QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(FILTER_DELAY_MS)
+        self.timer.timeout.connect(self.startQuery)
+
+    def setFilter(self, nameText, typeText):
+        self.pending = (nameText, typeText)
+        self.timer.start()
+
+    def cancel(self):
+        for thread in self.threads:
+            thread.cancel()
+
+    def startQuery(self):
+        self.cancel()
+        self.generation += 1
+        self.model.clear()
+
+        nameText, typeText = self.pending
+        try:
+            self.plan = sceneQuery.parseQuery(nameText, typeText)
+        except sceneQuery.QueryError as e:
+            self.statusChanged.emit(str(e))
+            return
+        self.statusChanged.emit('')
+
+        offlinePlan, self.scenePlan = self.plan.split()
+        thread = FilterThread(self.generation, self.snapshot, offlinePlan)
+        thread.batchReady.connect(self.addBatch, QtCore.Qt.QueuedConnection)
+        thread.finished.connect(self.threadFinished, QtCore.Qt.QueuedConnection)
+        self.threads.append(thread)
+        thread.start()
+
+    @QtCore.Slot(int, list)
+    def addBatch(self, generation, rows):
+        if generation != self.generation:
+            return
+
+        paths = self.snapshot.paths
+        if len(self.scenePlan):
+            rowsByPath = dict((paths[i], i) for i in rows)
+            rows = [rowsByPath[path] for path in self.scenePlan.evaluate(list(rowsByPath), self.sceneBackend)]
+
+        names = self.snapshot.names
+        types = self.snapshot.types
+        self.model.appendNodes([Node(names[i], nodeType=types[i], path=paths[i]) for i in rows])
+
+    def threadFinished(self):
+        self.threads = [thread for thread in self.threads if thread.isRunning()]
 
 def getMayaWindow():
     pointer = omui.MQtUtil.mainWindow()
     if pointer is not None:
         return wrapInstance(long(pointer), QtGui.QWidget)
 
+def showNodeTree(rootNode, title="Search Results"):
+    """
+    Browse a Node tree, e.g. offlineSearch.SearchResults.toNodeTree(), in a tree view
+    """
+    model = SceneGraphModel(rootNode)
+    proxyModel = QtGui.QSortFilterProxyModel()
+    proxyModel.setSourceModel(model)
+
+    treeView = QtGui.QTreeView(parent=getMayaWindow())
+    treeView.setWindowFlags(QtCore.Qt.Window)
+    treeView.setWindowTitle(title)
+    treeView.setModel(proxyModel)
+    treeView.setSortingEnabled(True)
+    proxyModel.sort(0, QtCore.Qt.AscendingOrder)
+    treeView.resizeColumnToContents(0)
+    treeView.resize(450, 600)
+    treeView.show()
+    return treeView
+
 class SearchSceneUI(object):
     def __init__(self):
         rootNode = Node("root")
         model = SceneGraphModel(rootNode)
 
-        dagNodes = sorted(cmds.ls())
-        for dagNode in cmds.ls():
-            childNode = Node(dagNode, rootNode)
+        self.snapshot = sceneIndex.getSceneIndex().snapshot()
 
         windowName = "windowObjectName"
 
@@ -164,6 +249,7 @@ class SearchSceneUI(object):
         topLayout = QtGui.QHBoxLayout()
         nameLabel = QtGui.QLabel("Name:")
         self.nameLineEdit = QtGui.QLineEdit()
+        self.nameLineEdit.setPlaceholderText('pCube* or type:joint name:*_bind* attr:visibility=0 parent:*spine*')
         typeLabel = QtGui.QLabel("Type:")
         self.typeLineEdit = QtGui.QLineEdit()
 
@@ -177,6 +263,9 @@ class SearchSceneUI(object):
         self.proxyModel.setDynamicSortFilter(True)
         self.proxyModel.setSourceModel(model)
 
+        self.filterController = FilterController(model, self.snapshot, mainWindow)
+        self.filterController.statusChanged.connect(mainWindow.statusBar().showMessage)
+
         treeView = QtGui.QTreeView(parent=getMayaWindow())
         treeView.setWindowFlags(QtCore.Qt.Window)
         treeView.setModel(self.proxyModel)
@@ -186,7 +275,21 @@ class SearchSceneUI(object):
         self.proxyModel.sort(0, QtCore.Qt.AscendingOrder)
         mainLayout.addWidget(treeView)
 
-        treeView.clicked.connect(partial(self.selectItem))
+        # Any number of rows can be selected, they go to Maya as one select
+        treeView.setSelectionMode(QtGui.QAbstractItemView.ExtendedSelection)
+        treeView.setSelectionBehavior(QtGui.QAbstractItemView.SelectRows)
+        self.treeView = treeView
+
+        buttonLayout = QtGui.QHBoxLayout()
+        selectAllBtn = QtGui.QPushButton("Select All Matches")
+        saveSetBtn = QtGui.QPushButton("Save as Live Set...")
+        mainLayout.addLayout(buttonLayout)
+        buttonLayout.addWidget(selectAllBtn)
+        buttonLayout.addWidget(saveSetBtn)
+
+        treeView.selectionModel().selectionChanged.connect(partial(self.selectRows))
+        selectAllBtn.clicked.connect(partial(self.selectAllMatches))
+        saveSetBtn.clicked.connect(partial(self.saveLiveSet))
         self.nameLineEdit.textChanged.connect(partial(self.lineEditModified))
         self.typeLineEdit.textChanged.connect(partial(self.lineEditModified))
 
@@ -194,26 +297,46 @@ class SearchSceneUI(object):
         height = treeView.frameGeometry().height()
         mainWindow.resize(450, 600)
         mainWindow.show()
+        self.mainWindow = mainWindow
+
+        self.filterController.startQuery()
 
-    def selectItem(self, index, *args):
+    def selectRows(self, *args):
+        """
+        Select the nodes of every selected row in Maya with one select call
+        """
         sourceModel = self.proxyModel.sourceModel()
-        mappedIndex = self.proxyModel.mapToSource(index)
-        obj = sourceModel.itemFromIndex(mappedIndex)
+        paths = [sourceModel.itemFromIndex(self.proxyModel.mapToSource(index))
+                 for index in self.treeView.selectionModel().selectedRows(0)]
+        selectionSets.selectPaths(paths)
+
+    def matchingPaths(self):
+        return [node.path or node.name for node in self.proxyModel.sourceModel().rootNode.children]
+
+    def selectAllMatches(self, *args):
+        """
+        Select every match of the current filter, including rows not in view
+        """
+        selected = selectionSets.selectPaths(self.matchingPaths())
+        self.mainWindow.statusBar().showMessage('Selected %d nodes' % len(selected))
+
+    def saveLiveSet(self, *args):
+        """
+        Save the current query as a set that follows scene changes
+        """
+        setName, ok = QtGui.QInputDialog.getText(self.mainWindow, "Save as Live Set", "Set name:",
+                                                 text="searchSceneSet")
+        if not ok or not setName:
+            return
 
-        if obj is not None and cmds.objExists(obj):
-            cmds.select(obj, replace=True)
+        try:
+            liveSet = selectionSets.createLiveSet(str(setName), self.nameLineEdit.text(), self.typeLineEdit.text())
+        except sceneQuery.QueryError as e:
+            self.mainWindow.statusBar().showMessage(str(e))
             return
-        cmds.select(clear=1)
+        self.mainWindow.statusBar().showMessage('%s: %d nodes, kept up to date' % (liveSet.setName, len(liveSet)))
 
     def lineEditModified(self, *args):
-        if self.nameLineEdit.isModified():
-            lineEdit = self.nameLineEdit
-            filterKeyColumn = 0
-        else:
-            lineEdit = self.typeLineEdit
-            filterKeyColumn = 1
-
-        text = lineEdit.text()
-        self.proxyModel.setFilterFixedString(text)
-        self.proxyModel.setFilterKeyColumn(filterKeyColumn)
-        self.nameLineEdit.setModified(False)
+        nameText = self.nameLineEdit.text()
+        typeText = self.typeLineEdit.text()
+        self.filterController.setFilter(nameText, typeText)
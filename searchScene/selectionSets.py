@@ -0,0 +1,168 @@
+"""
+Bulk selection and live selection sets for searchScene results.
+
+selectPaths selects any number of nodes with one cmds.select call. A
+LiveSelectionSet keeps a Maya objectSet in sync with a query: it is filled
+once from the scene index, afterwards only the nodes the index reports as
+added, renamed or reparented are evaluated again, so the set stays current
+without re-running the search.
+
+    liveSet = selectionSets.createLiveSet('bindJoints', 'type:joint name:*_bind*')
+    cmds.select('bindJoints')
+    selectionSets.removeLiveSet('bindJoints')    # stop updating, the set is kept
+
+attr: predicates are only evaluated again for the nodes the index reports,
+changing an attribute value alone does not update the set. Call
+liveSet.reevaluate() for a full pass.
+"""
+import maya.cmds as cmds
+
+import sceneFilter
+import sceneIndex
+import sceneQuery
+
+# setName -> LiveSelectionSet
+_liveSets = {}
+
+
+def existingPaths(paths):
+    """
+    The paths that exist in the scene, one cmds.ls call for all of them
+    """
+    if not paths:
+        return []
+    return cmds.ls(list(paths), long=True) or []
+
+
+def selectPaths(paths, add=False):
+    """
+    Select the existing nodes of paths with a single select call, clears the
+    selection when none exist. Returns the selected paths.
+    """
+    existing = existingPaths(paths)
+    if existing:
+        cmds.select(existing, replace=not add, add=add, noExpand=True)
+    elif not add:
+        cmds.select(clear=True)
+    return existing
+
+
+class LiveSelectionSet(object):
+    """
+    An objectSet holding the scene index entries that match a query
+    """
+    def __init__(self, setName, text, typeText='', index=None):
+        self.text = text
+        self.typeText = typeText
+        self.plan = sceneQuery.parseQuery(text, typeText)
+        self.offlinePlan, self.scenePlan = self.plan.split()
+        self.index = index or sceneIndex.getSceneIndex()
+        self.setName = setName
+        self.setUuid = None
+        # uuid -> long name of the current members
+        self.members = {}
+        self.updates = 0
+
+    def __len__(self):
+        return len(self.members)
+
+    def start(self):
+        """
+        Create the set, fill it and start following the index
+        """
+        if not cmds.objExists(self.setName) or cmds.nodeType(self.setName) != 'objectSet':
+            self.setName = cmds.sets(empty=True, name=self.setName)
+        self.setUuid = (cmds.ls(self.setName, uuid=True) or [None])[0]
+        self.reevaluate()
+        self.index.addListener(self.indexChanged)
+        return self
+
+    def stop(self):
+        self.index.removeListener(self.indexChanged)
+
+    def matches(self, uuids):
+        """
+        {uuid: long name} of the index entries among uuids matching the query
+        """
+        entries = self.index.entries
+        uuids = [uuid for uuid in uuids if uuid in entries and uuid != self.setUuid]
+        paths = [entries[uuid][0] for uuid in uuids]
+        snapshot = sceneFilter.SceneSnapshot(paths, [entries[uuid][1] for uuid in uuids])
+
+        rows = self.offlinePlan.evaluate(range(len(snapshot)), sceneQuery.SnapshotBackend(snapshot))
+        if rows and len(self.scenePlan):
+            rowsByPath = dict((paths[row], row) for row in rows)
+            scenePaths = self.scenePlan.evaluate(list(rowsByPath), sceneQuery.MayaBackend())
+            rows = [rowsByPath[path] for path in scenePaths]
+        return dict((uuids[row], paths[row]) for row in rows)
+
+    def reevaluate(self):
+        """
+        Evaluate the query over the whole index and replace the set's members
+        """
+        self.index.update()
+        self.members = self.matches(list(self.index.entries))
+        cmds.sets(clear=self.setName)
+        if self.members:
+            cmds.sets(list(self.members.values()), add=self.setName)
+        self.updates += 1
+
+    def indexChanged(self, changed, removed):
+        """
+        Index listener, evaluates only the changed entries. Deleted nodes
+        leave the set by themselves.
+        """
+        if not cmds.objExists(self.setName):
+            # The set was deleted or the scene changed
+            self.stop()
+            if _liveSets.get(self.setName) is self:
+                del _liveSets[self.setName]
+            return
+
+        for uuid in removed:
+            self.members.pop(uuid, None)
+        if not changed:
+            return
+
+        entries = self.index.entries
+        matches = self.matches(changed)
+        added = [path for uuid, path in matches.items() if uuid not in self.members]
+        dropped = [entries[uuid][0] for uuid in changed
+                   if uuid in self.members and uuid not in matches and uuid in entries]
+
+        for uuid in changed:
+            if uuid in matches:
+                self.members[uuid] = matches[uuid]
+            else:
+                self.members.pop(uuid, None)
+
+        if added:
+            cmds.sets(added, add=self.setName)
+        if dropped:
+            cmds.sets(dropped, remove=self.setName)
+        if added or dropped:
+            self.updates += 1
+
+
+def createLiveSet(setName, text, typeText='', index=None):
+    """
+    Create or replace the live set setName for a query and return it
+    """
+    removeLiveSet(setName)
+    liveSet = LiveSelectionSet(setName, text, typeText, index).start()
+    _liveSets[liveSet.setName] = liveSet
+    return liveSet
+
+
+def removeLiveSet(setName):
+    """
+    Stop updating a live set, the objectSet itself is not deleted
+    """
+    liveSet = _liveSets.pop(setName, None)
+    if liveSet is not None:
+        liveSet.stop()
+    return liveSet
+
+
+def liveSets():
+    return dict(_liveSets)
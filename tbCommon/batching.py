@@ -0,0 +1,446 @@
+"""
+Batched Maya attribute access shared by the mayaTools packages.
+
+Attribute reads and writes, connections and existence checks are queued on a
+CommandBatch and run together on flush(), grouped per node, instead of one
+formatted cmds call each. Reads return a Pending whose value is set by the
+flush:
+
+    batch = CommandBatch()
+    for node in nodes:
+        batch.setAttr(node, 'visibility', False)
+    exists = [batch.exists(name) for name in names]
+    rotate = batch.getAttr('pCube1', 'rotate')
+    batch.flush()
+    print rotate.get(), [pending.get() for pending in exists]
+
+Backends:
+    MayaBackend  OpenMaya plugs, writes through one MDGModifier per flush,
+                 MayaBackend(undoable=True) puts each flush on the undo queue
+    CmdsBackend  maya.cmds, for writes that must be on the undo queue
+    StubBackend  dictionary scene with the same behaviour, for headless tests
+
+Values use cmds conventions: compound attributes are tuples, angles and
+distances are in UI units. batch.stats counts queued operations and flushes
+so hot loops can be compared before and after moving onto a batch.
+
+API modifier edits are not on Maya's undo queue by themselves. recordUndo()
+puts an already applied step (anything with undoIt() and redoIt(), such as a
+modifier batch) on the queue through the tbModifierUndo plugin command.
+"""
+import os
+
+try:
+    STRING_TYPES = (basestring,)
+except NameError:
+    STRING_TYPES = (str,)
+
+UNDO_PLUGIN = 'tbModifierUndo'
+UNDO_PLUGIN_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '%s.py' % UNDO_PLUGIN)
+
+# Applied steps waiting for the tbModifierUndo command to take them
+_pendingUndo = []
+
+
+class BatchError(Exception):
+    pass
+
+
+class Pending(object):
+    """
+    Result of a queued read, available after the batch is flushed
+    """
+    __slots__ = ('value', 'done')
+
+    def __init__(self):
+        self.value = None
+        self.done = False
+
+    def set(self, value):
+        self.value = value
+        self.done = True
+
+    def get(self):
+        if not self.done:
+            raise BatchError('Value read before the batch was flushed')
+        return self.value
+
+
+class CommandBatch(object):
+    """
+    Queue of attribute operations. Flush order is existence checks, writes
+    (setAttr then connect), then reads, so reads see the writes of the same flush.
+    A later setAttr on the same plug replaces an earlier queued one.
+    """
+    def __init__(self, backend=None):
+        self.backend = backend or defaultBackend()
+        self.existsQueue = []
+        self.getQueue = {}
+        self.setQueue = {}
+        self.connectQueue = []
+        self.stats = {'exists': 0, 'getAttr': 0, 'setAttr': 0, 'connect': 0, 'flushes': 0}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        if excType is None:
+            self.flush()
+        return False
+
+    def __len__(self):
+        return (len(self.existsQueue) + sum(len(attrs) for attrs in self.getQueue.values()) +
+                sum(len(attrs) for attrs in self.setQueue.values()) + len(self.connectQueue))
+
+    def exists(self, name):
+        """
+        Queue an existence check for a node or plug name
+        """
+        pending = Pending()
+        self.existsQueue.append((name, pending))
+        self.stats['exists'] += 1
+        return pending
+
+    def getAttr(self, node, attr):
+        pending = Pending()
+        self.getQueue.setdefault(node, []).append((attr, pending))
+        self.stats['getAttr'] += 1
+        return pending
+
+    def setAttr(self, node, attr, value):
+        attrs = self.setQueue.setdefault(node, {})
+        if attr not in attrs:
+            attrs[attr] = [len(attrs), value]
+        else:
+            attrs[attr][1] = value
+        self.stats['setAttr'] += 1
+
+    def connect(self, source, destination):
+        self.connectQueue.append((source, destination))
+        self.stats['connect'] += 1
+
+    def flush(self):
+        """
+        Run everything queued, returns the number of operations run
+        """
+        count = len(self)
+        if not count:
+            return 0
+
+        existsQueue, self.existsQueue = self.existsQueue, []
+        getQueue, self.getQueue = self.getQueue, {}
+        setQueue, self.setQueue = self.setQueue, {}
+        connectQueue, self.connectQueue = self.connectQueue, []
+        self.stats['flushes'] += 1
+
+        if existsQueue:
+            results = self.backend.exists([name for name, pending in existsQueue])
+            for (name, pending), result in zip(existsQueue, results):
+                pending.set(result)
+
+        if setQueue or connectQueue:
+            sets = [(node, [(attr, value) for attr, (order, value) in sorted(attrs.items(), key=lambda item: item[1][0])])
+                    for node, attrs in setQueue.items()]
+            self.backend.apply(sets, connectQueue)
+
+        if getQueue:
+            requests = [(node, [attr for attr, pending in attrs]) for node, attrs in getQueue.items()]
+            for (node, attrs), values in zip(getQueue.items(), self.backend.getAttrs(requests)):
+                for (attr, pending), value in zip(attrs, values):
+                    pending.set(value)
+
+        return count
+
+
+def loadUndoPlugin():
+    import maya.cmds as cmds
+    if not cmds.pluginInfo(UNDO_PLUGIN, query=True, loaded=True):
+        cmds.loadPlugin(UNDO_PLUGIN_PATH, quiet=True)
+
+
+class ModifierStep(object):
+    """
+    Undo step of an applied MDGModifier, for recordUndo()
+    """
+    def __init__(self, modifier):
+        self.modifier = modifier
+
+    def undoIt(self):
+        self.modifier.undoIt()
+
+    def redoIt(self):
+        self.modifier.doIt()
+
+
+def recordUndo(step):
+    """
+    Put an applied step on the undo queue, Maya calls step.undoIt() on undo
+    and step.redoIt() on redo. Does nothing while undo is off.
+    """
+    import maya.cmds as cmds
+    if not cmds.undoInfo(query=True, state=True):
+        return
+    loadUndoPlugin()
+    _pendingUndo.append(step)
+    try:
+        getattr(cmds, UNDO_PLUGIN)()
+    finally:
+        del _pendingUndo[:]
+
+
+def takeUndoStep():
+    """
+    The step passed to recordUndo(), for the tbModifierUndo command
+    """
+    return _pendingUndo.pop() if _pendingUndo else None
+
+
+def defaultBackend():
+    """
+    MayaBackend inside Maya, otherwise an empty StubBackend
+    """
+    try:
+        import maya.OpenMaya
+    except ImportError:
+        return StubBackend()
+    return MayaBackend()
+
+
+class StubBackend(object):
+    """
+    Scene of nodes and attribute values in dictionaries, scene = {node: {attr: value}}.
+    Behaves like the Maya backends: missing nodes or attributes raise BatchError.
+    calls counts backend round trips.
+    """
+    def __init__(self, scene=None):
+        self.scene = scene if scene is not None else {}
+        self.connections = []
+        self.calls = 0
+
+    def exists(self, names):
+        self.calls += 1
+        results = []
+        for name in names:
+            node, _, attr = name.partition('.')
+            results.append(node in self.scene and (not attr or attr in self.scene[node]))
+        return results
+
+    def nodeAttrs(self, node):
+        if node not in self.scene:
+            raise BatchError('Node not found: %s' % node)
+        return self.scene[node]
+
+    def getAttrs(self, requests):
+        self.calls += 1
+        results = []
+        for node, attrs in requests:
+            nodeAttrs = self.nodeAttrs(node)
+            for attr in attrs:
+                if attr not in nodeAttrs:
+                    raise BatchError('Attribute not found: %s.%s' % (node, attr))
+            results.append([nodeAttrs[attr] for attr in attrs])
+        return results
+
+    def apply(self, sets, connections):
+        self.calls += 1
+        for node, values in sets:
+            nodeAttrs = self.nodeAttrs(node)
+            for attr, value in values:
+                if attr not in nodeAttrs:
+                    raise BatchError('Attribute not found: %s.%s' % (node, attr))
+                nodeAttrs[attr] = tuple(value) if isinstance(value, list) else value
+        for source, destination in connections:
+            for plug in (source, destination):
+                node, _, attr = plug.partition('.')
+                if attr not in self.nodeAttrs(node):
+                    raise BatchError('Attribute not found: %s' % plug)
+            self.connections.append((source, destination))
+
+
+class CmdsBackend(object):
+    """
+    maya.cmds backend, existence checks are one ls call and writes go on the undo queue
+    """
+    def __init__(self):
+        import maya.cmds as cmds
+        self.cmds = cmds
+        self.calls = 0
+
+    def exists(self, names):
+        self.calls += 1
+        found = set(self.cmds.ls(names) or [])
+        found.update(self.cmds.ls(names, long=True) or [])
+        return [name in found or name.lstrip('|') in found for name in names]
+
+    def getAttrs(self, requests):
+        results = []
+        for node, attrs in requests:
+            values = []
+            for attr in attrs:
+                self.calls += 1
+                value = self.cmds.getAttr('%s.%s' % (node, attr))
+                # Compound attributes come back as [(x, y, z)]
+                if isinstance(value, list) and len(value) == 1 and isinstance(value[0], tuple):
+                    value = value[0]
+                values.append(value)
+            results.append(values)
+        return results
+
+    def apply(self, sets, connections):
+        for node, values in sets:
+            for attr, value in values:
+                self.calls += 1
+                if isinstance(value, (list, tuple)):
+                    self.cmds.setAttr('%s.%s' % (node, attr), *value)
+                elif isinstance(value, STRING_TYPES):
+                    self.cmds.setAttr('%s.%s' % (node, attr), value, type='string')
+                else:
+                    self.cmds.setAttr('%s.%s' % (node, attr), value)
+        for source, destination in connections:
+            self.calls += 1
+            self.cmds.connectAttr(source, destination, force=True)
+
+
+class MayaBackend(object):
+    """
+    OpenMaya backend. Each node is looked up once per flush and all writes of
+    a flush go through a single MDGModifier. With undoable the modifier of
+    each flush is put on the undo queue through recordUndo(), otherwise
+    modifier writes cannot be undone.
+    """
+    def __init__(self, undoable=False):
+        import maya.OpenMaya as om
+        self.om = om
+        self.undoable = undoable
+        self.calls = 0
+
+    def exists(self, names):
+        self.calls += 1
+        sel = self.om.MSelectionList()
+        results = []
+        for name in names:
+            try:
+                sel.add(name)
+            except RuntimeError:
+                results.append(False)
+            else:
+                results.append(True)
+        return results
+
+    def getNode(self, node):
+        sel = self.om.MSelectionList()
+        try:
+            sel.add(node)
+        except RuntimeError:
+            raise BatchError('Node not found: %s' % node)
+        obj = self.om.MObject()
+        sel.getDependNode(0, obj)
+        return self.om.MFnDependencyNode(obj)
+
+    def getPlug(self, nodeFn, node, attr):
+        """
+        Plain attribute names go through the node function set, element and
+        child paths ('weightList[3].weights[0]') through a selection list
+        """
+        if '[' not in attr and '.' not in attr:
+            try:
+                return nodeFn.findPlug(attr, False)
+            except RuntimeError:
+                raise BatchError('Attribute not found: %s.%s' % (node, attr))
+        return self.plugByName('%s.%s' % (node, attr))
+
+    def plugByName(self, plugName):
+        sel = self.om.MSelectionList()
+        try:
+            sel.add(plugName)
+        except RuntimeError:
+            raise BatchError('Attribute not found: %s' % plugName)
+        plug = self.om.MPlug()
+        sel.getPlug(0, plug)
+        return plug
+
+    def getAttrs(self, requests):
+        self.calls += 1
+        results = []
+        for node, attrs in requests:
+            nodeFn = self.getNode(node)
+            results.append([self.plugValue(self.getPlug(nodeFn, node, attr)) for attr in attrs])
+        return results
+
+    def apply(self, sets, connections):
+        self.calls += 1
+        dgMod = self.om.MDGModifier()
+        for node, values in sets:
+            nodeFn = self.getNode(node)
+            for attr, value in values:
+                self.setPlugValue(dgMod, self.getPlug(nodeFn, node, attr), value)
+        for source, destination in connections:
+            dgMod.connect(self.plugByName(source), self.plugByName(destination))
+        dgMod.doIt()
+        if self.undoable:
+            recordUndo(ModifierStep(dgMod))
+
+    def unitType(self, attr):
+        om = self.om
+        if attr.hasFn(om.MFn.kUnitAttribute):
+            return ('unit', om.MFnUnitAttribute(attr).unitType())
+        if attr.hasFn(om.MFn.kNumericAttribute):
+            return ('numeric', om.MFnNumericAttribute(attr).unitType())
+        if attr.hasFn(om.MFn.kEnumAttribute):
+            return ('enum', None)
+        if attr.hasFn(om.MFn.kTypedAttribute):
+            return ('typed', om.MFnTypedAttribute(attr).attrType())
+        return (None, None)
+
+    def plugValue(self, plug):
+        om = self.om
+        if plug.isCompound():
+            return tuple(self.plugValue(plug.child(i)) for i in range(plug.numChildren()))
+
+        kind, unit = self.unitType(plug.attribute())
+        if kind == 'unit':
+            if unit == om.MFnUnitAttribute.kAngle:
+                return plug.asMAngle().asUnits(om.MAngle.uiUnit())
+            if unit == om.MFnUnitAttribute.kDistance:
+                return plug.asMDistance().asUnits(om.MDistance.uiUnit())
+            if unit == om.MFnUnitAttribute.kTime:
+                return plug.asMTime().asUnits(om.MTime.uiUnit())
+            return plug.asDouble()
+        if kind == 'numeric':
+            if unit == om.MFnNumericData.kBoolean:
+                return plug.asBool()
+            if unit in (om.MFnNumericData.kByte, om.MFnNumericData.kChar, om.MFnNumericData.kShort,
+                        om.MFnNumericData.kInt):
+                return plug.asInt()
+            return plug.asDouble()
+        if kind == 'enum':
+            return plug.asInt()
+        if kind == 'typed' and unit == om.MFnData.kString:
+            return plug.asString()
+
+        import maya.cmds as cmds
+        return cmds.getAttr(plug.name())
+
+    def setPlugValue(self, dgMod, plug, value):
+        om = self.om
+        if isinstance(value, (list, tuple)):
+            for i, childValue in enumerate(value):
+                self.setPlugValue(dgMod, plug.child(i), childValue)
+            return
+
+        kind, unit = self.unitType(plug.attribute())
+        if kind == 'unit' and unit == om.MFnUnitAttribute.kAngle:
+            dgMod.newPlugValueMAngle(plug, om.MAngle(value, om.MAngle.uiUnit()))
+        elif kind == 'unit' and unit == om.MFnUnitAttribute.kDistance:
+            dgMod.newPlugValueMDistance(plug, om.MDistance(value, om.MDistance.uiUnit()))
+        elif kind == 'unit' and unit == om.MFnUnitAttribute.kTime:
+            dgMod.newPlugValueMTime(plug, om.MTime(value, om.MTime.uiUnit()))
+        elif kind == 'numeric' and unit == om.MFnNumericData.kBoolean:
+            dgMod.newPlugValueBool(plug, bool(value))
+        elif kind == 'enum' or (kind == 'numeric' and unit in (om.MFnNumericData.kByte, om.MFnNumericData.kChar,
+                                                              om.MFnNumericData.kShort, om.MFnNumericData.kInt)):
+            dgMod.newPlugValueInt(plug, int(value))
+        elif isinstance(value, STRING_TYPES):
+            dgMod.newPlugValueString(plug, value)
+        else:
+            dgMod.newPlugValueDouble(plug, float(value))
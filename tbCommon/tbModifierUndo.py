@@ -0,0 +1,66 @@
+"""
+Maya plugin that puts API modifier edits on the undo queue.
+
+Modifier edits are only undone by Maya when an undoable MPxCommand owns them.
+The caller applies its modifiers itself and hands the step to
+batching.recordUndo(), which runs this command: the command takes the step
+and calls its undoIt() and redoIt() when the user undoes and redoes. The
+plugin is loaded by recordUndo(), there is no need to load it by hand.
+
+    batch.apply()
+    batching.recordUndo(batch)    # batch.undoIt() / batch.redoIt() from now on
+"""
+import os
+import sys
+
+import maya.OpenMayaMPx as ompx
+
+try:
+    from tbCommon import batching
+except ImportError:
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from tbCommon import batching
+
+kPluginCmdName = 'tbModifierUndo'
+
+
+class tbModifierUndo(ompx.MPxCommand):
+    def __init__(self):
+        ompx.MPxCommand.__init__(self)
+        self.step = None
+
+    def doIt(self, argList):
+        # The step was applied by the caller, only keep it for undo and redo
+        self.step = batching.takeUndoStep()
+
+    def redoIt(self):
+        self.step.redoIt()
+
+    def undoIt(self):
+        self.step.undoIt()
+
+    def isUndoable(self):
+        return self.step is not None
+
+
+def cmdCreator():
+    return ompx.asMPxPtr(tbModifierUndo())
+
+
+def initializePlugin(mobject):
+    mplugin = ompx.MFnPlugin(mobject, 'Tom Banker', '1.0', 'Any')
+    try:
+        mplugin.registerCommand(kPluginCmdName, cmdCreator)
+    except Exception as e:
+        sys.stderr.write('Failed to register command: %s\n' % kPluginCmdName)
+        sys.stderr.write('%s\n' % e)
+        raise
+
+
+def uninitializePlugin(mobject):
+    mplugin = ompx.MFnPlugin(mobject)
+    try:
+        mplugin.deregisterCommand(kPluginCmdName)
+    except Exception:
+        sys.stderr.write('Failed to unregister command: %s\n' % kPluginCmdName)
+        raise
@@ -25,6 +25,7 @@ THE SOFTWARE.
 #
 # import maya.cmds as cmds
 # import maya.mel as mel
+#
 # cmds.unloadPlugin('tbLoadSaveWeights.py')
 # cmds.loadPlugin('tbLoadSaveWeights.py')
 #
@@ -32,13 +33,30 @@ THE SOFTWARE.
 # ---- Select Mesh ----
 # mel.eval('tbLoadSaveWeights -a "export" -f "c:/weights.xml"')
 #
+# ---- To Export Only Part of the Mesh ----
+# ---- Selected vertices/edges/faces, or the members of a set ----
+# mel.eval('tbLoadSaveWeights -a "export" -f "c:/lips.xml" -m "body" -c true')
+# mel.eval('tbLoadSaveWeights -a "export" -f "c:/lips.xml" -m "body" -vs "lipVerts"')
+#
 # ---- To Import Weights ----
 # ---- Select Mesh ----
 # mel.eval('tbLoadSaveWeights -a "import" -f "c:/weights.xml"')
+#
+# ---- To Import Only the Weights that Changed ----
+# ---- Vertices within -e of the current weights are not written ----
+# mel.eval('tbLoadSaveWeights -a "import" -f "c:/weights.xml" -s true -e 0.00001')
+#
+# ---- To Check a Weights File (no scene needed) ----
+# ---- Writes c:/weights_report.json ----
+# mel.eval('tbLoadSaveWeights -a "analyze" -f "c:/weights.xml"')
+#
+# ---- To Mirror Weights from +X to -X ----
+# ---- -mi true mirrors from -X to +X, -mp picks the plane (YZ, XZ, XY) ----
+# mel.eval('tbLoadSaveWeights -a "mirror" -m "body" -mp "YZ" -t 0.001')
 
+import os
 import sys
 import time
-import xml.etree.cElementTree as cElement
 
 import maya.OpenMaya as om
 import maya.OpenMayaMPx as ompx
@@ -46,6 +64,20 @@ import maya.OpenMayaAnim as oma
 import maya.cmds as cmds
 import maya.mel as mel
 
+try:
+    from tbCommon import batching
+except ImportError:
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from tbCommon import batching
+
+try:
+    import weightsFile
+except ImportError:
+    sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+    import weightsFile
+import weightsAnalysis
+import weightsMirror
+
 # Param Flags
 kTbSaveWeightsFileParam = 'file'
 kTbSaveWeightsActionParam = 'action'
@@ -61,6 +93,20 @@ kTbSaveWeightsMeshFlag = '-m'
 kTbSaveWeightsMeshLongFlag = '-Mesh'
 kTbSaveWeightsPrettyPrintFlag = '-p'
 kTbSaveWeightsPrettyPrintLongFlag = '-PrettyPrint'
+kTbSaveWeightsMirrorPlaneFlag = '-mp'
+kTbSaveWeightsMirrorPlaneLongFlag = '-MirrorPlane'
+kTbSaveWeightsMirrorInverseFlag = '-mi'
+kTbSaveWeightsMirrorInverseLongFlag = '-MirrorInverse'
+kTbSaveWeightsToleranceFlag = '-t'
+kTbSaveWeightsToleranceLongFlag = '-Tolerance'
+kTbSaveWeightsComponentsFlag = '-c'
+kTbSaveWeightsComponentsLongFlag = '-Components'
+kTbSaveWeightsVertexSetFlag = '-vs'
+kTbSaveWeightsVertexSetLongFlag = '-VertexSet'
+kTbSaveWeightsSparseFlag = '-s'
+kTbSaveWeightsSparseLongFlag = '-Sparse'
+kTbSaveWeightsEpsilonFlag = '-e'
+kTbSaveWeightsEpsilonLongFlag = '-Epsilon'
 
 class tbLoadSaveWeights(ompx.MPxCommand):
     def __init__(self):
@@ -73,6 +119,15 @@ class tbLoadSaveWeights(ompx.MPxCommand):
         self.skinCluster = 'skinCluster1'
         self.objectMesh = ''
         self.weights = {}
+        self.mirrorPlane = 'YZ'
+        self.mirrorInverse = False
+        self.tolerance = 0.001
+        self.components = False
+        self.vertexSet = ''
+        self.region = ''
+        self.regionVertIds = None
+        self.sparse = False
+        self.epsilon = 1e-5
 
     def doIt(self, argList):
         argData = om.MArgDatabase(self.syntax(), argList)
@@ -99,6 +154,27 @@ class tbLoadSaveWeights(ompx.MPxCommand):
         else:
             self.prettyPrint = False
 
+        if argData.isFlagSet(kTbSaveWeightsMirrorPlaneFlag):
+            self.mirrorPlane = argData.flagArgumentString(kTbSaveWeightsMirrorPlaneFlag, 0)
+
+        if argData.isFlagSet(kTbSaveWeightsMirrorInverseFlag):
+            self.mirrorInverse = argData.flagArgumentBool(kTbSaveWeightsMirrorInverseFlag, 0)
+
+        if argData.isFlagSet(kTbSaveWeightsToleranceFlag):
+            self.tolerance = argData.flagArgumentDouble(kTbSaveWeightsToleranceFlag, 0)
+
+        if argData.isFlagSet(kTbSaveWeightsComponentsFlag):
+            self.components = argData.flagArgumentBool(kTbSaveWeightsComponentsFlag, 0)
+
+        if argData.isFlagSet(kTbSaveWeightsVertexSetFlag):
+            self.vertexSet = argData.flagArgumentString(kTbSaveWeightsVertexSetFlag, 0)
+
+        if argData.isFlagSet(kTbSaveWeightsSparseFlag):
+            self.sparse = argData.flagArgumentBool(kTbSaveWeightsSparseFlag, 0)
+
+        if argData.isFlagSet(kTbSaveWeightsEpsilonFlag):
+            self.epsilon = argData.flagArgumentDouble(kTbSaveWeightsEpsilonFlag, 0)
+
         self.main()
 
     def main(self):
@@ -106,7 +182,9 @@ class tbLoadSaveWeights(ompx.MPxCommand):
             print '... Exporting weights for mesh:%s' % self.objectMesh
             self.skinCluster = self.getSkinCluster()
             self.infDags = self.getInfDags(self.skinCluster)
-            self.weights = self.saveWeights(self.infDags, self.skinCluster)
+            self.infNames = self.getInfNames(self.infDags, self.skinCluster)
+            self.regionVertIds = self.getRegionVertIds(self.selName)
+            self.weights = self.saveWeights(self.infDags, self.skinCluster, self.regionVertIds)
             self.exportWeights(self.weights, self.fileName)
 
         elif self.action == 'import':
@@ -117,63 +195,110 @@ class tbLoadSaveWeights(ompx.MPxCommand):
             self.infDags = self.getInfDags(self.skinCluster)
             self.infNames = self.getInfNames(self.infDags, self.skinCluster)
             self.weights = self.importWeights()
-            self.normalizeWeights(self.selName, self.infNames, self.skinCluster)
-            self.setWeights(self.skinCluster, self.weights)
+
+            if self.sparse:
+                # Compare against the current weights and write only the rows that changed
+                current = self.saveWeights(self.infDags, self.skinCluster, sorted(self.weights))
+                self.weights, skipped = weightsFile.diffWeights(current, self.weights, self.epsilon)
+                self.unlockInfluences(self.infNames)
+                print('%d vertices written, %d skipped as unchanged' % (len(self.weights), skipped))
+            else:
+                self.normalizeWeights(self.selName, self.infNames, self.skinCluster, self.regionVertIds)
+
+            if self.weights:
+                self.setWeights(self.skinCluster, self.weights)
+            self.setResult(len(self.weights))
             endTime = time.time()
             print('Import weights took %g seconds' % (endTime - startTime))
 
+        elif self.action == 'analyze':
+            print '... Analyzing weights file:%s' % self.fileName
+            report = weightsAnalysis.analyzeFile(self.fileName, maxInfluences=self.maxInfluences)
+            reportName = weightsAnalysis.reportFileName(self.fileName)
+            weightsAnalysis.writeReport(report, reportName)
+            print weightsAnalysis.summary(report)
+            self.setResult(reportName)
+
+        elif self.action == 'mirror':
+            print '... Mirroring weights for mesh:%s' % self.objectMesh
+            startTime = time.time()
+            self.selName = self.getSelString()
+            self.skinCluster = self.getSkinCluster()
+            self.infDags = self.getInfDags(self.skinCluster)
+            self.infNames = self.getInfNames(self.infDags, self.skinCluster)
+            self.weights = self.saveWeights(self.infDags, self.skinCluster)
+
+            data = weightsFile.WeightsData.fromDict(self.weights, self.selName, dict(enumerate(self.infNames)))
+            result = weightsMirror.mirrorWeights(data, self.getPositions(self.selName), self.mirrorPlane,
+                                                 self.mirrorInverse, self.tolerance,
+                                                 weightsMirror.influenceMap(self.infNames))
+            self.setWeights(self.skinCluster, result.data.toDict())
+            endTime = time.time()
+            print result.summary()
+            if result.unmatched:
+                print 'Unmatched vertices: %s' % ' '.join(
+                    '%s.vtx[%d]' % (self.selName, vertId) for vertId in result.unmatched[:100])
+            print('Mirror weights took %g seconds' % (endTime - startTime))
+            self.setResult(len(result.unmatched))
+
         return
 
     def setWeights(self, clusterNode, weights):
         """
         Using a weight dictionary, set the object weights:
-        Parse through the weight dictionary and use setAttr to set weights
-        setAttr is a faster method than MFnSkinCluster.setWeights()
-        setAttr gives free undo capabilities
+        Parse through the weight dictionary and queue the weightList plugs on a
+        tbCommon.batching CommandBatch, which writes them all in one flush.
+        Plug writes are a faster method than MFnSkinCluster.setWeights()
+        The flush is recorded on the undo queue, so undoing an import reverts
+        these writes together with the prune and the skinPercent fallback
         """
         # Check for a weight dictionary
         if not type(weights) is dict:
             raise Exception("Weights dict not found")
 
         clusterName = clusterNode.name()
+        batch = batching.CommandBatch(batching.MayaBackend(undoable=True))
+
+        # Check once per influence that it is connected to the skinCluster
+        connected = {}
+        for infId in set(infId for weightData in weights.values() for infId in weightData):
+            b = self.infNames[int(infId)] + '.worldMatrix[0]'
+            c = clusterName + '.matrix[%d]' % int(infId)
+            connected[infId] = cmds.isConnected(b, c)
 
         # Loop through the weights dictionary
         for vertId, weightData in weights.items():
-            wlAttr = '%s.weightList[%s]' % (clusterName, vertId)
+            wlAttr = 'weightList[%s]' % vertId
+
+            # Check to make sure influence object weights add to 1
+            infValueSumCheck = round(sum(float(i) for i in weightData.values()), 2)
 
             for infId, infValue in weightData.items():
                 wAttr = '.weights[%s]' % infId
 
-                # Check to make sure influence object weights add to 1
-                a = [float(i) for i in weightData.values()]
-                infValueSumCheck = round(sum(a), 2)
-                b = self.infNames[int(infId)] + '.worldMatrix[0]'
-                c = clusterName + '.matrix[%d]' % int(infId)
-                # Check to make sure influence objects are connected to mesh
-                isConnectedCheck = cmds.isConnected(b, c)
-
-                if infValueSumCheck and isConnectedCheck:
+                if infValueSumCheck and connected[infId]:
                     # Primary method
-                    cmds.setAttr(wlAttr + wAttr, float(infValue))
+                    batch.setAttr(clusterName, wlAttr + wAttr, float(infValue))
                 else:
                     # Alt method - very slow
                     cmds.skinPercent(clusterName, '%s.vtx[%d]' % (self.selName, int(vertId)),
                                      transformValue=[(self.infNames[int(infId)], float(infValue))])
 
+        batch.flush()
         return True
 
-    def normalizeWeights(self, selName, infNames, clusterNode):
+    def normalizeWeights(self, selName, infNames, clusterNode, vertIds=None):
         """
         Remove non-zero weighting:
         Temporarily removing weight normalization allows for a weight prune
         Weight pruning is done to remove all non-zero weighting
         Non-zero weighting is removed to compress object data (faster speed) and file size
+        With vertIds only those vertices are pruned, for region files
         """
         clusterName = clusterNode.name()
 
         # Unlock influences first
-        for inf in infNames:
-            cmds.setAttr('%s.liw' % inf, 0)
+        self.unlockInfluences(infNames)
 
         # Temporarily turn off normalize
         normalizeSetting = cmds.getAttr('%s.normalizeWeights' % clusterName)
@@ -182,12 +307,20 @@ class tbLoadSaveWeights(ompx.MPxCommand):
             cmds.setAttr('%s.normalizeWeights' % clusterName, 0)
 
         # Prune non-zero weights
-        cmds.skinPercent(clusterName, selName, nrm=False, prw=100)
+        if vertIds is None:
+            cmds.skinPercent(clusterName, selName, nrm=False, prw=100)
+        elif vertIds:
+            cmds.skinPercent(clusterName, self.vertexComponents(selName, vertIds), nrm=False, prw=100)
 
         # Turn normalize back on
         if normalizeSetting != 0:
             cmds.setAttr('%s.normalizeWeights' % clusterName, normalizeSetting)
 
+    def unlockInfluences(self, infNames):
+        with batching.CommandBatch(batching.MayaBackend(undoable=True)) as batch:
+            for inf in infNames:
+                batch.setAttr(inf, 'liw', False)
+
     def getSkinCluster(self):
         """
         Get a selected object's skin cluster as a MFnSkinCluster
@@ -223,6 +356,84 @@ class tbLoadSaveWeights(ompx.MPxCommand):
         sel.getSelectionStrings(selObjs)
         return selObjs[0]
 
+    def getMeshPath(self, selName):
+        """
+        MDagPath of the mesh shape
+        """
+        sel = om.MSelectionList()
+        sel.add(selName)
+        dagPath = om.MDagPath()
+        sel.getDagPath(0, dagPath)
+        dagPath.extendToShape()
+        return dagPath
+
+    def getVertexCount(self, selName):
+        return om.MFnMesh(self.getMeshPath(selName)).numVertices()
+
+    def vertexComponents(self, selName, vertIds):
+        """
+        Compact component strings for vertIds, e.g. ['body.vtx[0:99]', 'body.vtx[120]']
+        """
+        components = []
+        for start, end in weightsFile.compactRanges(vertIds):
+            if start == end:
+                components.append('%s.vtx[%d]' % (selName, start))
+            else:
+                components.append('%s.vtx[%d:%d]' % (selName, start, end))
+        return components
+
+    def getRegionVertIds(self, selName):
+        """
+        Sorted vertex ids of the selected components (-c) or of the vertex set
+        (-vs) on the mesh, None to export the whole mesh.
+        Edges and faces are converted to their vertices.
+        """
+        if self.vertexSet:
+            if not cmds.objExists(self.vertexSet):
+                raise Exception('Vertex set not found: %s' % self.vertexSet)
+            members = cmds.sets(self.vertexSet, q=True) or []
+            self.region = 'set:%s' % self.vertexSet
+        elif self.components:
+            members = cmds.ls(sl=True) or []
+            self.region = 'components'
+        else:
+            self.region = ''
+            return None
+
+        members = cmds.polyListComponentConversion(members, toVertex=True) if members else []
+        sel = om.MSelectionList()
+        for member in members or []:
+            sel.add(member)
+
+        meshName = self.getMeshPath(selName).fullPathName()
+        vertIds = set()
+        dagPath = om.MDagPath()
+        component = om.MObject()
+        selIter = om.MItSelectionList(sel, om.MFn.kMeshVertComponent)
+        while not selIter.isDone():
+            selIter.getDagPath(dagPath, component)
+            if dagPath.fullPathName() == meshName:
+                elements = om.MIntArray()
+                om.MFnSingleIndexedComponent(component).getElements(elements)
+                vertIds.update(elements)
+            selIter.next()
+
+        if not vertIds:
+            raise Exception('No vertices of %s in the %s' % (selName, self.vertexSet or 'selection'))
+        return sorted(vertIds)
+
+    def getPositions(self, selName):
+        """
+        Flat x, y, z list of the mesh's object space vertex positions
+        """
+        points = om.MPointArray()
+        om.MFnMesh(self.getMeshPath(selName)).getPoints(points, om.MSpace.kObject)
+        positions = []
+        for i in xrange(points.length()):
+            point = points[i]
+            positions.extend((point.x, point.y, point.z))
+        return positions
+
     def getInfDags(self, skinFn):
         """
         Helper function to get influence dag objects
@@ -240,9 +451,10 @@ class tbLoadSaveWeights(ompx.MPxCommand):
         infNames = [infDags[i].partialPathName() for i in xrange(infDags.length())]
         return infNames
 
-    def saveWeights(self, infDags, skinFn):
+    def saveWeights(self, infDags, skinFn, vertIds=None):
         """
         Uses a dictionary to save mesh weights:
+        Only the weightList rows of vertIds when given
         """
         # infIds dictionary:
         # keys = MPlug index id
@@ -268,7 +480,10 @@ class tbLoadSaveWeights(ompx.MPxCommand):
         # vWeights keys = influence id
         # vWeights values = influence weight (value)
         weights = {}
-        for vId in xrange(wlPlug.numElements()):
+        if vertIds is None:
+            vertIds = xrange(wlPlug.numElements())
+
+        for vId in vertIds:
             vWeights = {}
             wPlug.selectAncestorLogicalIndex(vId, wlAttr)
             wPlug.getExistingArrayAttributeIndices(wInfIds)
@@ -285,77 +500,46 @@ class tbLoadSaveWeights(ompx.MPxCommand):
 
         return weights
 
-    def importWeights(self, weights={}):
+    def importWeights(self):
         """
-        Open the file
-        Create a weights dictionary
+        Read the file into a weights dictionary
         """
         startTime = time.time()
-        tree = cElement.parse(self.fileName)
-        root = tree.getroot()
-        mesh = root.find('mesh')
+        data = weightsFile.readWeights(self.fileName)
 
-        if mesh.attrib.get('name') != self.selName:
+        if data.meshName != self.selName:
             raise Exception('Selected mesh does not match weights file mesh')
 
-        for vertId in mesh:
-            # print vertId.tag, vertId.attrib
-            index = vertId.get('index')
-            # print 'index:', index
-            weights[index] = {}
-            for inf in vertId:
-                attribs = {inf.get('idx'): inf.get('weight')}
-                # print attribs
-                weights[index].update(attribs)
+        if data.meshVertexCount and data.meshVertexCount != self.getVertexCount(self.selName):
+            raise Exception('Weights file has %d vertices, %s has %d' % (
+                data.meshVertexCount, self.selName, self.getVertexCount(self.selName)))
 
+        # Region files only replace their own vertices
+        self.region = data.region
+        self.regionVertIds = list(data.vertIds) if data.isRegion() else None
+
+        weights = data.toDict()
         endTime = time.time()
         print('Read time was %g seconds' % (endTime - startTime))
         return weights
 
     def exportWeights(self, weights={}, fileName=None):
         """
-        Generate an XML document
+        Write the weights dictionary and influence names to XML
         """
         startTime = time.time()
 
-        # Write to XML using cElementTree
-        root = cElement.Element("root")
-        mesh = cElement.SubElement(root, 'mesh', {'name': self.selName})
-
-        for (vertId, subWeights) in weights.iteritems():
-            vertIdElem = cElement.SubElement(
-                mesh, 'vertId', {'index': str(vertId), 'path': '%s.vtx[%s]' % (self.selName, str(vertId))})
-            for (infIndex, infWeight) in subWeights.iteritems():
-                cElement.SubElement(vertIdElem, 'inf', {'idx': str(infIndex), 'weight': str(infWeight)})
-
-        endComment = cElement.Comment('eof')
-        root.append(endComment)
-
         if not fileName:
             fileName = self.defaultFileName
 
-        f = open(fileName, 'w')
-
-        if self.prettyPrint:
-            f.write(self.prettify(root))
-        else:
-            cElement.ElementTree(root).write(f)
-
-        f.close()
+        data = weightsFile.WeightsData.fromDict(weights, self.selName, dict(enumerate(self.infNames)))
+        data.meshVertexCount = self.getVertexCount(self.selName)
+        data.region = self.region
+        weightsFile.writeWeights(data, fileName, self.prettyPrint)
 
         endTime = time.time()
         print("Export weights took %g seconds" % (endTime - startTime))
 
-    def prettify(self, elem):
-        """Return a pretty-printed XML string for the Element.
-        """
-        from xml.etree import ElementTree
-        from xml.dom import minidom
-
-        rough_string = ElementTree.tostring(elem, 'utf-8')
-        reparsed = minidom.parseString(rough_string)
-        return reparsed.toprettyxml(indent="  ")
-
 
 #--------------------------------------------------#
 #--------------------------------------------------#
@@ -380,6 +564,13 @@ def syntaxCreator():
     syntax.addFlag(kTbSaveWeightsActionFlag, kTbSaveWeightsActionLongFlag, om.MSyntax.kString)
     syntax.addFlag(kTbSaveWeightsMeshFlag, kTbSaveWeightsMeshLongFlag, om.MSyntax.kString)
     syntax.addFlag(kTbSaveWeightsPrettyPrintFlag, kTbSaveWeightsPrettyPrintLongFlag, om.MSyntax.kString)
+    syntax.addFlag(kTbSaveWeightsMirrorPlaneFlag, kTbSaveWeightsMirrorPlaneLongFlag, om.MSyntax.kString)
+    syntax.addFlag(kTbSaveWeightsMirrorInverseFlag, kTbSaveWeightsMirrorInverseLongFlag, om.MSyntax.kBoolean)
+    syntax.addFlag(kTbSaveWeightsToleranceFlag, kTbSaveWeightsToleranceLongFlag, om.MSyntax.kDouble)
+    syntax.addFlag(kTbSaveWeightsComponentsFlag, kTbSaveWeightsComponentsLongFlag, om.MSyntax.kBoolean)
+    syntax.addFlag(kTbSaveWeightsVertexSetFlag, kTbSaveWeightsVertexSetLongFlag, om.MSyntax.kString)
+    syntax.addFlag(kTbSaveWeightsSparseFlag, kTbSaveWeightsSparseLongFlag, om.MSyntax.kBoolean)
+    syntax.addFlag(kTbSaveWeightsEpsilonFlag, kTbSaveWeightsEpsilonLongFlag, om.MSyntax.kDouble)
     return syntax
 
 
@@ -0,0 +1,198 @@
+"""
+Sanity report of a weights file, without Maya or the scene.
+
+One pass over the WeightsData columns collects everything the import would
+trip over: vertices whose weights do not sum to 1, vertices with more
+influences than maxInfluences, influences with no weight anywhere, weights
+below the prune threshold and weights outside 0-1. It also gives per
+influence totals and a histogram of the weight values.
+
+    report = weightsAnalysis.analyzeFile('c:/weights.xml', maxInfluences=4)
+    weightsAnalysis.writeReport(report, 'c:/weights_report.json')
+
+Command line, e.g. nightly over a weights library:
+    python weightsAnalysis.py /assets/weights --json report.json --max-influences 4
+"""
+import json
+import os
+import sys
+import time
+
+import weightsFile
+
+# Vertex lists in the report are cut to this many ids, the counts are always complete
+MAX_LISTED = 1000
+
+
+def histogramBin(value, bins):
+    """
+    Bin of a weight value over 0-1, values outside land in the end bins
+    """
+    index = int(value * bins)
+    return 0 if index < 0 else bins - 1 if index >= bins else index
+
+
+def analyzeWeights(data, maxInfluences=4, pruneBelow=0.001, sumTolerance=0.005, bins=10):
+    """
+    Report dictionary for WeightsData. A weight counts towards a vertex's
+    influences when it is at least pruneBelow.
+    """
+    startTime = time.time()
+    infIds, values, offsets, vertIds = data.infIds, data.values, data.offsets, data.vertIds
+
+    histogram = [0] * bins
+    influenceCounts = {}
+    totals = {}
+    maxima = {}
+    vertexCounts = {}
+    badSums = []
+    overInfluenced = []
+    tinyVertices = []
+    tinyCount = 0
+    outOfRange = []
+    emptyVertices = []
+
+    start = offsets[0]
+    for r, vertId in enumerate(vertIds):
+        end = offsets[r + 1]
+        if start == end:
+            emptyVertices.append(vertId)
+            influenceCounts[0] = influenceCounts.get(0, 0) + 1
+            continue
+
+        total = 0.0
+        used = 0
+        tiny = False
+        for i in range(start, end):
+            value = values[i]
+            infId = infIds[i]
+            total += value
+            histogram[histogramBin(value, bins)] += 1
+
+            if value < 0.0 or value > 1.0:
+                outOfRange.append(vertId)
+            if value >= pruneBelow:
+                used += 1
+                totals[infId] = totals.get(infId, 0.0) + value
+                vertexCounts[infId] = vertexCounts.get(infId, 0) + 1
+                if value > maxima.get(infId, 0.0):
+                    maxima[infId] = value
+            elif value > 0.0:
+                tinyCount += 1
+                tiny = True
+
+        if abs(total - 1.0) > sumTolerance:
+            badSums.append((vertId, total))
+        if used > maxInfluences:
+            overInfluenced.append(vertId)
+        if tiny:
+            tinyVertices.append(vertId)
+        influenceCounts[used] = influenceCounts.get(used, 0) + 1
+        start = end
+
+    influences = {}
+    for infId in data.influenceIds():
+        influences[str(infId)] = {'name': data.influences.get(infId, ''),
+                                  'total': totals.get(infId, 0.0),
+                                  'vertices': vertexCounts.get(infId, 0),
+                                  'max': maxima.get(infId, 0.0)}
+    deadInfluences = [infId for infId in data.influenceIds() if not vertexCounts.get(infId)]
+    outOfRange = sorted(set(outOfRange))
+
+    return {
+        'mesh': data.meshName,
+        'vertices': data.vertexCount(),
+        'weights': data.weightCount(),
+        'settings': {'maxInfluences': maxInfluences, 'pruneBelow': pruneBelow,
+                     'sumTolerance': sumTolerance, 'bins': bins},
+        'badSums': {'count': len(badSums),
+                    'vertices': [{'vertId': vertId, 'sum': total} for vertId, total in badSums[:MAX_LISTED]]},
+        'overInfluenced': {'count': len(overInfluenced), 'vertices': overInfluenced[:MAX_LISTED]},
+        'influenceCounts': dict((str(count), vertices) for count, vertices in influenceCounts.items()),
+        'deadInfluences': [{'idx': infId, 'name': data.influences.get(infId, '')} for infId in deadInfluences],
+        'tinyWeights': {'count': tinyCount, 'vertexCount': len(tinyVertices),
+                        'vertices': tinyVertices[:MAX_LISTED]},
+        'outOfRange': {'count': len(outOfRange), 'vertices': outOfRange[:MAX_LISTED]},
+        'emptyVertices': {'count': len(emptyVertices), 'vertices': emptyVertices[:MAX_LISTED]},
+        'influences': influences,
+        'histogram': {'edges': [float(i) / bins for i in range(bins + 1)], 'counts': histogram},
+        'elapsed': time.time() - startTime,
+    }
+
+
+def isClean(report):
+    """
+    True when the report has nothing that would need fixing before an import
+    """
+    return not (report['badSums']['count'] or report['overInfluenced']['count'] or
+                report['outOfRange']['count'] or report['emptyVertices']['count'])
+
+
+def analyzeFile(fileName, **kwargs):
+    startTime = time.time()
+    data = weightsFile.readWeights(fileName)
+    readTime = time.time() - startTime
+
+    report = analyzeWeights(data, **kwargs)
+    report['file'] = fileName
+    report['readTime'] = readTime
+    return report
+
+
+def reportFileName(fileName):
+    return os.path.splitext(fileName)[0] + '_report.json'
+
+
+def writeReport(report, fileName):
+    with open(fileName, 'w') as f:
+        json.dump(report, f, indent=1, sort_keys=True)
+
+
+def summary(report):
+    lines = ['%s: %d vertices, %d weights, read %.3fs, analyzed %.3fs' % (
+        report.get('file', report['mesh']), report['vertices'], report['weights'],
+        report.get('readTime', 0.0), report['elapsed'])]
+    for key, label in (('badSums', 'bad sums'), ('overInfluenced', 'over max influences'),
+                       ('tinyWeights', 'tiny weights'), ('outOfRange', 'weights out of 0-1'),
+                       ('emptyVertices', 'vertices without weights')):
+        if report[key]['count']:
+            lines.append('  %d %s' % (report[key]['count'], label))
+    if report['deadInfluences']:
+        lines.append('  dead influences: %s' % ', '.join(
+            entry['name'] or str(entry['idx']) for entry in report['deadInfluences']))
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Check tbLoadSaveWeights files before importing them')
+    parser.add_argument('paths', nargs='+', help='weights files or directories of them')
+    parser.add_argument('--json', help='write all reports to this file')
+    parser.add_argument('--max-influences', type=int, default=4)
+    parser.add_argument('--prune-below', type=float, default=0.001)
+    parser.add_argument('--sum-tolerance', type=float, default=0.005)
+    args = parser.parse_args(argv)
+
+    reports = []
+    failed = 0
+    for fileName in weightsFile.findWeightsFiles(args.paths):
+        try:
+            report = analyzeFile(fileName, maxInfluences=args.max_influences, pruneBelow=args.prune_below,
+                                 sumTolerance=args.sum_tolerance)
+        except (IOError, weightsFile.WeightsFileError) as e:
+            sys.stdout.write('FAILED %s: %s\n' % (fileName, e))
+            reports.append({'file': fileName, 'error': str(e)})
+            failed += 1
+            continue
+        sys.stdout.write(summary(report) + '\n')
+        reports.append(report)
+        failed += not isClean(report)
+
+    if args.json:
+        writeReport(reports, args.json)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
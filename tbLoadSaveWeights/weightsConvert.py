@@ -0,0 +1,239 @@
+"""
+Convert and verify tbLoadSaveWeights files outside of Maya.
+
+Files are converted between compact XML, pretty printed XML and the binary
+tbw format, each optionally gzipped (.gz), in a pool of worker processes.
+With verify, every converted file is read back and compared with its source
+column by column, so an archive can be migrated and checked in one pass.
+Existing target files are never overwritten unless force is given, they are
+reported as failures instead. This includes a target that is the source file
+itself, e.g. compact to pretty printed XML next to the source: use --out for
+another directory or --force to convert the file in place.
+
+    # XML archive to gzipped binary next to a new root, 16 processes
+    python weightsConvert.py /assets/weights --to tbw.gz --out /assets/weightsTbw -j 16 --verify
+
+    # Only check that the files survive a round trip through tbw
+    python weightsConvert.py /assets/weights --to tbw --check
+
+    # Convert again over the files of an earlier run
+    python weightsConvert.py /assets/weights --to tbw.gz --out /assets/weightsTbw --force
+
+    result = weightsConvert.convertFile('body.xml', 'body.tbw', verify=True)
+"""
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+import traceback
+
+import weightsFile
+
+# --to choices, the file extension of the converted files
+TARGETS = ('xml', 'xml.gz', 'tbw', 'tbw.gz')
+
+
+def stripExtension(fileName):
+    """
+    fileName without its weights file extension, e.g. body.tbw.gz -> body
+    """
+    if fileName.lower().endswith('.gz'):
+        fileName = fileName[:-3]
+    return os.path.splitext(fileName)[0]
+
+
+def targetFileName(fileName, target, outDir=None, rootDir=None):
+    """
+    Converted file name: next to the source, or at the same path relative to
+    rootDir under outDir
+    """
+    name = '%s.%s' % (stripExtension(fileName), target)
+    if outDir is None:
+        return name
+    if rootDir is None:
+        return os.path.join(outDir, os.path.basename(name))
+    return os.path.join(outDir, os.path.relpath(name, rootDir))
+
+
+def verifyFile(source, target):
+    """
+    Differences between the data of two weights files, empty when equal
+    """
+    return weightsFile.compareWeights(weightsFile.readWeights(source), weightsFile.readWeights(target))
+
+
+def convertFile(source, target, prettyPrint=False, verify=False, force=False):
+    """
+    Convert source to the format of target's extension, returns a result
+    dictionary and raises on failure. An existing target is only
+    overwritten with force, a target that is the source is written to a
+    temporary file first and then moved over it.
+    """
+    inPlace = os.path.abspath(target) == os.path.abspath(source)
+    if not force and inPlace:
+        raise IOError('%s is the source file, use --out for another directory or --force to convert it in place'
+                      % target)
+    if not force and os.path.exists(target):
+        raise IOError('%s exists, use force to overwrite it' % target)
+
+    startTime = time.time()
+    sourceSize = os.path.getsize(source)
+    data = weightsFile.readWeights(source)
+    readTime = time.time() - startTime
+
+    directory = os.path.dirname(os.path.abspath(target))
+    if not os.path.isdir(directory):
+        try:
+            os.makedirs(directory)
+        except OSError:
+            # Made by another worker in the meantime
+            if not os.path.isdir(directory):
+                raise
+    if inPlace:
+        # The name keeps the extension, it picks the format
+        directory, fileName = os.path.split(os.path.abspath(target))
+        temporary = os.path.join(directory, '.converting_%d_%s' % (os.getpid(), fileName))
+        try:
+            weightsFile.writeWeights(data, temporary, prettyPrint)
+        except Exception:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            raise
+        os.remove(target)
+        os.rename(temporary, target)
+    else:
+        weightsFile.writeWeights(data, target, prettyPrint)
+
+    result = {'source': source, 'target': target, 'vertices': data.vertexCount(), 'weights': data.weightCount(),
+              'readTime': readTime, 'writeTime': time.time() - startTime - readTime,
+              'sourceSize': sourceSize, 'targetSize': os.path.getsize(target), 'differences': []}
+    if verify:
+        result['differences'] = weightsFile.compareWeights(data, weightsFile.readWeights(target))
+    return result
+
+
+def checkRoundTrip(source, target):
+    """
+    Convert source to a temporary file of target's format and compare it,
+    nothing is kept
+    """
+    directory = tempfile.mkdtemp(prefix='weightsConvert')
+    try:
+        result = convertFile(source, os.path.join(directory, os.path.basename(target)), verify=True)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    result['target'] = None
+    return result
+
+
+def _runTask(task):
+    """
+    Convert or check one (source, target, prettyPrint, verify, check, force) task, never raises
+    """
+    source, target, prettyPrint, verify, check, force = task
+    startTime = time.time()
+    try:
+        if check:
+            result = checkRoundTrip(source, target)
+        else:
+            result = convertFile(source, target, prettyPrint, verify, force)
+        result['error'] = None
+    except Exception as e:
+        result = {'source': source, 'target': target, 'error': '%s: %s' % (type(e).__name__, e),
+                  'traceback': traceback.format_exc(), 'differences': []}
+    result['elapsed'] = time.time() - startTime
+    return result
+
+
+def _imap(tasks, processes):
+    if processes == 1:
+        for task in tasks:
+            yield _runTask(task)
+        return
+
+    pool = multiprocessing.Pool(processes)
+    try:
+        # Small chunks keep all workers busy when file sizes vary a lot
+        for result in pool.imap_unordered(_runTask, tasks, chunksize=4):
+            yield result
+    finally:
+        pool.close()
+        pool.join()
+
+
+def convertFiles(paths, target='tbw', outDir=None, prettyPrint=False, verify=False, check=False,
+                 processes=None, callback=None, force=False):
+    """
+    Convert the weights files given or found under the directories of paths,
+    returns the result dictionaries. callback(result) is called as each
+    file finishes. Files whose target exists fail unless force is set.
+    """
+    if target not in TARGETS:
+        raise ValueError('Unknown target format %s, use one of %s' % (target, ', '.join(TARGETS)))
+
+    tasks = []
+    for path in paths:
+        rootDir = path if os.path.isdir(path) else None
+        for fileName in weightsFile.findWeightsFiles([path]):
+            targetName = targetFileName(fileName, target, outDir, rootDir)
+            tasks.append((fileName, targetName, prettyPrint, verify, check, force))
+
+    processes = max(1, min(processes or multiprocessing.cpu_count(), len(tasks) or 1))
+    results = []
+    for result in _imap(tasks, processes):
+        results.append(result)
+        if callback is not None:
+            callback(result)
+    return results
+
+
+def isFailure(result):
+    return bool(result['error'] or result['differences'])
+
+
+def summary(results, elapsed):
+    failures = [result for result in results if isFailure(result)]
+    sourceSize = sum(result.get('sourceSize', 0) for result in results)
+    targetSize = sum(result.get('targetSize', 0) for result in results)
+    lines = ['%d files, %d failed, %.2fs, %.1f MB -> %.1f MB' % (
+        len(results), len(failures), elapsed, sourceSize / 1048576.0, targetSize / 1048576.0)]
+    for result in failures:
+        lines.append('FAILED %s: %s' % (result['source'], result['error'] or '; '.join(result['differences'])))
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Convert and verify tbLoadSaveWeights files')
+    parser.add_argument('paths', nargs='+', help='weights files or directories of them')
+    parser.add_argument('--to', dest='target', choices=TARGETS, default='tbw', help='format to convert to')
+    parser.add_argument('--out', help='output root directory, defaults to next to each source file')
+    parser.add_argument('--pretty', action='store_true', help='indent XML output')
+    parser.add_argument('--verify', action='store_true', help='read every converted file back and compare')
+    parser.add_argument('--check', action='store_true', help='only check the round trip, write nothing')
+    parser.add_argument('--force', action='store_true', help='overwrite existing converted files')
+    parser.add_argument('-j', '--processes', type=int, help='worker processes, defaults to the cpu count')
+    parser.add_argument('--report', help='write the per file results to this JSON file')
+    args = parser.parse_args(argv)
+
+    def progress(result):
+        status = 'FAILED' if isFailure(result) else 'ok'
+        sys.stdout.write('%-8s %s %.2fs\n' % (status, result['source'], result['elapsed']))
+
+    startTime = time.time()
+    results = convertFiles(args.paths, args.target, args.out, args.pretty, args.verify, args.check,
+                           args.processes, progress, args.force)
+    sys.stdout.write(summary(results, time.time() - startTime) + '\n')
+
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(results, f, indent=1, sort_keys=True)
+    return 1 if any(isFailure(result) for result in results) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,401 @@
+"""
+Reading and writing tbLoadSaveWeights files, without Maya.
+
+Weights are held as WeightsData, a sparse column layout of flat arrays: one
+entry per vertex in vertIds/offsets and one entry per stored weight in
+infIds/values. The weights of vertex row r are
+values[offsets[r]:offsets[r + 1]]. This keeps a 500k vertex file at a few
+flat arrays instead of a dictionary per vertex, and lets analysis run as one
+pass over the columns.
+
+File layout written by tbLoadSaveWeights:
+
+    <root>
+      <mesh name="body" vertexCount="5000" region="set:lipVerts">
+        <vertId index="0" path="body.vtx[0]">
+          <inf idx="0" weight="0.75"/>
+          ...
+      </mesh>
+      <influences>
+        <inf idx="0" name="|root|spine01"/>
+      </influences>
+    </root>
+
+The influences element and the vertexCount/region attributes are optional
+and older files do not have them. A region file holds only some of the
+mesh's vertices: importing it leaves the other vertices alone.
+
+    data = weightsFile.readWeights('c:/weights.xml')
+    data.vertexCount(), data.weightCount()
+    weightsFile.writeWeights(data, 'c:/weights.tbw.gz')
+"""
+from array import array
+import gzip
+import json
+import os
+import struct
+import sys
+from xml.sax.saxutils import escape, quoteattr
+
+try:
+    import xml.etree.cElementTree as cElement
+except ImportError:
+    import xml.etree.ElementTree as cElement
+
+
+# xml is the format tbLoadSaveWeights has always written, tbw is the same
+# data as binary columns, several times faster to read and write.
+# Either can be gzipped by adding .gz to the file name.
+FORMATS = ('xml', 'tbw')
+BINARY_MAGIC = b'TBW1'
+
+
+class WeightsFileError(ValueError):
+    pass
+
+
+class WeightsData(object):
+    """
+    Sparse skin weights of one mesh
+    """
+    def __init__(self, meshName='', influences=None):
+        self.meshName = meshName
+        # {influence index: influence name}, empty when the file has no names
+        self.influences = dict(influences or {})
+        # Vertex count of the whole mesh, 0 when unknown
+        self.meshVertexCount = 0
+        # '' for the whole mesh, else what the vertices were taken from
+        self.region = ''
+        self.vertIds = array('i')
+        self.offsets = array('i', [0])
+        self.infIds = array('i')
+        self.values = array('d')
+
+    def addVertex(self, vertId, weights):
+        """
+        Append a vertex row, weights is a sequence of (influence index, weight)
+        """
+        self.vertIds.append(int(vertId))
+        for infId, value in weights:
+            self.infIds.append(int(infId))
+            self.values.append(float(value))
+        self.offsets.append(len(self.values))
+
+    def vertexCount(self):
+        return len(self.vertIds)
+
+    def weightCount(self):
+        return len(self.values)
+
+    def isRegion(self):
+        return bool(self.region)
+
+    def influenceIds(self):
+        """
+        Sorted influence indices named in the file or used by any weight
+        """
+        return sorted(set(self.influences) | set(self.infIds))
+
+    def row(self, r):
+        """
+        [(influence index, weight)] of vertex row r
+        """
+        start, end = self.offsets[r], self.offsets[r + 1]
+        return list(zip(self.infIds[start:end], self.values[start:end]))
+
+    def rows(self):
+        """
+        Iterate (vertId, [(influence index, weight)]) in file order
+        """
+        infIds, values, offsets = self.infIds, self.values, self.offsets
+        for r, vertId in enumerate(self.vertIds):
+            start, end = offsets[r], offsets[r + 1]
+            yield vertId, list(zip(infIds[start:end], values[start:end]))
+
+    def toDict(self):
+        """
+        {vertId: {influence index: weight}}, the dictionary the plugin works with
+        """
+        return dict((vertId, dict(weights)) for vertId, weights in self.rows())
+
+    @classmethod
+    def fromDict(cls, weights, meshName='', influences=None):
+        data = cls(meshName, influences)
+        for vertId in sorted(weights, key=int):
+            data.addVertex(vertId, sorted(weights[vertId].items(), key=lambda item: int(item[0])))
+        return data
+
+
+def compactRanges(vertIds):
+    """
+    Sorted (start, end) runs of consecutive ids, for component strings such as vtx[0:99]
+    """
+    ranges = []
+    for vertId in sorted(set(vertIds)):
+        if ranges and vertId == ranges[-1][1] + 1:
+            ranges[-1][1] = vertId
+        else:
+            ranges.append([vertId, vertId])
+    return [tuple(item) for item in ranges]
+
+
+def fileFormat(fileName):
+    """
+    'xml' or 'tbw' from the file extension, a trailing .gz is ignored
+    """
+    name = fileName.lower()
+    if name.endswith('.gz'):
+        name = name[:-3]
+    fmt = os.path.splitext(name)[1][1:]
+    if fmt not in FORMATS:
+        raise WeightsFileError('Unknown weights file format: %s' % fileName)
+    return fmt
+
+
+def openFile(fileName, mode='rb'):
+    if fileName.lower().endswith('.gz'):
+        return gzip.open(fileName, mode)
+    return open(fileName, mode)
+
+
+def readWeights(fileName):
+    """
+    Read a weights file of any format into WeightsData
+    """
+    fmt = fileFormat(fileName)
+    with openFile(fileName) as f:
+        if fmt == 'tbw':
+            return readBinary(f, fileName)
+        return readXml(f, fileName)
+
+
+def writeWeights(data, fileName, prettyPrint=False):
+    """
+    Write WeightsData in the format of the file extension, prettyPrint indents XML
+    """
+    fmt = fileFormat(fileName)
+    with openFile(fileName, 'wb') as f:
+        if fmt == 'tbw':
+            writeBinary(data, f)
+        else:
+            writeXml(data, f, prettyPrint)
+
+
+def readXml(f, fileName=''):
+    """
+    Stream a weights XML file into WeightsData. Elements are cleared as they
+    are read so the whole document is never held in memory.
+    """
+    data = WeightsData()
+    meshFound = False
+    inInfluences = False
+    weights = []
+
+    try:
+        for event, elem in cElement.iterparse(f, events=('start', 'end')):
+            tag = elem.tag
+            if event == 'start':
+                if tag == 'mesh':
+                    meshFound = True
+                    data.meshName = elem.get('name', '')
+                    data.meshVertexCount = int(elem.get('vertexCount', 0))
+                    data.region = elem.get('region', '')
+                elif tag == 'influences':
+                    inInfluences = True
+                elif tag == 'vertId':
+                    weights = []
+                continue
+
+            if tag == 'inf':
+                if inInfluences:
+                    data.influences[int(elem.get('idx'))] = elem.get('name', '')
+                else:
+                    weights.append((elem.get('idx'), elem.get('weight')))
+            elif tag == 'vertId':
+                data.addVertex(elem.get('index'), weights)
+                elem.clear()
+            elif tag == 'influences':
+                inInfluences = False
+                elem.clear()
+    except SyntaxError as e:
+        raise WeightsFileError('Could not parse %s: %s' % (fileName, e))
+    except (TypeError, ValueError) as e:
+        raise WeightsFileError('Bad weight entry in %s: %s' % (fileName, e))
+
+    if not meshFound:
+        raise WeightsFileError('No mesh element in %s' % fileName)
+    return data
+
+
+def writeXml(data, f, prettyPrint=False, chunkSize=4096):
+    """
+    Write the XML document vertex by vertex, prettyPrint gives the indented
+    layout the minidom export used to write
+    """
+    meshName = data.meshName
+    indent, newline = ('  ', '\n') if prettyPrint else ('', '')
+    meshAttrs = 'name=%s' % quoteattr(meshName)
+    if data.meshVertexCount:
+        meshAttrs += ' vertexCount="%d"' % data.meshVertexCount
+    if data.region:
+        meshAttrs += ' region=%s' % quoteattr(data.region)
+
+    lines = []
+    if prettyPrint:
+        lines.append('<?xml version="1.0" ?>\n')
+    lines.append('<root>%s%s<mesh %s>%s' % (newline, indent, meshAttrs, newline))
+
+    vertexPath = escape(meshName, {'"': '&quot;'})
+    for vertId, weights in data.rows():
+        vertAttrs = 'index="%d" path="%s.vtx[%d]"' % (vertId, vertexPath, vertId)
+        if not weights:
+            lines.append('%s<vertId %s/>%s' % (indent * 2, vertAttrs, newline))
+            continue
+        lines.append('%s<vertId %s>%s' % (indent * 2, vertAttrs, newline))
+        for infId, value in weights:
+            lines.append('%s<inf idx="%d" weight="%r"/>%s' % (indent * 3, infId, value, newline))
+        lines.append('%s</vertId>%s' % (indent * 2, newline))
+
+        if len(lines) >= chunkSize:
+            f.write(''.join(lines).encode('utf-8'))
+            lines = []
+
+    lines.append('%s</mesh>%s' % (indent, newline))
+    if data.influences:
+        lines.append('%s<influences>%s' % (indent, newline))
+        for infId in sorted(data.influences):
+            lines.append('%s<inf idx="%d" name=%s/>%s' % (
+                indent * 2, infId, quoteattr(data.influences[infId]), newline))
+        lines.append('%s</influences>%s' % (indent, newline))
+    lines.append('%s<!--eof-->%s</root>%s' % (indent, newline, newline))
+    f.write(''.join(lines).encode('utf-8'))
+
+
+def arrayBytes(values):
+    if sys.byteorder != 'little':
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes() if hasattr(values, 'tobytes') else values.tostring()
+
+
+def readArray(f, typecode, count):
+    values = array(typecode)
+    size = values.itemsize * count
+    buf = f.read(size)
+    if len(buf) != size:
+        raise WeightsFileError('Weights file is truncated')
+    if hasattr(values, 'frombytes'):
+        values.frombytes(buf)
+    else:
+        values.fromstring(buf)
+    if sys.byteorder != 'little':
+        values.byteswap()
+    return values
+
+
+def writeBinary(data, f):
+    """
+    tbw layout: magic, header length (uint32), JSON header, then the
+    vertIds, offsets, infIds (int32) and values (float64) columns, little endian
+    """
+    header = {'mesh': data.meshName, 'meshVertexCount': data.meshVertexCount, 'region': data.region,
+              'influences': dict((str(infId), name) for infId, name in data.influences.items()),
+              'vertices': data.vertexCount(), 'weights': data.weightCount()}
+    header = json.dumps(header, sort_keys=True).encode('utf-8')
+
+    f.write(BINARY_MAGIC)
+    f.write(struct.pack('<I', len(header)))
+    f.write(header)
+    for values in (data.vertIds, data.offsets, data.infIds, data.values):
+        f.write(arrayBytes(values))
+
+
+def readBinary(f, fileName=''):
+    if f.read(len(BINARY_MAGIC)) != BINARY_MAGIC:
+        raise WeightsFileError('Not a tbw weights file: %s' % fileName)
+    try:
+        size = struct.unpack('<I', f.read(4))[0]
+        header = json.loads(f.read(size).decode('utf-8'))
+    except (struct.error, ValueError) as e:
+        raise WeightsFileError('Bad tbw header in %s: %s' % (fileName, e))
+
+    data = WeightsData(header['mesh'], dict((int(infId), name) for infId, name in header['influences'].items()))
+    data.meshVertexCount = header['meshVertexCount']
+    data.region = header['region']
+    data.vertIds = readArray(f, 'i', header['vertices'])
+    data.offsets = readArray(f, 'i', header['vertices'] + 1)
+    data.infIds = readArray(f, 'i', header['weights'])
+    data.values = readArray(f, 'd', header['weights'])
+    return data
+
+
+def compareWeights(first, second):
+    """
+    Differences between two WeightsData as messages, empty when they are equal
+    """
+    differences = []
+    for label in ('meshName', 'meshVertexCount', 'region', 'influences'):
+        if getattr(first, label) != getattr(second, label):
+            differences.append('%s differs: %r != %r' % (label, getattr(first, label), getattr(second, label)))
+    for label in ('vertIds', 'offsets', 'infIds', 'values'):
+        a, b = getattr(first, label), getattr(second, label)
+        if len(a) != len(b):
+            differences.append('%s has %d entries, %d expected' % (label, len(b), len(a)))
+        elif a != b:
+            index = next(i for i in range(len(a)) if a[i] != b[i])
+            differences.append('%s differs first at entry %d: %r != %r' % (label, index, a[index], b[index]))
+    return differences
+
+
+def diffWeights(current, incoming, epsilon=1e-5):
+    """
+    The rows of incoming that differ from current by more than epsilon for
+    any influence, and the number of rows skipped as unchanged. Both are
+    {vertId: {influence index: weight}}. A changed row also gets a 0 for
+    each influence the vertex has now and incoming does not, so writing
+    it replaces the row completely.
+    """
+    changed = {}
+    skipped = 0
+    for vertId, weights in incoming.items():
+        existing = current.get(vertId, {})
+        differs = False
+        for infId, value in weights.items():
+            if abs(value - existing.get(infId, 0.0)) > epsilon:
+                differs = True
+                break
+        else:
+            for infId, value in existing.items():
+                if infId not in weights and abs(value) > epsilon:
+                    differs = True
+                    break
+
+        if not differs:
+            skipped += 1
+            continue
+        row = dict(weights)
+        for infId, value in existing.items():
+            if infId not in row and value:
+                row[infId] = 0.0
+        changed[vertId] = row
+    return changed, skipped
+
+
+def findWeightsFiles(paths):
+    """
+    Weights files given directly or found under the given directories
+    """
+    fileNames = []
+    for path in paths:
+        if os.path.isdir(path):
+            for directory, dirNames, names in os.walk(path):
+                dirNames.sort()
+                for name in sorted(names):
+                    try:
+                        fileFormat(name)
+                    except WeightsFileError:
+                        continue
+                    fileNames.append(os.path.join(directory, name))
+        else:
+            fileNames.append(path)
+    return fileNames
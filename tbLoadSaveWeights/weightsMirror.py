@@ -0,0 +1,190 @@
+"""
+Mirror skin weights across a plane, without Maya.
+
+Each vertex on the destination side is reflected across the plane and
+matched to the source vertex within tolerance through a spatial hash of the
+source side, a grid of tolerance sized cells so a lookup only visits the
+27 cells around the point and takes the nearest source among them. The
+source weights are copied with every influence swapped for its other side
+counterpart, found by side naming rules such as L_* <-> R_* or *_l <-> *_r.
+Influences without a counterpart (spine, head) keep their index. Vertices on the plane are left alone.
+
+    result = weightsMirror.mirrorWeights(data, positions, 'YZ', tolerance=0.001,
+                                         influenceMap=weightsMirror.influenceMap(infNames))
+    result.data        # WeightsData of the destination vertices
+    result.unmatched   # destination vertex ids with no source within tolerance
+
+positions is a flat x, y, z sequence indexed by vertex id.
+"""
+import time
+
+import weightsFile
+
+# Axis normal to each mirror plane
+PLANES = {'YZ': 0, 'XZ': 1, 'XY': 2}
+
+# Pairs of side patterns, * is the rest of the name
+DEFAULT_SIDE_RULES = (
+    ('L_*', 'R_*'), ('*_L', '*_R'),
+    ('l_*', 'r_*'), ('*_l', '*_r'),
+    ('Lf_*', 'Rt_*'), ('*_Lf', '*_Rt'),
+    ('lf_*', 'rt_*'), ('*_lf', '*_rt'),
+    ('left*', 'right*'), ('*Left', '*Right'),
+)
+
+
+def matchPattern(name, pattern):
+    """
+    The part of name matched by the * of pattern, or None
+    """
+    prefix, suffix = pattern.split('*', 1)
+    if len(name) > len(prefix) + len(suffix) and name.startswith(prefix) and name.endswith(suffix):
+        return name[len(prefix):len(name) - len(suffix)]
+    return None
+
+
+def mirrorName(name, rules=DEFAULT_SIDE_RULES):
+    """
+    Name with each path component swapped to the other side, name itself when no rule matches
+    """
+    components = []
+    for component in name.split('|'):
+        for left, right in rules:
+            for source, target in ((left, right), (right, left)):
+                middle = matchPattern(component, source)
+                if middle is not None:
+                    component = target.replace('*', middle)
+                    break
+            else:
+                continue
+            break
+        components.append(component)
+    return '|'.join(components)
+
+
+def influenceMap(infNames, rules=DEFAULT_SIDE_RULES):
+    """
+    {influence index: mirrored influence index} for the influences with a
+    counterpart among infNames. Names are compared without their paths.
+    """
+    shortNames = dict((name.split('|')[-1], index) for index, name in enumerate(infNames))
+    mapping = {}
+    for index, name in enumerate(infNames):
+        mirrored = mirrorName(name.split('|')[-1], rules)
+        if mirrored in shortNames and shortNames[mirrored] != index:
+            mapping[index] = shortNames[mirrored]
+    return mapping
+
+
+class SpatialHash(object):
+    """
+    Points bucketed in cubic cells of cellSize
+    """
+    def __init__(self, cellSize):
+        self.cellSize = float(cellSize)
+        self.cells = {}
+
+    def key(self, x, y, z):
+        size = self.cellSize
+        return int(x // size), int(y // size), int(z // size)
+
+    def add(self, item, x, y, z):
+        key = self.key(x, y, z)
+        bucket = self.cells.get(key)
+        if bucket is None:
+            self.cells[key] = [(item, x, y, z)]
+        else:
+            bucket.append((item, x, y, z))
+
+    def closest(self, x, y, z, tolerance):
+        """
+        Nearest item within tolerance (at most cellSize) of the point, or
+        None. All 27 cells around the point are searched, a point in a
+        neighbouring cell can be closer than any in the point's own cell.
+        """
+        best, bestDistance = None, tolerance * tolerance
+        cx, cy, cz = self.key(x, y, z)
+        cells = self.cells
+        for i in (cx - 1, cx, cx + 1):
+            for j in (cy - 1, cy, cy + 1):
+                for k in (cz - 1, cz, cz + 1):
+                    bucket = cells.get((i, j, k))
+                    if bucket:
+                        item, distance = self.search(bucket, x, y, z, bestDistance)
+                        if item is not None:
+                            best, bestDistance = item, distance
+        return best
+
+    def search(self, bucket, x, y, z, limit):
+        best, bestDistance = None, limit
+        for item, px, py, pz in bucket:
+            distance = (px - x) * (px - x) + (py - y) * (py - y) + (pz - z) * (pz - z)
+            if distance <= bestDistance:
+                best, bestDistance = item, distance
+        return best, bestDistance
+
+
+class MirrorResult(object):
+    def __init__(self, data):
+        self.data = data
+        self.matched = 0
+        self.unmatched = []
+        self.onPlane = 0
+        self.elapsed = 0.0
+
+    def asDict(self):
+        return {'matched': self.matched, 'unmatched': len(self.unmatched), 'onPlane': self.onPlane,
+                'elapsed': self.elapsed}
+
+    def summary(self):
+        return 'Mirrored %d vertices, %d unmatched, %d on the plane, %.3fs' % (
+            self.matched, len(self.unmatched), self.onPlane, self.elapsed)
+
+
+def mirrorWeights(data, positions, plane='YZ', inverse=False, tolerance=0.001, influenceMap=None):
+    """
+    Mirror WeightsData across plane, from the positive side to the negative
+    one, or the other way with inverse. The result rows replace the
+    destination rows: influences the destination vertex had before and no
+    longer gets are written as 0.
+    """
+    startTime = time.time()
+    if plane.upper() not in PLANES:
+        raise ValueError('Unknown mirror plane %s, use one of %s' % (plane, ', '.join(sorted(PLANES))))
+    axis = PLANES[plane.upper()]
+    side = -1.0 if inverse else 1.0
+    mapping = influenceMap or {}
+
+    rowOf = dict((vertId, r) for r, vertId in enumerate(data.vertIds))
+    spatialHash = SpatialHash(tolerance)
+    destinations = []
+    result = MirrorResult(weightsFile.WeightsData(data.meshName, data.influences))
+
+    for vertId in range(len(positions) // 3):
+        point = positions[vertId * 3:vertId * 3 + 3]
+        distance = point[axis] * side
+        if distance > tolerance:
+            if vertId in rowOf:
+                spatialHash.add(vertId, point[0], point[1], point[2])
+        elif distance < -tolerance:
+            destinations.append(vertId)
+        else:
+            result.onPlane += 1
+
+    for vertId in destinations:
+        point = list(positions[vertId * 3:vertId * 3 + 3])
+        point[axis] = -point[axis]
+        sourceId = spatialHash.closest(point[0], point[1], point[2], tolerance)
+        if sourceId is None:
+            result.unmatched.append(vertId)
+            continue
+
+        weights = dict((mapping.get(infId, infId), value) for infId, value in data.row(rowOf[sourceId]))
+        if vertId in rowOf:
+            for infId, value in data.row(rowOf[vertId]):
+                weights.setdefault(infId, 0.0)
+        result.data.addVertex(vertId, sorted(weights.items()))
+        result.matched += 1
+
+    result.elapsed = time.time() - startTime
+    return result
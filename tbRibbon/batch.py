@@ -0,0 +1,264 @@
+# File: batch.py
+# Notes: Headless batch builder for ribbon limbs
+#
+# Builds the ribbons of a JSON job spec in a pool of worker processes. Each
+# worker process starts one Maya standalone session and builds its jobs in a
+# fresh scene, saving each to the job's output file. Per job timings and
+# failures are collected into a BatchResults report.
+#
+# Job spec, either a list of jobs or an object with options and jobs:
+#
+#     {"processes": 8, "worker": "maya",
+#      "jobs": [{"name": "tentacle01", "numJnts": 12, "width": 10.0, "lengthRatio": 0.1,
+#                "setupCons": true, "mode": "fast", "output": "/crowd/ribbons/tentacle01.ma"}]}
+#
+# worker is 'maya', 'stub' (stub maya.cmds from profiler, nothing is saved,
+# for tests and dry runs) or 'package.module:Class' for a custom worker with
+# initialize() and build(job) methods.
+#
+#     mayapy batch.py jobs.json -j 8 --report report.json
+import importlib
+import json
+import multiprocessing
+import os
+import sys
+import time
+import traceback
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+JOB_DEFAULTS = {'numJnts': 5, 'width': 5.0, 'lengthRatio': 0.2, 'setupCons': True, 'output': None}
+LIMB_OPTIONS = ('mode', 'distribution', 'samples')
+
+
+class JobSpecError(ValueError):
+    pass
+
+
+def normalizeJob(job, index=0):
+    if not isinstance(job, dict) or not job.get('name'):
+        raise JobSpecError('Job %d needs a name' % index)
+
+    unknown = set(job) - set(JOB_DEFAULTS) - set(LIMB_OPTIONS) - set(['name'])
+    if unknown:
+        raise JobSpecError('Job %s has unknown keys: %s' % (job['name'], ', '.join(sorted(unknown))))
+
+    result = dict(JOB_DEFAULTS)
+    result.update(job)
+    result['numJnts'] = int(result['numJnts'])
+    result['width'] = float(result['width'])
+    result['lengthRatio'] = float(result['lengthRatio'])
+    result['setupCons'] = bool(result['setupCons'])
+    return result
+
+
+def parseJobSpec(data):
+    """
+    Return (jobs, options) from a loaded job spec
+    """
+    if isinstance(data, list):
+        data = {'jobs': data}
+    jobs = [normalizeJob(job, index) for index, job in enumerate(data.get('jobs', []))]
+
+    names = [job['name'] for job in jobs]
+    duplicates = sorted(set(name for name in names if names.count(name) > 1))
+    if duplicates:
+        raise JobSpecError('Duplicate job names: %s' % ', '.join(duplicates))
+
+    options = dict((key, value) for key, value in data.items() if key != 'jobs')
+    return jobs, options
+
+
+def loadJobSpec(fileName):
+    with open(fileName) as f:
+        return parseJobSpec(json.load(f))
+
+
+class MayaWorker(object):
+    """
+    Builds jobs in a Maya standalone session, one new scene per job
+    """
+    def initialize(self):
+        import maya.standalone
+        maya.standalone.initialize(name='python')
+
+    def build(self, job):
+        import maya.cmds as cmds
+        import core
+
+        cmds.file(new=True, force=True)
+        core.RibbonLimb(job['name'], job['numJnts'], job['width'], job['lengthRatio'], job['setupCons'],
+                        undoable=False, **limbOptions(job))
+
+        output = job.get('output')
+        if output:
+            makeDirs(output)
+            cmds.file(rename=output)
+            cmds.file(save=True, force=True, type='mayaBinary' if output.endswith('.mb') else 'mayaAscii')
+        return {'output': output}
+
+
+class StubWorker(object):
+    """
+    Builds jobs against the stub maya.cmds of profiler and reports the command
+    call count, no scene is saved
+    """
+    def initialize(self):
+        import profiler
+        profiler.installStubMaya()
+
+    def build(self, job):
+        import profiler
+        recorder = profiler.profileRibbonLimb(job['name'], job['numJnts'], job['width'], job['lengthRatio'],
+                                              job['setupCons'], headless=True, **limbOptions(job))
+        return {'output': None, 'calls': len(recorder.calls)}
+
+
+WORKERS = {'maya': MayaWorker, 'stub': StubWorker}
+
+
+def limbOptions(job):
+    return dict((key, job[key]) for key in LIMB_OPTIONS if key in job)
+
+
+def makeDirs(fileName):
+    directory = os.path.dirname(os.path.abspath(fileName))
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+
+
+def resolveWorker(worker):
+    """
+    Worker class for 'maya', 'stub' or 'package.module:Class'
+    """
+    if worker in WORKERS:
+        return WORKERS[worker]
+    if ':' not in worker:
+        raise JobSpecError('Unknown worker: %s' % worker)
+    moduleName, className = worker.split(':', 1)
+    return getattr(importlib.import_module(moduleName), className)
+
+
+_worker = None
+
+
+def _initWorker(worker):
+    global _worker
+    if PACKAGE_DIR not in sys.path:
+        sys.path.insert(0, PACKAGE_DIR)
+    _worker = resolveWorker(worker)()
+    _worker.initialize()
+
+
+def _runJob(job):
+    """
+    Build one job in the current worker process, never raises
+    """
+    result = {'name': job['name'], 'pid': os.getpid(), 'error': None, 'traceback': None}
+    startTime = time.time()
+    try:
+        result.update(_worker.build(job) or {})
+    except Exception as e:
+        result['error'] = '%s: %s' % (type(e).__name__, e)
+        result['traceback'] = traceback.format_exc()
+    result['elapsed'] = time.time() - startTime
+    return result
+
+
+def _imap(jobs, worker, processes):
+    """
+    Run jobs over a process pool, or in process when processes is 1
+    """
+    if processes == 1:
+        _initWorker(worker)
+        for job in jobs:
+            yield _runJob(job)
+        return
+
+    pool = multiprocessing.Pool(processes, _initWorker, (worker,))
+    try:
+        for result in pool.imap_unordered(_runJob, jobs):
+            yield result
+    finally:
+        pool.close()
+        pool.join()
+
+
+class BatchResults(object):
+    """
+    Per job results in completion order, failures are the results with an error
+    """
+    def __init__(self):
+        self.results = []
+        self.elapsed = 0.0
+        self.processes = 0
+
+    def __len__(self):
+        return len(self.results)
+
+    @property
+    def failures(self):
+        return [result for result in self.results if result['error']]
+
+    def jobTime(self):
+        return sum(result['elapsed'] for result in self.results)
+
+    def asDict(self):
+        return {'elapsed': self.elapsed, 'processes': self.processes, 'jobTime': self.jobTime(),
+                'jobs': len(self.results), 'failed': len(self.failures), 'results': self.results}
+
+    def summary(self):
+        lines = ['%d jobs, %d failed, %.2fs wall clock, %.2fs job time on %d processes' % (
+            len(self.results), len(self.failures), self.elapsed, self.jobTime(), self.processes)]
+        for result in self.failures:
+            lines.append('FAILED %s: %s' % (result['name'], result['error']))
+        return '\n'.join(lines)
+
+
+def runJobs(jobs, processes=None, worker='maya', callback=None):
+    """
+    Build jobs and return BatchResults. callback(result) is called as each job
+    finishes, e.g. for progress output.
+    """
+    jobs = [normalizeJob(job, index) for index, job in enumerate(jobs)]
+    results = BatchResults()
+    results.processes = max(1, min(processes or multiprocessing.cpu_count(), len(jobs) or 1))
+
+    startTime = time.time()
+    for result in _imap(jobs, worker, results.processes):
+        results.results.append(result)
+        if callback is not None:
+            callback(result)
+    results.elapsed = time.time() - startTime
+    return results
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Build the ribbon limbs of a JSON job spec')
+    parser.add_argument('spec', help='job spec file')
+    parser.add_argument('-j', '--processes', type=int, help='worker processes, defaults to the spec or cpu count')
+    parser.add_argument('--worker', help="'maya', 'stub' or module:Class, defaults to the spec or maya")
+    parser.add_argument('--report', help='write the per job results to this JSON file')
+    args = parser.parse_args(argv)
+
+    jobs, options = loadJobSpec(args.spec)
+    processes = args.processes or options.get('processes')
+    worker = args.worker or options.get('worker', 'maya')
+
+    def progress(result):
+        status = 'FAILED' if result['error'] else 'ok'
+        sys.stdout.write('%-8s %-32s %.2fs\n' % (status, result['name'], result['elapsed']))
+
+    results = runJobs(jobs, processes, worker, progress)
+    sys.stdout.write(results.summary() + '\n')
+
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(results.asDict(), f, indent=1, sort_keys=True)
+
+    return 1 if results.failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
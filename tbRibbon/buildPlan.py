@@ -0,0 +1,671 @@
+# File: buildPlan.py
+# Notes: Declarative build plans and a single pass executor
+#
+# A BuildPlan is an ordered list of operations (create node, set attribute,
+# connect, parent, ...). Plans are plain data: they can be built, printed
+# and diffed without Maya.
+#
+# PlanExecutor runs a plan. Consecutive node, attribute, connection and
+# parenting operations are collected into one batch and applied with a
+# MDagModifier/MDGModifier pair, so a batch costs a couple of doIt() calls
+# instead of one command (and one undo record) per operation. Operations
+# that need a Maya command (deformers, constraints...) are CommandOps, the
+# pending batch is flushed before they run.
+#
+# Modifier edits are not on the undo queue by themselves. An undoable
+# executor hands every batch to tbCommon.batching.recordUndo(), so the batch
+# is one undo step undone with its modifiers, and the build stays undoable
+# without falling back to one command per operation.
+#
+# Within a batch operations are applied by phase: create, add attribute,
+# reparent, set attribute, connect, attribute state. Plans must not rely on
+# a different order inside a batch; use a CommandOp boundary when they do.
+#
+# setAttr values follow cmds.setAttr: angles and distances are in UI units on
+# both paths, the modifier path converts them like tbCommon.batching does.
+import difflib
+import os
+import sys
+
+try:
+    import maya.OpenMaya as om
+except ImportError:
+    om = None
+
+try:
+    from tbCommon import batching
+except ImportError:
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from tbCommon import batching
+
+DAG_NODE_TYPES = frozenset(['transform', 'joint', 'follicle', 'nurbsCurve', 'nurbsSurface', 'mesh',
+                            'locator', 'clusterHandle'])
+ATTR_STATE_FLAGS = ('lock', 'keyable', 'channelBox')
+DEFORMER_TYPES = frozenset(['blendShape', 'wire', 'nonLinear', 'cluster', 'skinCluster', 'softMod',
+                            'sculpt', 'deltaMush', 'ffd', 'tweak'])
+
+
+class BuildPlanError(Exception):
+    pass
+
+
+def formatValue(value):
+    if isinstance(value, float):
+        return '%g' % value
+    if isinstance(value, (list, tuple)):
+        return '(%s)' % ', '.join(formatValue(v) for v in value)
+    return repr(value)
+
+
+class PlanOp(object):
+    """
+    Base operation. batchable ops can run through the modifier executor.
+    """
+    kind = ''
+    batchable = True
+
+    def describe(self):
+        raise NotImplementedError
+
+    def __repr__(self):
+        return self.describe()
+
+
+class CreateNodeOp(PlanOp):
+    kind = 'createNode'
+
+    def __init__(self, nodeType, name, parent=None, dag=None):
+        self.nodeType = nodeType
+        self.name = name
+        self.parent = parent
+        self.dag = (nodeType in DAG_NODE_TYPES or parent is not None) if dag is None else dag
+
+    def describe(self):
+        if self.parent:
+            return 'createNode %s %s -p %s' % (self.nodeType, self.name, self.parent)
+        return 'createNode %s %s' % (self.nodeType, self.name)
+
+
+class CreateCurveOp(PlanOp):
+    """
+    A nurbsCurve shape named <name>Shape under a new transform <name>
+    """
+    kind = 'createCurve'
+
+    def __init__(self, name, points, degree=1, periodic=False):
+        self.name = name
+        self.points = [tuple(float(v) for v in point) for point in points]
+        self.degree = degree
+        self.periodic = periodic
+
+    def knots(self):
+        count = len(self.points)
+        if self.periodic:
+            return list(range(-(self.degree - 1), count + self.degree))
+        spans = count - self.degree
+        return [0] * (self.degree - 1) + list(range(spans + 1)) + [spans] * (self.degree - 1)
+
+    def curvePoints(self):
+        if self.periodic:
+            return self.points + self.points[:self.degree]
+        return self.points
+
+    def describe(self):
+        return 'createCurve %s degree=%d periodic=%s cvs=%s' % (
+            self.name, self.degree, self.periodic, formatValue(self.points))
+
+
+class AddAttrOp(PlanOp):
+    """
+    attrType is one of bool, enum, double, float, long
+    """
+    kind = 'addAttr'
+
+    def __init__(self, node, longName, attrType, keyable=True, enumNames=None, defaultValue=None):
+        self.node = node
+        self.longName = longName
+        self.attrType = attrType
+        self.keyable = keyable
+        self.enumNames = enumNames
+        self.defaultValue = defaultValue
+
+    def describe(self):
+        return 'addAttr %s.%s %s keyable=%s enum=%s' % (
+            self.node, self.longName, self.attrType, self.keyable, self.enumNames)
+
+
+class SetAttrOp(PlanOp):
+    kind = 'setAttr'
+
+    def __init__(self, node, attr, value):
+        self.node = node
+        self.attr = attr
+        self.value = value
+
+    @property
+    def plug(self):
+        return '%s.%s' % (self.node, self.attr)
+
+    def describe(self):
+        return 'setAttr %s %s' % (self.plug, formatValue(self.value))
+
+
+class AttrStateOp(PlanOp):
+    """
+    Lock / keyable / channelBox state. None leaves a flag unchanged.
+    """
+    kind = 'attrState'
+
+    def __init__(self, node, attr, lock=None, keyable=None, channelBox=None):
+        self.node = node
+        self.attr = attr
+        self.lock = lock
+        self.keyable = keyable
+        self.channelBox = channelBox
+
+    @property
+    def plug(self):
+        return '%s.%s' % (self.node, self.attr)
+
+    def flags(self):
+        return dict((flag, getattr(self, flag)) for flag in ATTR_STATE_FLAGS if getattr(self, flag) is not None)
+
+    def describe(self):
+        return 'attrState %s %s' % (self.plug, ' '.join('%s=%d' % item for item in sorted(self.flags().items())))
+
+
+class ConnectOp(PlanOp):
+    kind = 'connect'
+
+    def __init__(self, source, destination):
+        self.source = source
+        self.destination = destination
+
+    def describe(self):
+        return 'connect %s %s' % (self.source, self.destination)
+
+
+class ParentOp(PlanOp):
+    kind = 'parent'
+
+    def __init__(self, child, parent):
+        self.child = child
+        self.parent = parent
+
+    def describe(self):
+        return 'parent %s %s' % (self.child, self.parent)
+
+
+class CommandOp(PlanOp):
+    """
+    A step that needs Maya commands, e.g. creating a deformer.
+    creates lists the node names the command is expected to produce and
+    nodeTypes their types, in the same order, for graph reports.
+    """
+    kind = 'command'
+    batchable = False
+
+    def __init__(self, label, function, args=(), kwargs=None, creates=(), nodeTypes=()):
+        self.label = label
+        self.function = function
+        self.args = tuple(args)
+        self.kwargs = kwargs or {}
+        self.creates = list(creates)
+        self.nodeTypes = list(nodeTypes)
+
+    def run(self):
+        return self.function(*self.args, **self.kwargs)
+
+    def describe(self):
+        if self.creates:
+            return 'command %s -> %s' % (self.label, ', '.join(self.creates))
+        return 'command %s' % self.label
+
+
+class BuildPlan(object):
+    """
+    Ordered list of PlanOps with helpers to add, inspect and diff them
+    """
+    def __init__(self, name=''):
+        self.name = name
+        self.ops = []
+
+    def __len__(self):
+        return len(self.ops)
+
+    def __iter__(self):
+        return iter(self.ops)
+
+    def add(self, op):
+        self.ops.append(op)
+        return op
+
+    def extend(self, ops):
+        for op in ops:
+            self.add(op)
+
+    def createNode(self, nodeType, name, parent=None, dag=None):
+        self.add(CreateNodeOp(nodeType, name, parent, dag))
+        return name
+
+    def createCurve(self, name, points, degree=1, periodic=False):
+        self.add(CreateCurveOp(name, points, degree, periodic))
+        return name
+
+    def addAttr(self, node, longName, attrType, keyable=True, enumNames=None, defaultValue=None):
+        return self.add(AddAttrOp(node, longName, attrType, keyable, enumNames, defaultValue))
+
+    def setAttr(self, node, attr, value):
+        return self.add(SetAttrOp(node, attr, value))
+
+    def attrState(self, node, attr, lock=None, keyable=None, channelBox=None):
+        return self.add(AttrStateOp(node, attr, lock, keyable, channelBox))
+
+    def connect(self, source, destination):
+        return self.add(ConnectOp(source, destination))
+
+    def parent(self, child, parent):
+        return self.add(ParentOp(child, parent))
+
+    def command(self, label, function, args=(), kwargs=None, creates=(), nodeTypes=()):
+        return self.add(CommandOp(label, function, args, kwargs, creates, nodeTypes))
+
+    def createdNodes(self):
+        """
+        Names of every node the plan creates
+        """
+        names = []
+        for op in self.ops:
+            if op.kind in ('createNode', 'createCurve'):
+                names.append(op.name)
+            elif op.kind == 'command':
+                names.extend(op.creates)
+        return names
+
+    def counts(self):
+        """
+        Number of operations per kind
+        """
+        counts = {}
+        for op in self.ops:
+            counts[op.kind] = counts.get(op.kind, 0) + 1
+        return counts
+
+    def describe(self):
+        return [op.describe() for op in self.ops]
+
+    def diff(self, other):
+        """
+        Unified diff between the descriptions of two plans
+        """
+        return list(difflib.unified_diff(self.describe(), other.describe(),
+                                         self.name or 'a', other.name or 'b', lineterm=''))
+
+    def __str__(self):
+        return '\n'.join(self.describe())
+
+
+class GraphReport(object):
+    """
+    Node counts per type, deformer and connection counts of a rig graph, to
+    compare the evaluation cost of different builds.
+    fromPlan() needs no Maya and counts what the plan declares: connections made
+    inside commands (deformer wiring) are not known and not counted, commands
+    gives how many such steps there are. fromScene() measures built nodes.
+    """
+    def __init__(self, name='', nodeTypes=None, connections=0, commands=0):
+        self.name = name
+        self.nodeTypes = dict(nodeTypes or {})
+        self.connections = connections
+        self.commands = commands
+
+    @classmethod
+    def fromPlan(cls, plan):
+        report = cls(plan.name)
+        for op in plan:
+            if op.kind == 'createNode':
+                report.addNode(op.nodeType)
+            elif op.kind == 'createCurve':
+                report.addNode('transform')
+                report.addNode('nurbsCurve')
+            elif op.kind == 'connect':
+                report.connections += 1
+            elif op.kind == 'command':
+                report.commands += 1
+                for index in range(len(op.creates)):
+                    report.addNode(op.nodeTypes[index] if index < len(op.nodeTypes) else 'unknown')
+        return report
+
+    @classmethod
+    def fromScene(cls, nodes, name=''):
+        """
+        Report of existing nodes, connections are the outgoing connections of the nodes
+        """
+        import maya.cmds as cmds
+
+        report = cls(name)
+        for node in nodes:
+            report.addNode(cmds.nodeType(node))
+            report.connections += len(cmds.listConnections(node, source=False, destination=True,
+                                                           connections=True, plugs=True) or []) // 2
+        return report
+
+    def addNode(self, nodeType):
+        self.nodeTypes[nodeType] = self.nodeTypes.get(nodeType, 0) + 1
+
+    @property
+    def nodeCount(self):
+        return sum(self.nodeTypes.values())
+
+    @property
+    def deformerCount(self):
+        return sum(count for nodeType, count in self.nodeTypes.items() if nodeType in DEFORMER_TYPES)
+
+    @property
+    def constraintCount(self):
+        return sum(count for nodeType, count in self.nodeTypes.items() if nodeType.endswith('Constraint'))
+
+    def asDict(self):
+        return {'name': self.name, 'nodeTypes': dict(self.nodeTypes), 'nodes': self.nodeCount,
+                'deformers': self.deformerCount, 'constraints': self.constraintCount,
+                'connections': self.connections, 'commands': self.commands}
+
+    def compare(self, other):
+        """
+        Side by side table of two reports
+        """
+        rows = [('nodes', self.nodeCount, other.nodeCount),
+                ('deformers', self.deformerCount, other.deformerCount),
+                ('constraints', self.constraintCount, other.constraintCount),
+                ('connections', self.connections, other.connections),
+                ('commands', self.commands, other.commands)]
+        for nodeType in sorted(set(self.nodeTypes) | set(other.nodeTypes)):
+            rows.append(('  ' + nodeType, self.nodeTypes.get(nodeType, 0), other.nodeTypes.get(nodeType, 0)))
+
+        lines = ['%-24s %10s %10s' % ('', self.name or 'a', other.name or 'b')]
+        lines.extend('%-24s %10d %10d' % row for row in rows)
+        return '\n'.join(lines)
+
+    def __str__(self):
+        lines = ['%s: %d nodes, %d deformers, %d constraints, %d connections, %d commands' % (
+            self.name, self.nodeCount, self.deformerCount, self.constraintCount, self.connections, self.commands)]
+        lines.extend('  %-22s %d' % item for item in sorted(self.nodeTypes.items()))
+        return '\n'.join(lines)
+
+
+class PlanExecutor(object):
+    """
+    Runs a BuildPlan. useModifiers=None picks the API modifier path when
+    maya.OpenMaya is available and falls back to maya.cmds otherwise.
+    undoable puts each modifier batch on the undo queue, builds that suspend
+    undo recording leave it off.
+    """
+    def __init__(self, useModifiers=None, undoable=False):
+        if useModifiers is None:
+            useModifiers = om is not None
+        self.useModifiers = useModifiers
+        self.undoable = undoable
+        self.batchCount = 0
+        self.commandCount = 0
+        self.modifiers = []
+
+    def execute(self, plan):
+        pending = []
+        for op in plan:
+            if op.batchable:
+                pending.append(op)
+                continue
+
+            self.flush(pending)
+            pending = []
+            op.run()
+            self.commandCount += 1
+
+        self.flush(pending)
+
+    def flush(self, ops):
+        if not ops:
+            return
+        self.batchCount += 1
+        if self.useModifiers:
+            batch = ModifierBatch(ops)
+            batch.apply(self)
+            if self.undoable:
+                batching.recordUndo(batch)
+        else:
+            applyWithCmds(ops)
+
+
+def opsByKind(ops):
+    grouped = {}
+    for op in ops:
+        grouped.setdefault(op.kind, []).append(op)
+    return grouped
+
+
+def applyWithCmds(ops):
+    """
+    Apply batchable ops one command at a time, in the same phase order as ModifierBatch
+    """
+    import maya.cmds as cmds
+
+    grouped = opsByKind(ops)
+
+    for op in grouped.get('createNode', []):
+        if op.parent:
+            cmds.createNode(op.nodeType, n=op.name, p=op.parent, ss=True)
+        else:
+            cmds.createNode(op.nodeType, n=op.name, ss=True)
+
+    for op in grouped.get('createCurve', []):
+        curve = cmds.curve(n=op.name, d=op.degree, p=op.curvePoints(), k=op.knots(), per=op.periodic)
+        cmds.rename(cmds.listRelatives(curve, shapes=True)[0], '%sShape' % op.name)
+
+    for op in grouped.get('addAttr', []):
+        kwargs = {'ln': op.longName, 'at': op.attrType, 'k': op.keyable}
+        if op.enumNames is not None:
+            kwargs['en'] = op.enumNames
+        if op.defaultValue is not None:
+            kwargs['dv'] = op.defaultValue
+        cmds.addAttr(op.node, **kwargs)
+
+    for op in grouped.get('parent', []):
+        cmds.parent(op.child, op.parent)
+
+    for op in grouped.get('setAttr', []):
+        if isinstance(op.value, (list, tuple)):
+            cmds.setAttr(op.plug, *op.value)
+        else:
+            cmds.setAttr(op.plug, op.value)
+
+    for op in grouped.get('connect', []):
+        cmds.connectAttr(op.source, op.destination)
+
+    for op in grouped.get('attrState', []):
+        flags = dict((flag[0] if flag != 'channelBox' else 'cb', value) for flag, value in op.flags().items())
+        cmds.setAttr(op.plug, **flags)
+
+
+class ModifierBatch(object):
+    """
+    Applies a list of batchable ops with one MDagModifier and one MDGModifier.
+    undoIt() and redoIt() undo and redo an applied batch on the same nodes:
+    every edit, curve shapes included, is made through the two modifiers, so
+    Maya's redo of the command steps around the batch finds the nodes they
+    were made on.
+    """
+    def __init__(self, ops):
+        self.ops = ops
+        self.objects = {}
+        self.backend = None
+        self.modifiers = []
+        # Curve data of the shapes, kept alive for the modifier's redo
+        self.curveData = []
+        # (plug, (locked, keyable, channelBox) before, the same after) of the attrState ops
+        self.attrStates = []
+
+    def apply(self, executor=None):
+        grouped = opsByKind(self.ops)
+        dagMod = om.MDagModifier()
+        dgMod = om.MDGModifier()
+        self.modifiers = [dagMod, dgMod]
+        if executor is not None:
+            executor.modifiers.extend(self.modifiers)
+
+        # Create and name nodes
+        created = []
+        for op in grouped.get('createNode', []) + grouped.get('createCurve', []):
+            if op.kind == 'createCurve' or op.dag:
+                parentObj = self.getObject(op.parent) if op.kind == 'createNode' and op.parent else om.MObject()
+                obj = dagMod.createNode('transform' if op.kind == 'createCurve' else op.nodeType, parentObj)
+                dagMod.renameNode(obj, op.name)
+            else:
+                obj = dgMod.createNode(op.nodeType)
+                dgMod.renameNode(obj, op.name)
+            self.objects[op.name] = obj
+            created.append(op.name)
+
+        for op in grouped.get('createCurve', []):
+            shapeName = '%sShape' % op.name
+            self.objects[shapeName] = dagMod.createNode('nurbsCurve', self.objects[op.name])
+            dagMod.renameNode(self.objects[shapeName], shapeName)
+            created.append(shapeName)
+
+        dagMod.doIt()
+        dgMod.doIt()
+
+        for name in created:
+            actual = om.MFnDependencyNode(self.objects[name]).name()
+            if actual != name:
+                raise BuildPlanError('Could not name %s, a node with that name already exists' % name)
+
+        for op in grouped.get('createCurve', []):
+            self.setCurve(dgMod, op)
+
+        # Attributes, hierarchy and connections in one more pass
+        for op in grouped.get('addAttr', []):
+            dgMod.addAttribute(self.getObject(op.node), self.createAttribute(op))
+        dgMod.doIt()
+
+        for op in grouped.get('parent', []):
+            dagMod.reparentNode(self.getObject(op.child), self.getObject(op.parent))
+
+        for op in grouped.get('setAttr', []):
+            self.setPlugValue(dgMod, self.getPlug(op.plug), op.value)
+
+        for op in grouped.get('connect', []):
+            dgMod.connect(self.getPlug(op.source), self.getPlug(op.destination))
+
+        dagMod.doIt()
+        dgMod.doIt()
+
+        # Compound plugs get the state on their children too, like setAttr on a compound
+        for op in grouped.get('attrState', []):
+            plug = self.getPlug(op.plug)
+            plugs = [plug] + [plug.child(i) for i in range(plug.numChildren())] if plug.isCompound() else [plug]
+            for plug in plugs:
+                before = self.plugState(plug)
+                if op.lock is not None:
+                    plug.setLocked(bool(op.lock))
+                if op.keyable is not None:
+                    plug.setKeyable(bool(op.keyable))
+                if op.channelBox is not None:
+                    plug.setChannelBox(bool(op.channelBox))
+                self.attrStates.append((plug, before, self.plugState(plug)))
+
+    def plugState(self, plug):
+        return plug.isLocked(), plug.isKeyable(), plug.isChannelBoxFlagSet()
+
+    def setPlugState(self, plug, state):
+        locked, keyable, channelBox = state
+        plug.setLocked(locked)
+        plug.setKeyable(keyable)
+        plug.setChannelBox(channelBox)
+
+    def undoIt(self):
+        """
+        Restore the attribute states and undo the modifiers, last edits first
+        """
+        for plug, before, after in reversed(self.attrStates):
+            self.setPlugState(plug, before)
+        for modifier in reversed(self.modifiers):
+            modifier.undoIt()
+
+    def redoIt(self):
+        """
+        Redo the modifiers in their original order, which brings back the
+        same nodes and the curve shapes' CVs, then the attribute states
+        """
+        for modifier in self.modifiers:
+            modifier.doIt()
+        for plug, before, after in self.attrStates:
+            self.setPlugState(plug, after)
+
+    def getObject(self, name):
+        if name in self.objects:
+            return self.objects[name]
+
+        sel = om.MSelectionList()
+        try:
+            sel.add(name)
+        except RuntimeError:
+            raise BuildPlanError('Node not found: %s' % name)
+        obj = om.MObject()
+        sel.getDependNode(0, obj)
+        self.objects[name] = obj
+        return obj
+
+    def getPlug(self, plugName):
+        sel = om.MSelectionList()
+        try:
+            sel.add(plugName)
+        except RuntimeError:
+            raise BuildPlanError('Attribute not found: %s' % plugName)
+        plug = om.MPlug()
+        sel.getPlug(0, plug)
+        return plug
+
+    def setPlugValue(self, dgMod, plug, value):
+        """
+        Queue a value in UI units on dgMod, by the plug's attribute and unit type
+        """
+        if self.backend is None:
+            self.backend = batching.MayaBackend()
+        self.backend.setPlugValue(dgMod, plug, value)
+
+    def createAttribute(self, op):
+        if op.attrType == 'enum':
+            attrFn = om.MFnEnumAttribute()
+            attr = attrFn.create(op.longName, op.longName, 0)
+            for index, field in enumerate((op.enumNames or '').split(':')):
+                if field:
+                    attrFn.addField(field, index)
+        else:
+            numericTypes = {'bool': om.MFnNumericData.kBoolean, 'double': om.MFnNumericData.kDouble,
+                            'float': om.MFnNumericData.kFloat, 'long': om.MFnNumericData.kInt}
+            if op.attrType not in numericTypes:
+                raise BuildPlanError('Unsupported attribute type: %s' % op.attrType)
+            attrFn = om.MFnNumericAttribute()
+            attr = attrFn.create(op.longName, op.longName, numericTypes[op.attrType], op.defaultValue or 0)
+        attrFn.setKeyable(op.keyable)
+        return attr
+
+    def setCurve(self, dgMod, op):
+        """
+        Queue the CVs of a createCurve op on its shape's cached geometry, like
+        a curve in a .ma file
+        """
+        cvs = om.MPointArray()
+        for point in op.curvePoints():
+            cvs.append(om.MPoint(*point))
+        knots = om.MDoubleArray()
+        for knot in op.knots():
+            knots.append(knot)
+
+        form = om.MFnNurbsCurve.kPeriodic if op.periodic else om.MFnNurbsCurve.kOpen
+        data = om.MFnNurbsCurveData().create()
+        om.MFnNurbsCurve().create(cvs, knots, op.degree, form, False, False, data)
+        self.curveData.append(data)
+
+        shapeFn = om.MFnDependencyNode(self.objects['%sShape' % op.name])
+        dgMod.newPlugValue(shapeFn.findPlug('cached', False), data)
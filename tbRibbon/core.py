@@ -1,173 +1,258 @@
 import maya.cmds as cmds
-import maya.mel as mel
 import utils as utils
+import buildPlan as buildPlan
+import placement as placement
+import transaction as transaction
 
-class RibbonLimb(object):
+RIG_MODES = ('full', 'fast')
 
-    def __init__(self, name, numJnts, width, lengthRatio, setupCons):
+class RibbonLimb(object):
+    """
+    Ribbon limb builder.
+    The limb is described as a buildPlan.BuildPlan first and then executed in
+    one pass. Use build=False to only create the plan, e.g. to inspect or diff it:
+
+        limb = RibbonLimb('arm', 5, 5.0, 0.2, True, build=False)
+        print limb.createBuildPlan()
+
+    distribution places the follicles along the ribbon, see placement.distributeParameters().
+    'arcLength' needs samples, points along the path the ribbon will follow.
+    mode 'fast' builds the lighter skinned deformation of buildFastDeformers()
+    instead of the blendShape, wire, twist and cluster stack.
+    undoable=True builds the limb as one undo chunk, False suspends undo
+    recording for faster batch generation. A failed build deletes what it created.
+    """
+
+    def __init__(self, name, numJnts, width, lengthRatio, setupCons, build=True, executor=None,
+                 distribution='uniform', mode='full', undoable=True, samples=None):
         super(RibbonLimb, self).__init__()
         self.name = name
         self.numJnts = numJnts
         self.width = width
         self.lengthRatio = lengthRatio
         self.setupCons = setupCons
+        self.distribution = distribution
+        self.mode = mode
+        self.undoable = undoable
+        self.utils = utils.Utilities()
+
+        self.rootGrp = '%s01' % self.name
+        self.moveGrp = '%s_globalMove01' % self.name
+        self.extrasGrp = '%s_extraNodes01' % self.name
+        self.plan = None
+        self.follicles = []
+        self.parameters = placement.distributeParameters(self.numJnts, self.distribution, samples)
+
+        if mode not in RIG_MODES:
+            raise ValueError('Unknown ribbon mode: %s, use one of %s' % (mode, ', '.join(RIG_MODES)))
+
+        if build:
+            self.buildRibbonLimb(executor)
+
+    def buildRibbonLimb(self, executor=None):
+        self.plan = self.createBuildPlan()
+        with transaction.BuildTransaction(self.name, self.undoable, plan=self.plan) as build:
+            self.executor = executor or build.executor()
+            self.executor.execute(self.plan)
+        return self.plan
+
+    def createBuildPlan(self):
+        plan = buildPlan.BuildPlan(self.name)
 
-        self.buildRibbonLimb()
-
-    def buildRibbonLimb(self):
         # Organize hiearchy nodes and groups
-        self.rootGrp = cmds.group(em=1, n='%s01' % self.name)
-        self.moveGrp = cmds.group(em=1, n='%s_globalMove01' % self.name)
-        self.extrasGrp = cmds.group(em=1, n='%s_extraNodes01' % self.name)
-        cmds.parent(self.extrasGrp, self.rootGrp)
+        plan.createNode('transform', self.rootGrp)
+        plan.createNode('transform', self.moveGrp)
+        plan.createNode('transform', self.extrasGrp, parent=self.rootGrp)
+
+        myRibbonPlane = self.buildRibbonPlane(plan)
+        myControls = self.buildControls(plan, self.setupCons)
+        if self.mode == 'fast':
+            self.buildFastDeformers(plan, myRibbonPlane[0], myControls)
+        else:
+            self.buildDeformers(plan, myRibbonPlane[0], myControls, myRibbonPlane[1])
+        return plan
 
-        myRibbonPlane = self.buildRibbonPlane()
-        myControls = self.buildControls(self.setupCons)
-        self.buildDeformers(myRibbonPlane[0], myControls, myRibbonPlane[1])
+    def graphReport(self):
+        """
+        buildPlan.GraphReport of the limb, built from the plan so it works without a scene
+        """
+        report = buildPlan.GraphReport.fromPlan(self.plan or self.createBuildPlan())
+        report.name = '%s (%s)' % (self.name, self.mode)
+        return report
 
-    def buildRibbonPlane(self):
-        # Create Nurbs surface
-        flexiPlane = cmds.nurbsPlane(w=self.width, lr=self.lengthRatio,
-                                     u=self.numJnts, v=1, ax=[0, 1, 0])
-        flexiPlane = cmds.rename(flexiPlane[0], '%s_surface01' % self.name)
-        cmds.delete(flexiPlane, constructionHistory=1)
+    def lockAttrs(self, plan, source, translate=False, rotate=False, scale=False, visibility=False, extraAttrs=()):
+        utils.planAttrStates(plan, [(source, utils.maskAttrs(translate, rotate, scale, visibility) + list(extraAttrs))])
 
-        # Create plane follicles
-        mel.eval('createHair %s 1 2 0 0 0 0 1 0 1 1 1;' % str(self.numJnts))
-        for obj in ['hairSystem1', 'pfxHair1', 'nucleus1']:
-            cmds.delete(obj)
-        folChildren = cmds.listRelatives('hairSystem1Follicles', ad=1)
-        cmds.delete([i for i in folChildren if 'curve' in i])
-        folGrp = cmds.rename('hairSystem1Follicles', '%s_flcs01' % self.name)
+    def buildRibbonPlane(self, plan):
+        flexiPlane = '%s_surface01' % self.name
+        folGrp = '%s_flcs01' % self.name
 
-        alphabetList = map(chr, range(97, 123))
-        folChildren = cmds.listRelatives(str(folGrp), c=1)
-        folJnts = []
+        # Create Nurbs surface
+        plan.command('nurbsPlane', self.createSurface, (flexiPlane,), creates=[flexiPlane, '%sShape' % flexiPlane],
+                     nodeTypes=['transform', 'nurbsSurface'])
 
-        for obj, letter in zip(folChildren, alphabetList):
-            folJnt = cmds.joint(p=cmds.xform(obj, t=1, q=1), n='%s_bind_%s01' % (self.name, letter))
-            folJnts.append(folJnt)
-            cmds.parent(folJnt, obj)
-            cmds.rename(obj, '%s_flc_%s01' % (self.name, letter))
+        # Create plane follicles
+        plan.createNode('transform', folGrp, parent=self.extrasGrp)
+        self.follicles = self.buildFollicles(plan, '%sShape' % flexiPlane, folGrp)
 
-        utils.lockAttrs(flexiPlane, 1, 1, 1, 0)
+        self.lockAttrs(plan, flexiPlane, 1, 1, 1, 0)
 
-        cmds.parent(folGrp, self.extrasGrp)
-        cmds.parent(flexiPlane, self.moveGrp)
+        plan.parent(flexiPlane, self.moveGrp)
 
         return flexiPlane, folGrp
 
-    def buildControls(self, createControls=True):
+    def createSurface(self, flexiPlane):
+        surface = cmds.nurbsPlane(w=self.width, lr=self.lengthRatio, u=self.numJnts, v=1, ax=[0, 1, 0])
+        surface = cmds.rename(surface[0], flexiPlane)
+        cmds.delete(surface, constructionHistory=1)
+        cmds.rename(cmds.listRelatives(surface, shapes=1)[0], '%sShape' % flexiPlane)
+        return surface
+
+    def buildFollicles(self, plan, surfaceShape, folGrp):
+        """
+        Attach one follicle per joint directly to the surface at the precomputed
+        parameters, with its bind joint at the follicle origin. Joints are named
+        a-z, then aa, ab... so ribbons are not limited to 26 joints.
+        """
+        follicles = []
+
+        for letter, parameter in zip(placement.letterNames(self.numJnts), self.parameters):
+            fol = plan.createNode('transform', '%s_flc_%s01' % (self.name, letter), parent=folGrp)
+            folShape = plan.createNode('follicle', '%sShape' % fol, parent=fol)
+            plan.createNode('joint', '%s_bind_%s01' % (self.name, letter), parent=fol)
+
+            plan.setAttr(folShape, 'parameterU', parameter)
+            plan.setAttr(folShape, 'parameterV', 0.5)
+            plan.setAttr(folShape, 'visibility', False)
+            plan.connect('%s.local' % surfaceShape, '%s.inputSurface' % folShape)
+            plan.connect('%s.worldMatrix[0]' % surfaceShape, '%s.inputWorldMatrix' % folShape)
+            plan.connect('%s.outTranslate' % folShape, '%s.translate' % fol)
+            plan.connect('%s.outRotate' % folShape, '%s.rotate' % fol)
+            follicles.append(fol)
+
+        return follicles
+
+    def buildControls(self, plan, createControls=True):
         # Create a global move control
-        globalCon = self.utils.createStarControl(name='%s_con_global01' % self.name, radius=1.5)
-        cmds.setAttr('%s.overrideEnabled' % globalCon, 1)
-        cmds.setAttr('%s.overrideColor' % globalCon, 17)
+        globalCon = '%s_con_global01' % self.name
+        utils.addControlToPlan(plan, globalCon, 'star', radius=1.5, sections=16)
+        plan.setAttr(globalCon, 'overrideEnabled', 1)
+        plan.setAttr(globalCon, 'overrideColor', 17)
 
-        cmds.addAttr(globalCon, at='enum', ln='maintainVolume', en='---', k=1)
-        cmds.setAttr('%s.maintainVolume' % globalCon, k=0, l=1, cb=1)
-        cmds.addAttr(globalCon, at='bool', ln='volEnable', k=1)
+        plan.addAttr(globalCon, 'maintainVolume', 'enum', enumNames='---')
+        plan.attrState(globalCon, 'maintainVolume', lock=True, keyable=False, channelBox=True)
+        plan.addAttr(globalCon, 'volEnable', 'bool')
 
-        cmds.parent(globalCon, self.rootGrp)
-        cmds.parent(self.moveGrp, globalCon)
+        plan.parent(globalCon, self.rootGrp)
+        plan.parent(self.moveGrp, globalCon)
 
         # Create FK controls if option selected
         if createControls:
 
             transCons = ['%s_con_a01' % self.name, '%s_con_b01' % self.name, '%s_midBend01' % self.name]
-
-            for squareCon in transCons:
-                squareCon = cmds.curve(n=squareCon, d=1, p=[(-1, 0, -1), (1, 0, -1), (1, 0, 1), (-1, 0, 1), (-1, 0, -1)])
-                cmds.scale(.75, .75, .75, squareCon, r=1)
-                cmds.setAttr('%s.overrideEnabled' % squareCon, 1)
-                cmds.setAttr('%s.overrideColor' % squareCon, 17)
-                cmds.xform(squareCon, roo='xzy')
-                squareShape = cmds.listRelatives(squareCon, type='shape')
-                cmds.rename(squareShape, '%sShape' % squareCon)
+            offsets = [-self.width / 2.0, self.width / 2.0, 0.0]
+            # Control scale and position are baked into the cvs with the pivots left at
+            # the control position, matching a scale/move followed by makeIdentity
+            for squareCon, offset in zip(transCons, offsets):
+                utils.addControlToPlan(plan, squareCon, 'square', radius=.75, offset=(offset, 0, 0), normal='y')
+                plan.setAttr(squareCon, 'overrideEnabled', 1)
+                plan.setAttr(squareCon, 'overrideColor', 17)
+                plan.setAttr(squareCon, 'rotateOrder', 3)
+                plan.setAttr(squareCon, 'rotatePivot', (offset, 0.0, 0.0))
+                plan.setAttr(squareCon, 'scalePivot', (offset, 0.0, 0.0))
 
             topCon = transCons[0]
             botCon = transCons[1]
             midCon = transCons[2]
 
-            cmds.xform(topCon, t=(-self.width / 2, 0, 0), ws=1)
-            cmds.xform(botCon, t=(self.width / 2, 0, 0), ws=1)
-            cmds.xform(midCon, t=(0, 0, 0), ws=1)
-            cmds.makeIdentity(transCons, a=1)
-
-            squareConGrp = cmds.group(topCon, botCon, n='%s_cons01' % self.name)
-            midConGrp = cmds.group(midCon, n='%s_midCon01' % self.name)
-            cmds.parent(midConGrp, squareConGrp)
-            cmds.pointConstraint(botCon, topCon, midConGrp, mo=0)
-
-            # Lock and hide controller attrs
-            utils.lockAttrs(topCon, 0, 0, 1, 1)
-            utils.lockAttrs(botCon, 0, 0, 1, 1)
-            utils.lockAttrs(midCon, 0, 1, 1, 1)
+            squareConGrp = plan.createNode('transform', '%s_cons01' % self.name)
+            midConGrp = plan.createNode('transform', '%s_midCon01' % self.name, parent=squareConGrp)
+            plan.parent(topCon, squareConGrp)
+            plan.parent(botCon, squareConGrp)
+            plan.parent(midCon, midConGrp)
+            plan.command('pointConstraint', self.constrainMidControl, (botCon, topCon, midConGrp),
+                         creates=['%s_pointConstraint1' % midConGrp], nodeTypes=['pointConstraint'])
 
-            for con in transCons:
-                cmds.setAttr('%s.rotateY' % con, l=1, k=0, cb=0)
-                cmds.setAttr('%s.rotateZ' % con, l=1, k=0, cb=0)
+            # Lock and hide controller attrs, the controls only twist around X
+            twistOnly = ['rotateY', 'rotateZ']
+            self.lockAttrs(plan, topCon, 0, 0, 1, 1, twistOnly)
+            self.lockAttrs(plan, botCon, 0, 0, 1, 1, twistOnly)
+            self.lockAttrs(plan, midCon, 0, 1, 1, 1, twistOnly)
 
-            cmds.parent(squareConGrp, self.moveGrp)
+            plan.parent(squareConGrp, self.moveGrp)
 
             return transCons, globalCon
 
         else:
             return [globalCon]
 
-    def buildDeformers(self, ribbonPlane, controls=(), folGrp=()):
+    def constrainMidControl(self, botCon, topCon, midConGrp):
+        cmds.pointConstraint(botCon, topCon, midConGrp, mo=0)
+
+    def buildDeformers(self, plan, ribbonPlane, controls=(), folGrp=()):
+        flexiBlend = '%s_bShp_surface01' % self.name
+        flexiBlendNode = '%s_bShpNode_surface01' % self.name
+        wireCurve = '%s_wire_surface01' % self.name
+        topClstr = ['%s_cl_a01' % self.name, '%s_cl_a01Handle' % self.name]
+        midClstr = ['%s_cl_mid01' % self.name, '%s_cl_mid01Handle' % self.name]
+        botClstr = ['%s_cl_b01' % self.name, '%s_cl_b01Handle' % self.name]
+        twistNode = ['%s_twistAttrs_surface01' % self.name, '%s_twist_surface01' % self.name]
+        wireNode = '%s_wireAttrs_surface01' % self.name
+        baseWire = '%s_wire_surface01BaseWire' % self.name
+        arcLen = '%s_curveInfo01' % self.name
+
         # Create a target blendshape controlled by deformers
-        flexiBlend = cmds.duplicate(ribbonPlane, n='flexiPlaneSetup_bShp_surface01')
-        flexiBlendNode = cmds.blendShape(flexiBlend, ribbonPlane, n='%s_bShpNode_surface01' % self.name)
+        plan.command('blendShape', self.createBlendShape, (ribbonPlane, flexiBlend, flexiBlendNode),
+                     creates=[flexiBlend, flexiBlendNode], nodeTypes=['transform', 'blendShape'])
 
         # Turn blendshape on
-        cmds.setAttr('%s.%s' % (flexiBlendNode[0], flexiBlend[0]), 1)
+        plan.setAttr(flexiBlendNode, flexiBlend, 1.0)
 
         # Create a wire deformer controled by ribbon controls
-        wireCurve = cmds.curve(
-            n='%s_wire_surface01' % self.name, d=2, p=[(-self.numJnts, 0, 0), (0, 0, 0), (self.numJnts, 0, 0)])
-        topClstr = cmds.cluster('%s.cv[0:1]' % wireCurve, rel=1, n='%s_cl_a01' % self.name)
-        midClstr = cmds.cluster('%s.cv[1]' % wireCurve, rel=1, n='%s_cl_mid01' % self.name)
-        botClstr = cmds.cluster('%s.cv[1:2]' % wireCurve, rel=1, n='%s_cl_b01' % self.name)
-        clsGrp = cmds.group(topClstr, midClstr, botClstr, n='%s_cls01' % self.name)
+        plan.createCurve(wireCurve, [(-self.numJnts, 0, 0), (0, 0, 0), (self.numJnts, 0, 0)], degree=2)
+        plan.command('clusters', self.createClusters, (wireCurve, topClstr[0], midClstr[0], botClstr[0]),
+                     creates=topClstr + midClstr + botClstr, nodeTypes=['cluster', 'transform'] * 3)
+        clsGrp = plan.createNode('transform', '%s_cls01' % self.name)
+        for clstr in [topClstr, midClstr, botClstr]:
+            plan.parent(clstr[1], clsGrp)
 
         for attr in ['scalePivot', 'rotatePivot']:
-            cmds.setAttr('%s.%s' % (topClstr[1], attr), -self.numJnts, 0, 0)
+            plan.setAttr(topClstr[1], attr, (float(-self.numJnts), 0.0, 0.0))
         for attr in ['scalePivot', 'rotatePivot']:
-            cmds.setAttr('%s.%s' % (botClstr[1], attr), self.numJnts, 0, 0)
+            plan.setAttr(botClstr[1], attr, (float(self.numJnts), 0.0, 0.0))
 
-        cmds.setAttr('%sShape.originX' % topClstr[1], (-self.numJnts))
-        cmds.setAttr('%sShape.originX' % botClstr[1], (self.numJnts))
-        cmds.percent(topClstr[0], '%s.cv[1]' % wireCurve, v=0.5)
-        cmds.percent(botClstr[0], '%s.cv[1]' % wireCurve, v=0.5)
+        plan.setAttr('%sShape' % topClstr[1], 'originX', float(-self.numJnts))
+        plan.setAttr('%sShape' % botClstr[1], 'originX', float(self.numJnts))
+        plan.command('percent', self.setClusterPercents, (wireCurve, topClstr[0], botClstr[0]))
 
         # Create twist and wire blend shape deformers
-        twistNode = cmds.nonLinear(flexiBlend, type='twist')
-        cmds.wire(flexiBlend, w=wireCurve, dds=[0, 20], foc=0, n='%s_wireAttrs_surface01' % self.name)
-        cmds.xform(twistNode, ro=(0, 0, 90))
-        twistNode[0] = cmds.rename(twistNode[0], '%s_twistAttrs_surface01' % self.name)
-        twistNode[1] = cmds.rename(twistNode[1], '%s_twist_surface01' % self.name)
+        plan.command('twist', self.createTwist, (flexiBlend, twistNode[0], twistNode[1]), creates=twistNode,
+                     nodeTypes=['nonLinear', 'transform'])
+        plan.command('wire', self.createWire, (flexiBlend, wireCurve, wireNode), creates=[wireNode, baseWire],
+                     nodeTypes=['wire', 'transform'])
+        plan.setAttr(twistNode[1], 'rotate', (0.0, 0.0, 90.0))
 
         # Setup squash and stretch via utilitiy nodes
-        arcLen = cmds.arclen(wireCurve, ch=1)
-        arcLen = cmds.rename(arcLen, '%s_curveInfo01' % self.name)
-        arcLenValue = cmds.getAttr('%s.arcLength' % arcLen)
-        squashDivNode = cmds.createNode('multiplyDivide', n='%s_div_squashStretch_length01' % self.name)
-        volDivNode = cmds.createNode('multiplyDivide', n='%s_div_volume01' % self.name)
-        squashCondNode = cmds.createNode('condition', n='%s_cond_volume01' % self.name)
-
-        cmds.setAttr('%s.operation' % squashDivNode, 2)
-        cmds.setAttr('%s.input2X' % squashDivNode, arcLenValue)
-        cmds.setAttr('%s.operation' % volDivNode, 2)
-        cmds.setAttr('%s.input1X' % volDivNode, 1)
-        cmds.setAttr('%s.secondTerm' % squashCondNode, 1)
-
-        cmds.connectAttr('%s.arcLength' % arcLen, '%s.input1X' % squashDivNode)
-        cmds.connectAttr('%s.outputX' % squashDivNode, '%s.input2X' % volDivNode)
-        cmds.connectAttr('%s.outputX' % volDivNode, '%s.colorIfTrueR' % squashCondNode)
+        # The wire curve is a straight line from -numJnts to numJnts, its rest length is known
+        plan.command('arclen', self.createCurveInfo, (wireCurve, arcLen), creates=[arcLen], nodeTypes=['curveInfo'])
+        arcLenValue = float(2 * self.numJnts)
+        squashDivNode = plan.createNode('multiplyDivide', '%s_div_squashStretch_length01' % self.name)
+        volDivNode = plan.createNode('multiplyDivide', '%s_div_volume01' % self.name)
+        squashCondNode = plan.createNode('condition', '%s_cond_volume01' % self.name)
+
+        plan.setAttr(squashDivNode, 'operation', 2)
+        plan.setAttr(squashDivNode, 'input2X', arcLenValue)
+        plan.setAttr(volDivNode, 'operation', 2)
+        plan.setAttr(volDivNode, 'input1X', 1.0)
+        plan.setAttr(squashCondNode, 'secondTerm', 1.0)
+
+        plan.connect('%s.arcLength' % arcLen, '%s.input1X' % squashDivNode)
+        plan.connect('%s.outputX' % squashDivNode, '%s.input2X' % volDivNode)
+        plan.connect('%s.outputX' % volDivNode, '%s.colorIfTrueR' % squashCondNode)
 
         # Set visibility options
-        for obj in [flexiBlend[0], wireCurve, twistNode[1], clsGrp]:
-            cmds.setAttr('%s.visibility' % obj, 0)
+        for obj in [flexiBlend, wireCurve, twistNode[1], clsGrp]:
+            plan.setAttr(obj, 'visibility', False)
 
         # Connect controls to cluster deformers if they exist
         if len(controls) > 1:
@@ -176,21 +261,133 @@ class RibbonLimb(object):
             midCon = controls[0][2]
 
             for con, clstr in zip([topCon, botCon], [topClstr[1], botClstr[1]]):
-                cmds.connectAttr('%s.translate' % con, '%s.translate' % clstr)
+                plan.connect('%s.translate' % con, '%s.translate' % clstr)
 
-            cmds.connectAttr('%s.translate' % midCon, '%s.translate' % midClstr[1])
+            plan.connect('%s.translate' % midCon, '%s.translate' % midClstr[1])
 
             # Connect controls to twist deformer
-            cmds.connectAttr('%s.rotateX' % topCon, '%s.endAngle' % twistNode[0])
-            cmds.connectAttr('%s.rotateX' % botCon, '%s.startAngle' % twistNode[0])
-            cmds.connectAttr('%s.volEnable' % controls[1], '%s.firstTerm' % squashCondNode)
+            plan.connect('%s.rotateX' % topCon, '%s.endAngle' % twistNode[0])
+            plan.connect('%s.rotateX' % botCon, '%s.startAngle' % twistNode[0])
+            plan.connect('%s.volEnable' % controls[1], '%s.firstTerm' % squashCondNode)
 
         # Scale contraint each follicle to global move group
-        for fol in cmds.listRelatives(folGrp, c=1):
-            cmds.scaleConstraint(self.moveGrp, fol, mo=0)
-            for shape in cmds.listRelatives(fol, s=1):
-                cmds.setAttr('%s.visibility' % shape, 0)
+        plan.command('follicleConstraints', self.constrainFollicles, (self.follicles,),
+                     creates=['%s_scaleConstraint1' % fol for fol in self.follicles],
+                     nodeTypes=['scaleConstraint'] * len(self.follicles))
 
         # Parent nodes
-        cmds.parent(flexiBlend, wireCurve, clsGrp, twistNode[1],
-                    '%s_wire_surface01BaseWire' % self.name, self.extrasGrp)
+        for obj in [flexiBlend, wireCurve, clsGrp, twistNode[1], baseWire]:
+            plan.parent(obj, self.extrasGrp)
+
+    def buildFastDeformers(self, plan, ribbonPlane, controls=()):
+        """
+        Lighter alternative to buildDeformers. The ribbon surface is skinned to
+        three driver joints under the a, b and mid controls, with weights blending
+        linearly along the ribbon, instead of a blendShape target deformed by
+        clusters, a wire and a twist. Twisting comes from the end controls' rotateX
+        spread by the same weights, and stretch is measured as the distance
+        between the end controls rather than the wire curve arc length.
+        """
+        # Without controls nothing drives the deformers, the ribbon only follows the global move
+        if len(controls) < 2:
+            self.connectFollicleScale(plan, controls[0])
+            return
+
+        transCons, globalCon = controls
+        drvJnts = ['%s_drv_a01' % self.name, '%s_drv_b01' % self.name, '%s_drv_mid01' % self.name]
+        offsets = [-self.width / 2.0, self.width / 2.0, 0.0]
+        skin = '%s_skin_surface01' % self.name
+        distNode = '%s_dist_length01' % self.name
+
+        for jnt, con, offset in zip(drvJnts, transCons, offsets):
+            plan.createNode('joint', jnt, parent=con)
+            plan.setAttr(jnt, 'translate', (offset, 0.0, 0.0))
+            plan.setAttr(jnt, 'drawStyle', 2)
+
+        # The joints already carry the global move, the skinned surface must not inherit it again
+        plan.setAttr(ribbonPlane, 'inheritsTransform', False)
+        plan.command('skinCluster', self.createSkin, (drvJnts, ribbonPlane, skin), creates=[skin],
+                     nodeTypes=['skinCluster'])
+
+        # Weights per surface cv from the cv parameters, cvs are indexed u * cvsInV + v
+        cvsInV = 4
+        drivers = [0.0, 1.0, 0.5]
+        order = sorted(range(len(drivers)), key=lambda index: drivers[index])
+        for u, parameter in enumerate(placement.grevilleParameters(self.numJnts)):
+            weights = placement.piecewiseLinearWeights(parameter, [drivers[index] for index in order])
+            for v in range(cvsInV):
+                for index, weight in zip(order, weights):
+                    plan.setAttr(skin, 'weightList[%d].weights[%d]' % (u * cvsInV + v, index), weight)
+
+        # Setup squash and stretch via utilitiy nodes, the rest length is the ribbon width
+        plan.createNode('distanceBetween', distNode)
+        squashDivNode = plan.createNode('multiplyDivide', '%s_div_squashStretch_length01' % self.name)
+        volDivNode = plan.createNode('multiplyDivide', '%s_div_volume01' % self.name)
+        squashCondNode = plan.createNode('condition', '%s_cond_volume01' % self.name)
+
+        plan.setAttr(distNode, 'point1', (offsets[0], 0.0, 0.0))
+        plan.setAttr(distNode, 'point2', (offsets[1], 0.0, 0.0))
+        plan.setAttr(squashDivNode, 'operation', 2)
+        plan.setAttr(squashDivNode, 'input2X', float(self.width))
+        plan.setAttr(volDivNode, 'operation', 2)
+        plan.setAttr(volDivNode, 'input1X', 1.0)
+        plan.setAttr(squashCondNode, 'secondTerm', 1.0)
+
+        plan.connect('%s.matrix' % transCons[0], '%s.inMatrix1' % distNode)
+        plan.connect('%s.matrix' % transCons[1], '%s.inMatrix2' % distNode)
+        plan.connect('%s.distance' % distNode, '%s.input1X' % squashDivNode)
+        plan.connect('%s.outputX' % squashDivNode, '%s.input2X' % volDivNode)
+        plan.connect('%s.outputX' % volDivNode, '%s.colorIfTrueR' % squashCondNode)
+        plan.connect('%s.volEnable' % globalCon, '%s.firstTerm' % squashCondNode)
+
+        self.connectFollicleScale(plan, globalCon)
+
+    def connectFollicleScale(self, plan, globalCon):
+        """
+        Drive the follicle scale straight from the global control, in place of
+        one scaleConstraint per follicle
+        """
+        for fol in self.follicles:
+            plan.connect('%s.scale' % globalCon, '%s.scale' % fol)
+
+    def createSkin(self, drvJnts, ribbonPlane, skin):
+        cmds.skinCluster(drvJnts, ribbonPlane, toSelectedBones=1, maximumInfluences=2, name=skin)
+
+    def createBlendShape(self, ribbonPlane, flexiBlend, flexiBlendNode):
+        cmds.duplicate(ribbonPlane, n=flexiBlend)
+        cmds.blendShape(flexiBlend, ribbonPlane, n=flexiBlendNode)
+
+    def createClusters(self, wireCurve, topClstr, midClstr, botClstr):
+        cmds.cluster('%s.cv[0:1]' % wireCurve, rel=1, n=topClstr)
+        cmds.cluster('%s.cv[1]' % wireCurve, rel=1, n=midClstr)
+        cmds.cluster('%s.cv[1:2]' % wireCurve, rel=1, n=botClstr)
+
+    def setClusterPercents(self, wireCurve, topClstr, botClstr):
+        cmds.percent(topClstr, '%s.cv[1]' % wireCurve, v=0.5)
+        cmds.percent(botClstr, '%s.cv[1]' % wireCurve, v=0.5)
+
+    def createTwist(self, flexiBlend, twistAttrs, twistHandle):
+        twistNode = cmds.nonLinear(flexiBlend, type='twist')
+        cmds.rename(twistNode[0], twistAttrs)
+        cmds.rename(twistNode[1], twistHandle)
+
+    def createWire(self, flexiBlend, wireCurve, wireNode):
+        cmds.wire(flexiBlend, w=wireCurve, dds=[0, 20], foc=0, n=wireNode)
+
+    def createCurveInfo(self, wireCurve, arcLen):
+        cmds.rename(cmds.arclen(wireCurve, ch=1), arcLen)
+
+    def constrainFollicles(self, follicles):
+        for fol in follicles:
+            cmds.scaleConstraint(self.moveGrp, fol, mo=0)
+
+
+def compareRigModes(numJnts=5, width=5.0, lengthRatio=0.2, setupCons=True):
+    """
+    Print and return the graph reports of a full and a fast ribbon. Only the
+    build plans are created, no scene is needed.
+    """
+    reports = [RibbonLimb('ribbon', numJnts, width, lengthRatio, setupCons, build=False, mode=mode).graphReport()
+               for mode in RIG_MODES]
+    print(reports[0].compare(reports[1]))
+    return reports
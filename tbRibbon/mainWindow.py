@@ -1,24 +1,94 @@
-from PySide import QtGui, QtCore, QtUiTools
-from shiboken import wrapInstance
-import maya.OpenMayaUI as omui
+import os
+import sys
 from functools import partial
 
-UI_FILE_PATH = 'c:/Users/Tom/PycharmProjects/tb_ribbon/ribbonLimbUI.ui'
+UI_FILE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ribbonLimbUI.ui')
+
+# Compiled form classes by ui file: (mtime, class)
+_formClasses = {}
+_window = None
+
 
 def getMayaWindow():
+    from PySide import QtGui
+    from shiboken import wrapInstance
+    try:
+        import maya.OpenMayaUI as omui
+    except ImportError:
+        return None
+
     ptr = omui.MQtUtil.mainWindow()
     if ptr is not None:
-        return wrapInstance(long(ptr),QtGui.QWidget)
+        return wrapInstance(long(ptr), QtGui.QWidget)
+
+
+def uiCachePath(uiFileName):
+    """
+    Compiled ui module next to the ui file, or in the temp dir when that is not writable
+    """
+    directory = os.path.dirname(uiFileName)
+    if not os.access(directory, os.W_OK):
+        import tempfile
+        directory = os.path.join(tempfile.gettempdir(), 'tbRibbon')
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+    return os.path.join(directory, '%s_ui.py' % os.path.splitext(os.path.basename(uiFileName))[0])
+
+
+def compileUi(uiFileName, cacheFileName):
+    """
+    Write the pysideuic compiled ui module unless the cache is newer than the ui file
+    """
+    if os.path.exists(cacheFileName) and os.path.getmtime(cacheFileName) >= os.path.getmtime(uiFileName):
+        return False
+
+    import pysideuic
+    from StringIO import StringIO
+
+    source = StringIO()
+    with open(uiFileName) as uiFile:
+        pysideuic.compileUi(uiFile, source, indent=4)
+    with open(cacheFileName, 'w') as f:
+        f.write(source.getvalue())
+    return True
+
+
+def loadFormClass(uiFileName):
+    """
+    Widget class built from the compiled ui file, setupUi puts the child widgets
+    on the instance itself. Cached per process until the ui file changes.
+    """
+    from PySide import QtGui
+    import xml.etree.ElementTree as ElementTree
+
+    mtime = os.path.getmtime(uiFileName)
+    cached = _formClasses.get(uiFileName)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+
+    cacheFileName = uiCachePath(uiFileName)
+    compileUi(uiFileName, cacheFileName)
+    namespace = {}
+    with open(cacheFileName) as f:
+        exec(compile(f.read(), cacheFileName, 'exec'), namespace)
+
+    root = ElementTree.parse(uiFileName).getroot()
+    formName = root.find('class').text
+    baseClass = getattr(QtGui, root.find('widget').get('class'))
+    formClass = type(formName, (baseClass, namespace['Ui_%s' % formName]), {})
+
+    _formClasses[uiFileName] = (mtime, formClass)
+    return formClass
+
 
 class ribbonLimbMainWindow(object):
     def __init__(self):
         self.MainWindow = None
 
-    def loadUiWidget(self, uiFileName, parent=getMayaWindow()):
-        loader = QtUiTools.QUiLoader()
-        uiFile = QtCore.QFile(uiFileName)
-        uiFile.open(QtCore.QFile.ReadOnly)
-        ui = loader.load(uiFile, parent)
+    def loadUiWidget(self, uiFileName, parent=None):
+        formClass = loadFormClass(uiFileName)
+        ui = formClass(parent or getMayaWindow())
+        ui.setupUi(ui)
         return ui
 
     def connectSignals(self):
@@ -32,22 +102,54 @@ class ribbonLimbMainWindow(object):
         width = float(self.MainWindow.widthLineEdit.text())
         lengthRatio = float(self.MainWindow.lengthRatioLineEdit.text())
         setupCons = self.MainWindow.createFkControlsCheckBox.isChecked()
-        core.RibbonLimb(name, numJnts, width, lengthRatio, setupCons)
+        undoable = self.MainWindow.undoableCheckBox.isChecked()
+        core.RibbonLimb(name, numJnts, width, lengthRatio, setupCons, undoable=undoable)
 
     def closeSignalMethod(self, *args):
-        self.close()
+        self.MainWindow.hide()
 
     def close(self):
         if self.MainWindow is not None:
             self.MainWindow.close()
+            self.MainWindow.deleteLater()
             self.MainWindow = None
 
     def show(self):
-        self.close()
-        app = QtGui.QApplication.instance()
-        self.MainWindow = self.loadUiWidget(UI_FILE_PATH)
-        self.connectSignals()
+        """
+        Show the window, building it only the first time
+        """
+        from shiboken import isValid
+
+        if self.MainWindow is not None and not isValid(self.MainWindow):
+            self.MainWindow = None
+        if self.MainWindow is None:
+            self.MainWindow = self.loadUiWidget(UI_FILE_PATH)
+            self.connectSignals()
         self.MainWindow.show()
-        app.exec_()
+        self.MainWindow.raise_()
+        self.MainWindow.activateWindow()
+        return self.MainWindow
+
+
+def getWindow():
+    global _window
+    if _window is None:
+        _window = ribbonLimbMainWindow()
+    return _window
+
+
+def show():
+    """
+    Tool entry point, e.g. from a shelf button:
+
+        import mainWindow
+        mainWindow.show()
+    """
+    return getWindow().show()
+
 
-ribbonLimbMainWindow().show()
\ No newline at end of file
+if __name__ == '__main__':
+    from PySide import QtGui
+    app = QtGui.QApplication.instance() or QtGui.QApplication(sys.argv)
+    show()
+    sys.exit(app.exec_())
@@ -0,0 +1,140 @@
+# File: placement.py
+# Notes: Follicle and joint placement solver
+#
+# Pure python, no Maya needed. Computes the follicle UV parameters and world
+# positions for any number of ribbon joints, and the names used for them.
+#
+#     params = distributeParameters(100)                        # span centres
+#     params = distributeParameters(12, 'arcLength', samples)   # even spacing along a polyline
+#     params = distributeParameters(4, [0.0, 0.2, 0.6, 1.0])    # custom
+#     positions = planePositions(params, 10.0, 0.2)
+import bisect
+import math
+
+DISTRIBUTIONS = ('uniform', 'arcLength')
+
+
+def letterName(index):
+    """
+    0 -> a, 25 -> z, 26 -> aa, 27 -> ab ... like spreadsheet columns,
+    so the first 26 names match the original a-z naming
+    """
+    if index < 0:
+        raise ValueError('Negative joint index: %d' % index)
+
+    letters = ''
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(97 + remainder) + letters
+    return letters
+
+
+def letterNames(count):
+    return [letterName(index) for index in range(count)]
+
+
+def uniformParameters(count):
+    """
+    Parameters at the centre of count equal spans, where createHair places follicles
+    """
+    return [(index + 0.5) / count for index in range(count)]
+
+
+def cumulativeLengths(points):
+    lengths = [0.0]
+    for start, end in zip(points, points[1:]):
+        lengths.append(lengths[-1] + math.sqrt(sum((b - a) ** 2 for a, b in zip(start, end))))
+    return lengths
+
+
+def arcLengthParameters(count, samples):
+    """
+    Parameters spaced evenly by arc length along a polyline.
+    samples are points taken at evenly spaced parameters from 0 to 1, e.g. a
+    dense sampling of the curve or surface isoparm the ribbon will follow.
+    """
+    if len(samples) < 2:
+        raise ValueError('Arc length placement needs at least two samples')
+
+    lengths = cumulativeLengths(samples)
+    total = lengths[-1]
+    if total <= 0.0:
+        return uniformParameters(count)
+
+    step = 1.0 / (len(samples) - 1)
+    parameters = []
+    for target in [total * u for u in uniformParameters(count)]:
+        segment = min(max(bisect.bisect_right(lengths, target) - 1, 0), len(samples) - 2)
+        segmentLength = lengths[segment + 1] - lengths[segment]
+        blend = (target - lengths[segment]) / segmentLength if segmentLength else 0.0
+        parameters.append((segment + blend) * step)
+    return parameters
+
+
+def customParameters(values, count=None):
+    parameters = [float(value) for value in values]
+    if count is not None and len(parameters) != count:
+        raise ValueError('Expected %d parameters, got %d' % (count, len(parameters)))
+    for value in parameters:
+        if not 0.0 <= value <= 1.0:
+            raise ValueError('Parameter out of the 0-1 range: %g' % value)
+    return parameters
+
+
+def distributeParameters(count, distribution='uniform', samples=None):
+    """
+    Return count U parameters. distribution is 'uniform', 'arcLength' (needs
+    samples, raises ValueError without them) or a sequence of custom parameters.
+    """
+    if count < 1:
+        raise ValueError('A ribbon needs at least one joint')
+
+    if isinstance(distribution, (list, tuple)):
+        return customParameters(distribution, count)
+    if distribution == 'uniform':
+        return uniformParameters(count)
+    if distribution == 'arcLength':
+        if samples is None:
+            raise ValueError('Arc length placement needs the samples of the path the ribbon follows')
+        return arcLengthParameters(count, samples)
+    raise ValueError('Unknown distribution: %s, use one of %s or a list' % (distribution, ', '.join(DISTRIBUTIONS)))
+
+
+def grevilleParameters(spans, degree=3):
+    """
+    Normalized parameters of the CVs of a uniform open surface direction with
+    spans spans, e.g. the U CVs of the ribbon plane (spans + degree CVs)
+    """
+    knots = [0] * (degree - 1) + list(range(spans + 1)) + [spans] * (degree - 1)
+    return [sum(knots[index:index + degree]) / float(degree * spans) for index in range(spans + degree)]
+
+
+def piecewiseLinearWeights(parameter, drivers):
+    """
+    Weights of drivers (sorted parameters) at parameter, blending linearly
+    between the two nearest drivers. The weights always sum to 1.
+    """
+    weights = [0.0] * len(drivers)
+    if parameter <= drivers[0]:
+        weights[0] = 1.0
+        return weights
+    if parameter >= drivers[-1]:
+        weights[-1] = 1.0
+        return weights
+
+    index = bisect.bisect_right(drivers, parameter) - 1
+    blend = (parameter - drivers[index]) / float(drivers[index + 1] - drivers[index])
+    weights[index] = 1.0 - blend
+    weights[index + 1] = blend
+    return weights
+
+
+def planePositions(parameters, width, lengthRatio, v=0.5):
+    """
+    World positions on the flat ribbon plane built by
+    nurbsPlane(w=width, lr=lengthRatio, ax=[0, 1, 0]), which spans -width/2
+    to width/2 along X and width * lengthRatio along Z
+    """
+    z = (v - 0.5) * width * lengthRatio
+    return [((u - 0.5) * width, 0.0, z) for u in parameters]
@@ -0,0 +1,436 @@
+# File: profiler.py
+# Notes: Command call profiler and recorder for tbRibbon builds
+#
+# CommandProfiler wraps maya.cmds and maya.mel for the duration of a build and
+# records every call: command, arguments, result, time and the tbRibbon
+# functions that made it. Recordings export as JSON or as collapsed stacks
+# for flamegraph.pl / speedscope.
+#
+#     import profiler
+#     recorder = profiler.profileRibbonLimb('arm', 5, 5.0, 0.2, True)
+#     print(recorder.format())
+#     recorder.save('arm.json')
+#     recorder.saveCollapsed('arm.folded')
+#
+# Outside of Maya the build runs against StubCmds, which answers every command
+# with a plausible result, or ReplayCmds, which answers with the results of a
+# previous recording. Call counts are then exact and comparable, which makes
+# this usable for build regression checks on machines without Maya:
+#
+#     mayapy profiler.py --joints 20 --json current.json --baseline previous.json
+import functools
+import json
+import os
+import sys
+import time
+import types
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+THIS_MODULE = os.path.splitext(os.path.abspath(__file__))[0]
+WRAPPED_MODULES = ('cmds', 'mel')
+
+
+def jsonable(value):
+    """
+    Plain JSON data for a command argument or result
+    """
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    if isinstance(value, (list, tuple)):
+        return [jsonable(item) for item in value]
+    if isinstance(value, dict):
+        return dict((str(key), jsonable(item)) for key, item in value.items())
+    try:
+        return str(value)
+    except Exception:
+        return repr(value)
+
+
+def callerStack(frame, root=PACKAGE_DIR):
+    """
+    Names of the tbRibbon functions on the stack, outermost first
+    """
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        fileName = os.path.abspath(code.co_filename)
+        if os.path.dirname(fileName) == root and os.path.splitext(fileName)[0] != THIS_MODULE:
+            owner = frame.f_locals.get('self')
+            if owner is not None:
+                names.append('%s.%s' % (type(owner).__name__, code.co_name))
+            else:
+                names.append(code.co_name)
+        frame = frame.f_back
+    names.reverse()
+    return names
+
+
+class CallRecorder(object):
+    """
+    Ordered list of command calls with per command totals
+    """
+    def __init__(self, name=''):
+        self.name = name
+        self.calls = []
+        self.startTime = None
+        self.elapsed = 0.0
+
+    def record(self, module, command, args, kwargs, result, elapsed, stack):
+        self.calls.append({'module': module, 'command': command, 'args': jsonable(args),
+                           'kwargs': jsonable(kwargs), 'result': jsonable(result),
+                           'elapsed': elapsed, 'stack': stack})
+
+    def start(self):
+        self.startTime = time.time()
+
+    def stop(self):
+        if self.startTime is not None:
+            self.elapsed += time.time() - self.startTime
+            self.startTime = None
+
+    def summary(self):
+        """
+        {'cmds.setAttr': {'count': n, 'time': seconds}, ...}
+        """
+        summary = {}
+        for call in self.calls:
+            entry = summary.setdefault('%s.%s' % (call['module'], call['command']), {'count': 0, 'time': 0.0})
+            entry['count'] += 1
+            entry['time'] += call['elapsed']
+        return summary
+
+    def counts(self):
+        return dict((key, entry['count']) for key, entry in self.summary().items())
+
+    def commandTime(self):
+        return sum(call['elapsed'] for call in self.calls)
+
+    def asDict(self):
+        return {'name': self.name, 'elapsed': self.elapsed, 'commandTime': self.commandTime(),
+                'summary': self.summary(), 'calls': self.calls}
+
+    @classmethod
+    def fromDict(cls, data):
+        recorder = cls(data.get('name', ''))
+        recorder.elapsed = data.get('elapsed', 0.0)
+        recorder.calls = list(data.get('calls', []))
+        return recorder
+
+    def save(self, fileName):
+        with open(fileName, 'w') as f:
+            json.dump(self.asDict(), f, indent=1, sort_keys=True)
+
+    @classmethod
+    def load(cls, fileName):
+        with open(fileName) as f:
+            return cls.fromDict(json.load(f))
+
+    def collapsed(self):
+        """
+        Collapsed stack lines ('frame;frame;cmds.command microseconds'), the
+        input format of flamegraph.pl and speedscope
+        """
+        totals = {}
+        for call in self.calls:
+            key = ';'.join([self.name or 'build'] + call['stack'] + ['%s.%s' % (call['module'], call['command'])])
+            totals[key] = totals.get(key, 0.0) + call['elapsed']
+        return ['%s %d' % (key, max(int(round(value * 1e6)), 1)) for key, value in sorted(totals.items())]
+
+    def saveCollapsed(self, fileName):
+        with open(fileName, 'w') as f:
+            f.write('\n'.join(self.collapsed()) + '\n')
+
+    def format(self, limit=20):
+        summary = sorted(self.summary().items(), key=lambda item: (-item[1]['time'], item[0]))
+        lines = ['%s: %d calls, %.4fs in commands, %.4fs total' % (
+            self.name or 'build', len(self.calls), self.commandTime(), self.elapsed)]
+        lines.append('%-32s %8s %10s' % ('command', 'calls', 'time'))
+        for key, entry in summary[:limit]:
+            lines.append('%-32s %8d %10.4f' % (key, entry['count'], entry['time']))
+        return '\n'.join(lines)
+
+
+def compareRecordings(current, baseline):
+    """
+    Commands called more often than in the baseline, as readable strings
+    """
+    regressions = []
+    baseCounts = baseline.counts()
+    for key, count in sorted(current.counts().items()):
+        if count > baseCounts.get(key, 0):
+            regressions.append('%s called %d times, was %d' % (key, count, baseCounts.get(key, 0)))
+    return regressions
+
+
+class ProfiledModule(types.ModuleType):
+    """
+    Stands in for a command module and times every callable taken from it
+    """
+    def __init__(self, name, module, recorder):
+        types.ModuleType.__init__(self, module.__name__)
+        self._shortName = name
+        self._module = module
+        self._recorder = recorder
+        self._wrapped = {}
+
+    def __getattr__(self, attr):
+        value = getattr(self._module, attr)
+        if not callable(value) or attr.startswith('_'):
+            return value
+
+        wrapper = self._wrapped.get(attr)
+        if wrapper is None:
+            wrapper = self._wrap(attr, value)
+            self._wrapped[attr] = wrapper
+        return wrapper
+
+    def _wrap(self, command, function):
+        recorder = self._recorder
+        moduleName = self._shortName
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            stack = callerStack(sys._getframe(1))
+            startTime = time.time()
+            result = function(*args, **kwargs)
+            recorder.record(moduleName, command, args, kwargs, result, time.time() - startTime, stack)
+            return result
+        return wrapper
+
+
+class CommandProfiler(object):
+    """
+    Context manager installing ProfiledModules for maya.cmds and maya.mel.
+    Both sys.modules and the cmds / mel globals of already imported tbRibbon
+    modules are swapped, and restored on exit.
+    """
+    def __init__(self, name='', recorder=None):
+        self.recorder = recorder or CallRecorder(name)
+        self.patched = []
+
+    def __enter__(self):
+        self.install()
+        return self.recorder
+
+    def __exit__(self, *exc):
+        self.uninstall()
+        return False
+
+    def install(self):
+        import maya
+
+        for shortName in WRAPPED_MODULES:
+            fullName = 'maya.%s' % shortName
+            try:
+                module = __import__(fullName, fromlist=[shortName])
+            except ImportError:
+                continue
+
+            proxy = ProfiledModule(shortName, module, self.recorder)
+            self.patch(sys.modules, fullName, proxy, item=True)
+            self.patch(maya, shortName, proxy)
+            for loaded in list(sys.modules.values()):
+                fileName = getattr(loaded, '__file__', None)
+                if fileName and os.path.dirname(os.path.abspath(fileName)) == PACKAGE_DIR \
+                        and getattr(loaded, shortName, None) is module:
+                    self.patch(loaded, shortName, proxy)
+
+        self.recorder.start()
+
+    def patch(self, owner, name, value, item=False):
+        if item:
+            self.patched.append((owner, name, owner[name], True))
+            owner[name] = value
+        else:
+            self.patched.append((owner, name, getattr(owner, name), False))
+            setattr(owner, name, value)
+
+    def uninstall(self):
+        self.recorder.stop()
+        for owner, name, value, item in reversed(self.patched):
+            if item:
+                owner[name] = value
+            else:
+                setattr(owner, name, value)
+        self.patched = []
+
+
+class StubCmds(types.ModuleType):
+    """
+    Headless maya.cmds / maya.mel. Every command exists and returns a
+    plausible value, creation commands return the requested or a generated name.
+    """
+    def __init__(self, name='maya.cmds'):
+        types.ModuleType.__init__(self, name)
+        self.nameCounts = {}
+
+    def __getattr__(self, command):
+        if command.startswith('__'):
+            raise AttributeError(command)
+
+        def stubCommand(*args, **kwargs):
+            return self.result(command, args, kwargs)
+        stubCommand.__name__ = command
+        return stubCommand
+
+    def uniqueName(self, base):
+        self.nameCounts[base] = self.nameCounts.get(base, 0) + 1
+        return '%s%d' % (base, self.nameCounts[base])
+
+    def result(self, command, args, kwargs):
+        name = kwargs.get('name') or kwargs.get('n')
+
+        if command == 'rename':
+            return args[-1]
+        if command == 'listRelatives':
+            if kwargs.get('shapes') or kwargs.get('s'):
+                return ['%sShape' % args[0]]
+            return []
+        if command in ('curve', 'createNode', 'group', 'joint'):
+            return name or self.uniqueName(command)
+        if command in ('circle', 'nurbsPlane'):
+            return [name or self.uniqueName(command), self.uniqueName('make%s' % command)]
+        if command == 'cluster':
+            name = name or self.uniqueName('cluster')
+            return [name, '%sHandle' % name]
+        if command == 'nonLinear':
+            name = name or self.uniqueName(kwargs.get('type', 'nonLinear'))
+            return [name, '%sHandle' % name]
+        if command == 'duplicate':
+            return [name or self.uniqueName(str(args[0]))]
+        if command == 'arclen':
+            return self.uniqueName('curveInfo')
+        if command.endswith('Constraint') or command in ('blendShape', 'wire', 'skinCluster'):
+            return [name or self.uniqueName(command)]
+        if command in ('ls', 'listConnections'):
+            return []
+        if command in ('objExists', 'undoInfo'):
+            return False
+        if command == 'xform':
+            return [0.0, 0.0, 0.0]
+        if command == 'getAttr':
+            return 0.0
+        return None
+
+
+class ReplayCmds(StubCmds):
+    """
+    StubCmds answering each command with the results of a recording, in order,
+    and with stub results once a command's recorded results run out
+    """
+    def __init__(self, recorder, name='maya.cmds', module='cmds'):
+        StubCmds.__init__(self, name)
+        self.results = {}
+        for call in recorder.calls:
+            if call['module'] == module:
+                self.results.setdefault(call['command'], []).append(call['result'])
+
+    def result(self, command, args, kwargs):
+        results = self.results.get(command)
+        if results:
+            return results.pop(0)
+        return StubCmds.result(self, command, args, kwargs)
+
+
+def installStubMaya(replay=None):
+    """
+    Register stub maya, maya.cmds and maya.mel modules in sys.modules and
+    return the stub cmds. maya.OpenMaya is left out so build plans run through
+    maya.cmds. Refuses to replace a real Maya session.
+    """
+    existing = sys.modules.get('maya.cmds')
+    if existing is not None and not isinstance(existing, StubCmds):
+        raise RuntimeError('The stub commands must not replace a running Maya')
+
+    if replay is not None:
+        cmds, mel = ReplayCmds(replay), ReplayCmds(replay, 'maya.mel', 'mel')
+    else:
+        cmds, mel = StubCmds(), StubCmds('maya.mel')
+
+    maya = types.ModuleType('maya')
+    maya.__path__ = []
+    maya.cmds = cmds
+    maya.mel = mel
+    sys.modules['maya'] = maya
+    sys.modules['maya.cmds'] = cmds
+    sys.modules['maya.mel'] = mel
+
+    # Modules imported against earlier stubs keep working with the new ones
+    for loaded in list(sys.modules.values()):
+        fileName = getattr(loaded, '__file__', None)
+        if fileName and os.path.dirname(os.path.abspath(fileName)) == PACKAGE_DIR:
+            for shortName, module in (('cmds', cmds), ('mel', mel)):
+                if isinstance(getattr(loaded, shortName, None), StubCmds):
+                    setattr(loaded, shortName, module)
+    return cmds
+
+
+def hasMaya():
+    try:
+        import maya.cmds
+    except ImportError:
+        return False
+    return not isinstance(maya.cmds, StubCmds)
+
+
+def profileRibbonLimb(name='ribbon', numJnts=5, width=5.0, lengthRatio=0.2, setupCons=True,
+                      headless=None, replay=None, **kwargs):
+    """
+    Build a RibbonLimb under the profiler and return the CallRecorder.
+    headless=None uses the stub commands only when Maya cannot be imported,
+    replay is a CallRecorder whose results the stub commands return.
+    Extra keyword arguments go to RibbonLimb (mode, distribution...).
+    """
+    if headless is None:
+        headless = replay is not None or not hasMaya()
+    if headless:
+        installStubMaya(replay)
+
+    sys.path.insert(0, PACKAGE_DIR)
+    try:
+        import core
+    finally:
+        sys.path.remove(PACKAGE_DIR)
+
+    with CommandProfiler(name) as recorder:
+        core.RibbonLimb(name, numJnts, width, lengthRatio, setupCons, **kwargs)
+    return recorder
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Profile the maya.cmds calls of a RibbonLimb build')
+    parser.add_argument('--name', default='ribbon')
+    parser.add_argument('--joints', type=int, default=5)
+    parser.add_argument('--width', type=float, default=5.0)
+    parser.add_argument('--length-ratio', type=float, default=0.2)
+    parser.add_argument('--no-controls', action='store_true')
+    parser.add_argument('--mode', default='full')
+    parser.add_argument('--replay', help='answer commands with the results of this --json recording')
+    parser.add_argument('--json', help='write the recording to this file')
+    parser.add_argument('--collapsed', help='write collapsed stacks for flame graphs to this file')
+    parser.add_argument('--baseline', help='exit 1 when a command is called more often than in this recording')
+    args = parser.parse_args(argv)
+
+    replay = CallRecorder.load(args.replay) if args.replay else None
+    recorder = profileRibbonLimb(args.name, args.joints, args.width, args.length_ratio, not args.no_controls,
+                                 replay=replay, mode=args.mode)
+    sys.stdout.write(recorder.format() + '\n')
+
+    if args.json:
+        recorder.save(args.json)
+    if args.collapsed:
+        recorder.saveCollapsed(args.collapsed)
+
+    if args.baseline:
+        regressions = compareRecordings(recorder, CallRecorder.load(args.baseline))
+        for regression in regressions:
+            sys.stderr.write('REGRESSION %s\n' % regression)
+        return 1 if regressions else 0
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,125 @@
+# File: startupBenchmark.py
+# Notes: Startup times of the mayaTools entry points
+#
+# Import time of each tool is measured cold, in a fresh interpreter per run,
+# so it shows what an artist pays on the first click in a new session:
+#
+#     mayapy startupBenchmark.py --repeat 5 --json startup.json
+#
+# Inside a Maya GUI session launchTimes() also opens every tool twice and
+# times both calls, the second one shows what a reused window costs:
+#
+#     import startupBenchmark
+#     startupBenchmark.launchTimes()
+import importlib
+import json
+import os
+import subprocess
+import sys
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Tool name, module, entry point called to open the tool
+TOOLS = (
+    ('tbRibbon', 'tbRibbon.mainWindow', 'show'),
+    ('searchScene', 'searchScene.searchScene', 'SearchSceneUI'),
+    ('tbLoadSaveWeights', 'tbLoadSaveWeights.tbLoadSaveWeights_UI', 'tbLoadSaveWeights_UI'),
+)
+
+IMPORT_SCRIPT = '''import sys, time
+sys.path.insert(0, %r)
+startTime = time.time()
+try:
+    import %s
+except Exception as e:
+    sys.stdout.write('error %%s: %%s' %% (type(e).__name__, e))
+else:
+    sys.stdout.write(repr(time.time() - startTime))
+'''
+
+
+def median(values):
+    values = sorted(values)
+    middle = len(values) // 2
+    return values[middle] if len(values) % 2 else (values[middle - 1] + values[middle]) / 2.0
+
+
+def importTime(moduleName, python=None):
+    """
+    Seconds to import moduleName in a new interpreter, raises RuntimeError if the import fails
+    """
+    output = subprocess.check_output([python or sys.executable, '-c', IMPORT_SCRIPT % (REPO_DIR, moduleName)])
+    output = output.decode('utf-8', 'replace').strip().splitlines()[-1] if output.strip() else ''
+    if not output or output.startswith('error'):
+        raise RuntimeError('Could not import %s: %s' % (moduleName, output))
+    return float(output)
+
+
+def importTimes(repeat=3, python=None, tools=TOOLS):
+    """
+    {tool: {'min': s, 'median': s} or {'error': message}} over repeat cold imports
+    """
+    results = {}
+    for tool, moduleName, entryPoint in tools:
+        try:
+            times = [importTime(moduleName, python) for i in range(repeat)]
+        except (RuntimeError, subprocess.CalledProcessError) as e:
+            results[tool] = {'error': str(e)}
+            continue
+        results[tool] = {'min': min(times), 'median': median(times)}
+    return results
+
+
+def launchTimes(tools=TOOLS):
+    """
+    Open every tool twice in the running Maya session and time the import and both calls
+    """
+    if REPO_DIR not in sys.path:
+        sys.path.insert(0, REPO_DIR)
+
+    results = {}
+    for tool, moduleName, entryPoint in tools:
+        startTime = time.time()
+        module = importlib.import_module(moduleName)
+        importElapsed = time.time() - startTime
+
+        calls = []
+        for i in range(2):
+            startTime = time.time()
+            getattr(module, entryPoint)()
+            calls.append(time.time() - startTime)
+        results[tool] = {'import': importElapsed, 'first': calls[0], 'second': calls[1]}
+    return results
+
+
+def formatResults(results):
+    lines = []
+    for tool in sorted(results):
+        entry = results[tool]
+        if 'error' in entry:
+            lines.append('%-20s %s' % (tool, entry['error']))
+        else:
+            lines.append('%-20s %s' % (tool, '  '.join('%s %.4fs' % item for item in sorted(entry.items()))))
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Measure cold import times of the mayaTools entry points')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--python', help='interpreter to measure with, e.g. mayapy, defaults to this one')
+    parser.add_argument('--json', help='write the results to this file')
+    args = parser.parse_args(argv)
+
+    results = importTimes(args.repeat, args.python)
+    sys.stdout.write(formatResults(results) + '\n')
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
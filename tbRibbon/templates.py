@@ -0,0 +1,226 @@
+# File: templates.py
+# Notes: Template instancing for mass ribbon generation
+#
+# The first ribbon for a (numJnts, width, lengthRatio, setupCons) signature is
+# built once with RibbonLimb as a hidden template. Further ribbons with the
+# same signature are stamped out by duplicating every node of the template
+# with its input connections and renaming the copies, skipping the surface,
+# follicle and deformer construction entirely. The whole node list is
+# duplicated, not only the hierarchy and its upstream graph, so utility nodes
+# that only feed each other (the squash and stretch network) come along too.
+#
+# Every template node name ends with TEMPLATE_MARKER. duplicate makes the copied
+# names unique by appending digits, so stripping the marker and those digits
+# gives back the template name, which is then mapped to the instance name.
+#
+#     import templates
+#     templates.instanceRibbonLimb('tentacle_%02d' % i, 5, 5.0, 0.2, True)
+#     templates.instanceRibbonLimb('tentacle_99', 5, 5.0, 0.2, True, verify=True)
+import re
+import time
+
+import maya.cmds as cmds
+import maya.OpenMaya as om
+
+import buildPlan as buildPlan
+import core as core
+import transaction as transaction
+
+TEMPLATE_PREFIX = 'ribbonTemplate'
+TEMPLATE_MARKER = '__tpl'
+TEMPLATE_SUFFIX = re.compile(r'%s\d*$' % re.escape(TEMPLATE_MARKER))
+
+_templates = {}
+
+
+class TemplateError(Exception):
+    pass
+
+
+def templateSignature(numJnts, width, lengthRatio, setupCons):
+    return int(numJnts), float(width), float(lengthRatio), bool(setupCons)
+
+
+def templateName(signature):
+    """
+    Node name prefix of the template built for a signature
+    """
+    numJnts, width, lengthRatio, setupCons = signature
+    name = '%s_%d_%g_%g_%d' % (TEMPLATE_PREFIX, numJnts, width, lengthRatio, setupCons)
+    return re.sub('[^A-Za-z0-9_]', '_', name)
+
+
+def nodeName(obj):
+    if obj.hasFn(om.MFn.kDagNode):
+        return om.MFnDagNode(obj).fullPathName()
+    return om.MFnDependencyNode(obj).name()
+
+
+def getObjects(names):
+    sel = om.MSelectionList()
+    for name in names:
+        sel.add(name)
+    objects = []
+    for i in range(sel.length()):
+        obj = om.MObject()
+        sel.getDependNode(i, obj)
+        objects.append(obj)
+    return objects
+
+
+class RibbonTemplate(object):
+    """
+    A hidden canonical ribbon, the list of its nodes and the node names its
+    build plan declares
+    """
+    def __init__(self, signature):
+        self.signature = signature
+        self.name = templateName(signature)
+        self.root = None
+        self.nodes = []
+        self.planNodes = []
+        self.buildTime = 0.0
+
+    def exists(self):
+        return self.root is not None and cmds.objExists(self.root)
+
+    def build(self):
+        startTime = time.time()
+        numJnts, width, lengthRatio, setupCons = self.signature
+
+        before = set(cmds.ls(long=True))
+        limb = core.RibbonLimb(self.name, numJnts, width, lengthRatio, setupCons, undoable=False)
+        created = [node for node in cmds.ls(long=True) if node not in before]
+
+        # Rename through the API so renaming a transform never renames its shape behind our back
+        objects = getObjects(created)
+        for obj in objects:
+            nodeFn = om.MFnDependencyNode(obj)
+            nodeFn.setName(nodeFn.name() + TEMPLATE_MARKER)
+
+        self.root = limb.rootGrp + TEMPLATE_MARKER
+        self.nodes = [nodeName(obj) for obj in objects]
+        self.planNodes = limb.plan.createdNodes()
+        cmds.setAttr('%s.visibility' % self.root, 0)
+        self.buildTime = time.time() - startTime
+        return self
+
+    def duplicateTargets(self):
+        """
+        Every template node except DAG nodes below another template node,
+        duplicate copies those with their parent's hierarchy
+        """
+        nodes = set(self.nodes)
+        targets = []
+        for node in self.nodes:
+            parents = node.split('|')
+            if not any('|'.join(parents[:index]) in nodes for index in range(2, len(parents))):
+                targets.append(node)
+        return targets
+
+    def instance(self, name, verify=False):
+        """
+        Duplicate the template nodes with their input connections and rename
+        the copies for name. Returns the instance root. With verify the
+        instance graph is checked against the template, see compareInstance().
+        """
+        templateRoot = TEMPLATE_SUFFIX.sub('', self.root)
+        root = None
+
+        with transaction.BuildTransaction(name) as build:
+            cmds.duplicate(self.duplicateTargets(), inputConnections=True)
+
+            # The copies are taken from the node added callback, duplicated
+            # children keep their short names and can be ambiguous
+            for obj in [handle.object() for handle in build.handles if handle.isValid()]:
+                nodeFn = om.MFnDependencyNode(obj)
+                templateNodeName = TEMPLATE_SUFFIX.sub('', nodeFn.name())
+                nodeFn.setName(templateNodeName.replace(self.name, name, 1))
+                if templateNodeName == templateRoot:
+                    root = nodeName(obj)
+
+            if root is None:
+                raise TemplateError('The root of %s was not duplicated' % self.name)
+            cmds.setAttr('%s.visibility' % root, 1)
+
+            if verify:
+                differences = self.compareInstance(name, build.createdNodes())
+                if differences:
+                    raise TemplateError('Instance %s does not match its template:\n  %s' % (
+                        name, '\n  '.join(differences)))
+        return root
+
+    def compareInstance(self, name, nodes):
+        """
+        Differences between an instance and the template, a fresh build of
+        the same plan: plan nodes missing from the instance, and node type and
+        connection counts that differ. Empty when they match.
+        """
+        differences = ['missing %s' % planNode.replace(self.name, name, 1) for planNode in self.planNodes
+                       if not cmds.objExists(planNode.replace(self.name, name, 1))]
+
+        expected = buildPlan.GraphReport.fromScene(self.nodes, self.name)
+        actual = buildPlan.GraphReport.fromScene(nodes, name)
+        for nodeType in sorted(set(expected.nodeTypes) | set(actual.nodeTypes)):
+            if expected.nodeTypes.get(nodeType, 0) != actual.nodeTypes.get(nodeType, 0):
+                differences.append('%s nodes: %d in the template, %d in the instance' % (
+                    nodeType, expected.nodeTypes.get(nodeType, 0), actual.nodeTypes.get(nodeType, 0)))
+        if expected.connections != actual.connections:
+            differences.append('connections: %d in the template, %d in the instance' % (
+                expected.connections, actual.connections))
+        return differences
+
+
+def getTemplate(numJnts, width, lengthRatio, setupCons):
+    """
+    Return the cached template for a signature, building it when needed
+    """
+    signature = templateSignature(numJnts, width, lengthRatio, setupCons)
+    template = _templates.get(signature)
+    if template is None or not template.exists():
+        template = RibbonTemplate(signature).build()
+        _templates[signature] = template
+    return template
+
+
+def instanceRibbonLimb(name, numJnts, width, lengthRatio, setupCons, verify=False):
+    """
+    Create a ribbon limb from a cached template, returns the limb root group.
+    verify raises TemplateError when the instance graph differs from the template.
+    """
+    return getTemplate(numJnts, width, lengthRatio, setupCons).instance(name, verify)
+
+
+def clearTemplates():
+    """
+    Delete every cached template from the scene
+    """
+    for template in _templates.values():
+        if template.exists():
+            cmds.delete(template.root)
+    _templates.clear()
+
+
+def compareBuildTimes(count=10, numJnts=5, width=5.0, lengthRatio=0.2, setupCons=True, prefix='bench'):
+    """
+    Build count limbs with RibbonLimb and count limbs from a template in the
+    current scene and return the per limb times in seconds
+    """
+    startTime = time.time()
+    for i in range(count):
+        core.RibbonLimb('%sFull%02d' % (prefix, i), numJnts, width, lengthRatio, setupCons)
+    fullTime = (time.time() - startTime) / count
+
+    clearTemplates()
+    template = getTemplate(numJnts, width, lengthRatio, setupCons)
+
+    startTime = time.time()
+    for i in range(count):
+        instanceRibbonLimb('%sInst%02d' % (prefix, i), numJnts, width, lengthRatio, setupCons)
+    instanceTime = (time.time() - startTime) / count
+
+    results = {'count': count, 'fullBuild': fullTime, 'templateBuild': template.buildTime,
+               'instance': instanceTime, 'speedup': fullTime / instanceTime if instanceTime else 0.0}
+    print('RibbonLimb %.4fs per limb, template %.4fs once, instance %.4fs per limb (%.1fx)'
+          % (fullTime, template.buildTime, instanceTime, results['speedup']))
+    return results
@@ -0,0 +1,118 @@
+# File: transaction.py
+# Notes: Undo aware build transactions
+#
+# BuildTransaction wraps a build so that it is either one undo chunk (a single
+# Ctrl+Z removes the whole limb) or, for batch generation, runs with undo
+# recording suspended so the queue does not fill up with thousands of records.
+# If the build raises, every node created since the transaction started is
+# deleted again before the error propagates.
+#
+#     with transaction.BuildTransaction('arm') as build:
+#         core.RibbonLimb('arm', 5, 5.0, 0.2, True, executor=build.executor())
+#
+# Both modes hand out the API modifier executor. In an undoable transaction
+# every modifier batch is put on the undo queue as it is applied, see
+# tbCommon.batching.recordUndo(), so the chunk undoes and redoes as a whole.
+import maya.cmds as cmds
+
+import buildPlan as buildPlan
+
+try:
+    import maya.OpenMaya as om
+except ImportError:
+    om = None
+
+
+class BuildTransaction(object):
+    """
+    undoable=True records the build as one undo chunk, False suspends undo
+    recording while it runs. rollback deletes the created nodes on failure.
+    plan is used to find the created nodes when node added callbacks are not
+    available.
+    """
+    def __init__(self, name='', undoable=True, rollback=True, plan=None):
+        self.name = name
+        self.undoable = undoable
+        self.rollback = rollback
+        self.plan = plan
+        self.handles = []
+        self.callbackId = None
+        self.undoState = None
+        self.existing = set()
+        self.rolledBack = []
+
+    def executor(self):
+        """
+        PlanExecutor suited to the undo mode
+        """
+        return buildPlan.PlanExecutor(undoable=self.undoable)
+
+    def __enter__(self):
+        if self.undoable:
+            cmds.undoInfo(openChunk=True, chunkName=self.name or 'build')
+        else:
+            self.undoState = cmds.undoInfo(query=True, state=True)
+            cmds.undoInfo(stateWithoutFlush=False)
+
+        if self.rollback and om is not None:
+            self.callbackId = om.MDGMessage.addNodeAddedCallback(self.nodeAdded, 'dependNode')
+        elif self.rollback and self.plan is not None:
+            # Plan names that exist before the build are not ours to delete
+            self.existing = set(name for name in self.plan.createdNodes() if cmds.objExists(name))
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.removeCallback()
+        try:
+            if excType is not None and self.rollback:
+                self.rollbackNodes()
+        finally:
+            if self.undoable:
+                cmds.undoInfo(closeChunk=True)
+            else:
+                cmds.undoInfo(stateWithoutFlush=self.undoState)
+        return False
+
+    def nodeAdded(self, obj, clientData):
+        self.handles.append(om.MObjectHandle(obj))
+
+    def removeCallback(self):
+        if self.callbackId is not None:
+            om.MMessage.removeCallback(self.callbackId)
+            self.callbackId = None
+
+    def createdNodes(self):
+        """
+        Names of the nodes created so far that still exist, DAG nodes as full paths
+        """
+        if om is None:
+            names = self.plan.createdNodes() if self.plan is not None else []
+            return [name for name in names if name not in self.existing and cmds.objExists(name)]
+
+        names = []
+        for handle in self.handles:
+            if not handle.isValid():
+                continue
+            obj = handle.object()
+            if obj.hasFn(om.MFn.kDagNode):
+                names.append(om.MFnDagNode(obj).fullPathName())
+            else:
+                names.append(om.MFnDependencyNode(obj).name())
+        return names
+
+    def rollbackNodes(self):
+        """
+        Delete the nodes created by the failed build
+        """
+        names = self.createdNodes()
+        self.rolledBack = names
+        if not names:
+            return
+
+        try:
+            cmds.delete(names)
+        except (RuntimeError, ValueError):
+            # Some were removed with their parents or deformers already, go one by one
+            for name in names:
+                if cmds.objExists(name):
+                    cmds.delete(name)
@@ -1,4 +1,248 @@
+import math
+import os
+import sys
+
 import maya.cmds as cmds
+import buildPlan as buildPlan
+
+try:
+    from tbCommon import batching
+except ImportError:
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from tbCommon import batching
+
+# Control shape library
+# CV data is computed in python and cached per shape, radius and sections, and
+# every control is a single nurbsCurve so it is created in one step. Shapes
+# lie in the XY plane like cmds.circle, createControl(normal=...) rotates them.
+CONTROL_SHAPES = {}
+_shapeCache = {}
+
+
+class ControlShape(object):
+    """
+    CV positions, degree and periodic flag of a single curve control
+    """
+    __slots__ = ('points', 'degree', 'periodic')
+
+    def __init__(self, points, degree=1, periodic=False):
+        self.points = tuple(tuple(float(v) for v in point) for point in points)
+        self.degree = degree
+        self.periodic = periodic
+
+    def transformed(self, scale=1.0, offset=(0, 0, 0), normal='z'):
+        """
+        Copy of the shape scaled, turned to face the normal axis and moved by offset
+        """
+        points = []
+        for x, y, z in self.points:
+            if normal == 'x':
+                x, y, z = z, y, -x
+            elif normal == 'y':
+                x, y, z = x, z, -y
+            points.append((x * scale + offset[0], y * scale + offset[1], z * scale + offset[2]))
+        return ControlShape(points, self.degree, self.periodic)
+
+
+def registerControlShape(name, builder):
+    """
+    Add a shape to the library. builder(radius, sections) returns a ControlShape.
+    """
+    CONTROL_SHAPES[name] = builder
+    for key in [key for key in _shapeCache if key[0] == name]:
+        del _shapeCache[key]
+
+
+def controlShape(shape, radius=1.0, sections=8):
+    """
+    Cached ControlShape of a library shape
+    """
+    key = (shape, float(radius), int(sections))
+    result = _shapeCache.get(key)
+    if result is None:
+        if shape not in CONTROL_SHAPES:
+            raise ValueError('Unknown control shape: %s, use one of %s' % (shape, ', '.join(sorted(CONTROL_SHAPES))))
+        result = _shapeCache[key] = CONTROL_SHAPES[shape](float(radius), int(sections))
+    return result
+
+
+def circlePoints(radius, sections, cvRadius=None):
+    step = 2 * math.pi / sections
+    cvRadius = radius if cvRadius is None else cvRadius
+    return [(math.cos(step * i) * cvRadius, math.sin(step * i) * cvRadius, 0.0) for i in range(sections)]
+
+
+def circleShape(radius, sections):
+    """
+    Periodic cubic circle through radius, the cvs sit outside it like cmds.circle
+    """
+    cvRadius = 6.0 * radius / (4.0 + 2.0 * math.cos(2 * math.pi / sections))
+    return ControlShape(circlePoints(radius, sections, cvRadius), 3, True)
+
+
+def starShape(radius, sections):
+    """
+    Circle with every other cv pulled in to a tenth of its radius
+    """
+    circle = circleShape(radius, sections)
+    points = [(x * .1, y * .1, z * .1) if i % 2 else (x, y, z) for i, (x, y, z) in enumerate(circle.points)]
+    return ControlShape(points, 3, True)
+
+
+def circlePlusShape(radius, sections):
+    """
+    Linear circle with a cross, drawn as one curve: around the circle, across it
+    horizontally, a quarter turn back along the circle and across vertically
+    """
+    points = circlePoints(radius, sections * 4)
+    points.append(points[0])
+    points.extend(circlePoints(radius, sections * 4)[sections * 2:sections * 3 + 1])
+    points.append((0.0, radius, 0.0))
+    return ControlShape(points, 1, False)
+
+
+def boxShape(radius, sections):
+    r = radius
+    return ControlShape([(r, -r, r), (r, r, r), (r, r, -r), (r, -r, -r), (-r, -r, -r), (-r, r, -r), (-r, r, r),
+                         (-r, -r, r), (r, -r, r), (r, -r, -r), (-r, -r, -r), (-r, -r, r), (-r, r, r), (r, r, r),
+                         (r, r, -r), (-r, r, -r)], 1, False)
+
+
+def squareShape(radius, sections):
+    r = radius
+    return ControlShape([(-r, r, 0), (r, r, 0), (r, -r, 0), (-r, -r, 0), (-r, r, 0)], 1, False)
+
+
+for _name, _builder in [('circle', circleShape), ('star', starShape), ('circlePlus', circlePlusShape),
+                        ('box', boxShape), ('square', squareShape)]:
+    registerControlShape(_name, _builder)
+
+
+def addControlToPlan(plan, name, shape='circle', radius=1.0, sections=8, offset=(0, 0, 0), normal='z'):
+    """
+    Add a createCurve op for a control to a buildPlan.BuildPlan. shape is a
+    library shape name or a ControlShape, radius scales custom shapes.
+    """
+    if isinstance(shape, ControlShape):
+        data = shape.transformed(radius, offset, normal)
+    else:
+        data = controlShape(shape, radius, sections).transformed(1.0, offset, normal)
+    return plan.createCurve(name, data.points, data.degree, data.periodic)
+
+
+def planExecutor():
+    """
+    Modifier executor that puts its batches on the undo queue while undo is on
+    """
+    return buildPlan.PlanExecutor(undoable=cmds.undoInfo(query=True, state=True))
+
+
+def createControls(controls, executor=None):
+    """
+    Create many controls in one batch. controls is a list of dicts of
+    addControlToPlan() arguments, e.g. [{'name': 'a_con', 'shape': 'star'}].
+    Returns the control names.
+    """
+    plan = buildPlan.BuildPlan('controls')
+    names = [addControlToPlan(plan, **control) for control in controls]
+    (executor or planExecutor()).execute(plan)
+    return names
+
+
+def createControl(name, shape='circle', radius=1.0, sections=8, offset=(0, 0, 0), normal='z'):
+    return createControls([{'name': name, 'shape': shape, 'radius': radius, 'sections': sections,
+                            'offset': offset, 'normal': normal}])[0]
+
+
+# Bulk attribute state
+# Attribute lists are collapsed before anything is applied: all three axes of a
+# translate, rotate or scale become the compound plug, and every flag for a
+# plug goes into one attrState op, so a plug costs one call on the cmds path
+# and one plug lookup on the modifier path.
+COMPOUND_ATTRS = ('translate', 'rotate', 'scale')
+AXES = ('X', 'Y', 'Z')
+LOCK_HIDE = {'lock': True, 'keyable': False, 'channelBox': False}
+
+
+def maskAttrs(translate=False, rotate=False, scale=False, visibility=False):
+    """
+    Attribute names for the lockAttrs style masks
+    """
+    attrs = [attr for attr, enabled in zip(COMPOUND_ATTRS, (translate, rotate, scale)) if enabled]
+    if visibility:
+        attrs.append('visibility')
+    return attrs
+
+
+def collapseAttrs(attrs):
+    """
+    Unique attribute names in order, with complete axis sets replaced by their
+    compound and axes of an included compound dropped
+    """
+    attrs = list(attrs)
+    result = []
+    for attr in attrs:
+        compound = attr[:-1] if attr[:-1] in COMPOUND_ATTRS and attr[-1] in AXES else None
+        if compound is not None and (compound in attrs or all(compound + axis in attrs for axis in AXES)):
+            attr = compound
+        if attr not in result:
+            result.append(attr)
+    return result
+
+
+def expandAttrs(attrs):
+    """
+    Per axis attribute names, the plugs a call per axis would touch
+    """
+    expanded = []
+    for attr in attrs:
+        expanded.extend([attr + axis for axis in AXES] if attr in COMPOUND_ATTRS else [attr])
+    return expanded
+
+
+def planAttrStates(plan, states, **flags):
+    """
+    Add attrState ops to a buildPlan.BuildPlan. states maps node names to
+    attribute lists, flags are lock / keyable / channelBox (LOCK_HIDE when none
+    are given). Returns the number of ops added.
+    """
+    flags = flags or LOCK_HIDE
+    count = 0
+    for node, attrs in states.items() if isinstance(states, dict) else states:
+        for attr in collapseAttrs(attrs):
+            plan.attrState(node, attr, **flags)
+            count += 1
+    return count
+
+
+def setAttrStates(states, executor=None, **flags):
+    """
+    Apply attribute states to many nodes in one batch, see planAttrStates()
+    """
+    plan = buildPlan.BuildPlan('attrStates')
+    planAttrStates(plan, states, **flags)
+    (executor or planExecutor()).execute(plan)
+    return len(plan)
+
+
+def lockAttrs(nodes, translate=False, rotate=False, scale=False, visibility=False, executor=None):
+    """
+    Lock and hide the masked attributes on every node
+    """
+    if not isinstance(nodes, (list, tuple, set)):
+        nodes = [nodes]
+    attrs = maskAttrs(translate, rotate, scale, visibility)
+    return setAttrStates([(node, attrs) for node in nodes], executor)
+
+
+def attrStateCalls(plan):
+    """
+    Attribute state calls of a plan against one setAttr per axis and flag
+    set, as {'calls': n, 'perAxisCalls': n, 'saved': n}
+    """
+    ops = [op for op in plan if op.kind == 'attrState']
+    perAxis = len(expandAttrs([op.attr for op in ops]))
+    return {'calls': len(ops), 'perAxisCalls': perAxis, 'saved': perAxis - len(ops)}
 
 
 class Utilities(object):
@@ -46,7 +290,6 @@ class Utilities(object):
             cmds.error('Could not constrain')
 
     def createNullGroup(self, source, name=None):
-        xyz = ['X', 'Y', 'Z']
         if name is None:
             if 'CON' in source:
                 name = ('%sNUL' % source.replace('CON', ''))
@@ -57,9 +300,10 @@ class Utilities(object):
         rots = cmds.xform(source, q=True, ws=True, ro=True)
         sourceParent = cmds.listRelatives(source, p=True)
 
-        for index, item in enumerate(xyz):
-            cmds.setAttr(('%s.translate%s' % (group, item)), trans[index])
-            cmds.setAttr(('%s.rotate%s' % (group, item)), rots[index])
+        # Undoable like the group and parent commands around it
+        with batching.CommandBatch(batching.MayaBackend(undoable=True)) as batch:
+            batch.setAttr(group, 'translate', tuple(trans))
+            batch.setAttr(group, 'rotate', tuple(rots))
 
         cmds.parent(source, group)
         if sourceParent is not None:
@@ -68,19 +312,14 @@ class Utilities(object):
         return group
 
     def lockAttrs(self, source, translate=False, rotate=False, scale=False, visibility=False):
-        for axis in ['X', 'Y', 'Z']:
-            if translate:
-                cmds.setAttr('%s.%s%s' % (source, 'translate', axis), keyable=False, lock=True, channelBox=False)
-            if rotate:
-                cmds.setAttr('%s.%s%s' % (source, 'rotate', axis), keyable=False, lock=True, channelBox=False)
-            if scale:
-                cmds.setAttr('%s.%s%s' % (source, 'scale', axis), keyable=False, lock=True, channelBox=False)
-        if visibility:
-            cmds.setAttr('%s.%s' % (source, 'visibility'), keyable=False, lock=True, channelBox=False)
+        lockAttrs(source, translate, rotate, scale, visibility)
 
     def jointCheck(self, jointCheckList=[]):
-        for joint in jointCheckList:
-            if cmds.objExists(joint) and cmds.objectType(joint, isType='joint'):
+        with batching.CommandBatch() as batch:
+            found = [batch.exists(joint) for joint in jointCheckList]
+
+        for joint, exists in zip(jointCheckList, found):
+            if exists.get() and cmds.objectType(joint, isType='joint'):
                 continue
             else:
                 cmds.error('Could not find joint: %s, please check joint names' % joint)
@@ -100,37 +339,13 @@ class Utilities(object):
         return myJoints
 
     def createBoxControl(self, name='', scale=1):
-        curveShape = [(scale, -scale, scale), (scale, scale, scale), (scale, scale, -scale), (scale, -scale, -scale),
-                      (-scale, -scale, -scale), (-scale, scale, -scale), (-scale, scale, scale), (-scale, -scale, scale),
-                      (scale, -scale, scale), (scale, -scale, -scale), (-scale, -scale, -scale), (-scale, -scale, scale),
-                      (-scale, scale, scale), (scale, scale, scale), (scale, scale, -scale), (-scale, scale, -scale)]
-        boxControl = cmds.curve(name=name, d=1, p=curveShape)
-        return boxControl
+        return createControl(name, 'box', scale)
 
     def createCircleControl(self, name='', radius=1, sections=8):
-        circleControl = cmds.circle(name=name, radius=radius, sections=sections)
-        cmds.delete(circleControl, constructionHistory=1)
-        circleControl = circleControl[0]
-        return circleControl
+        return createControl(name, 'circle', radius, sections)
 
     def createStarControl(self, name='', radius=0.5, sections=16, parentSpace=None):
-        self.clearSel()
-        starControl = self.createCircleControl(name, radius, sections)
-        cvs = [cvs for cvs in range(1, sections) if cvs % 2 != 0]
-        for cv in cvs:
-            cmds.select('%s.cv[%d]' % (starControl, cv), add=1)
-            cmds.scale(.1, .1, .1, '%s.cv[%d]' % (starControl, cv), r=1)
-        return starControl
+        return createControl(name, 'star', radius, sections)
 
     def createCirclePlusControl(self, name='', radius=1, sections=8):
-        circlePlusControl = cmds.circle(name=name, radius=radius, sections=sections)
-        vertLine = cmds.curve(p=[(0, -radius, 0), (0, radius, 0)], d=1)
-        horizLine = cmds.curve(p=[(-radius, 0, 0), (radius, 0, 0)], d=1)
-        vertLineShape = cmds.listRelatives(vertLine, shapes=1)
-        horizLineShape = cmds.listRelatives(horizLine, shapes=1)
-        cmds.parent(vertLineShape, horizLineShape, circlePlusControl, add=1, shape=1)
-        cmds.delete(vertLine, horizLine)
-        cmds.delete(circlePlusControl, ch=1)
-        for shapeNode in cmds.listRelatives(circlePlusControl, shapes=1):
-                    cmds.rename(shapeNode, '%sShape' % circlePlusControl)
-        return circlePlusControl
+        return createControl(name, 'circlePlus', radius, sections)